@@ -1,38 +1,108 @@
-from flask import Flask, request, jsonify, send_from_directory
-from PIL import Image
-import io
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, url_for, stream_with_context
+from werkzeug.datastructures import FileStorage
+from PIL import Image, ImageOps
 from io import BytesIO
 import torch
 import easyocr
-from pathlib import Path
+import cv2
 from models.common import DetectMultiBackend
+from utils.augmentations import letterbox
 from utils.general import non_max_suppression, scale_boxes, check_img_size
-from utils.dataloaders import LoadImages
 from utils.torch_utils import select_device
-from ultralytics.utils.plotting import Annotator, colors, save_one_box
-import uuid
 import numpy as np
 import os
 import base64
 import requests
 import json
-from fuzzywuzzy import fuzz, process
+import time
+import secrets
+import hashlib
+import bisect
+import shutil
+import tempfile
+from itertools import chain, islice
+from pathlib import Path
+from urllib.parse import urlparse
+from product_index import ProductIndex
+from catalog import CatalogReloader
+from image_cache import ImageCache
+from inference import BatchScheduler
+from crop_store import CropStore
+from result_cache import ResultCache, perceptual_hash
+from tiling import tile_windows, fuse_detections
+from batch_upload import close_uploads, detach_uploads, iter_uploads, windows
+from text_bands import to_gray, profile_bands, fixed_bands, stack_crops
+import metrics
 
 API_KEY = "YOUR-API-KEY"
 MODEL = 'trained-model/yolov5-large-trained.pt'
-PRODUCTS_DB = 'db/products.json'
-IMAGE_DIRECTORIES = {
-    'input': 'temp-images/input/',
-    'output': 'temp-images/output/',
-    'resized': 'temp-images/resized/'
+DETECTION_BACKEND = 'pt'  # Backend der Objekterkennung: 'pt', 'onnx' oder 'onnx-int8'
+DETECTION_WEIGHTS = {
+    'pt': MODEL,
+    'onnx': 'trained-model/yolov5-large-trained.onnx',  # Erzeugt mit `python export_model.py`
+    'onnx-int8': 'trained-model/yolov5-large-trained.int8.onnx'  # Erzeugt mit `python export_model.py --int8`
 }
+PRODUCTS_DB = 'db/products.json'
+PRODUCT_IMAGES = 'db/images'
+CATALOG_POLL_INTERVAL = 2.0  # Abstand in Sekunden, in dem `products.json` auf Änderungen geprüft wird
+CATALOG_HISTORY = 10  # Anzahl der Katalogversionen, zu denen Änderungen abgefragt werden können
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Speicherbudget für Produktbilder
+IMAGE_CACHE_DIR = None  # Optionales Verzeichnis, um Produktbilder auch auf der Festplatte zwischenzuspeichern
+IMAGE_FETCH_TIMEOUT = 5  # Timeout in Sekunden für das Laden externer Produktbilder
+SOURCE_SIDE = 1280  # Mindestlänge der längeren Kante des dekodierten Bildes, aus dem die Ausschnitte für die OCR stammen
+CROP_JPEG_QUALITY = 75  # JPEG-Qualität der ausgeschnittenen Flaschen in der Antwort
+OCR_BATCH_SIZE = 8  # Anzahl der Ausschnitte pro Aufruf der Texterkennung
+OCR_MAX_SIDE = 640  # Maximale Kantenlänge eines Ausschnitts für die Texterkennung
+OCR_PAD_COLOR = (114, 114, 114)  # Füllfarbe beim Angleichen der Ausschnittgrößen
+OCR_MIN_CROP_SIDE = 32  # Minimale kürzere Kantenlänge einer Box in Pixeln der Modelleingabe, kleinere Boxen werden nicht gelesen
+OCR_MAX_CROPS = 24  # Maximale Anzahl an Ausschnitten pro Anfrage, die durch die Texterkennung laufen
+OCR_MODE = 'detect'  # 'detect': EasyOCR mit eigener Textdetektion pro Ausschnitt, 'recognize': nur die Texterkennung auf Textbändern
+OCR_BAND_MODE = 'profile'  # Textbänder für 'recognize': 'profile' über das Projektionsprofil, 'fixed' als feste Bänder
+OCR_MAX_BANDS = 6  # Maximale Anzahl an Textbändern pro Ausschnitt bei 'profile'
+OCR_FIXED_BANDS = 3  # Anzahl der festen Bänder pro Ausschnitt bei 'fixed'
+OCR_STACK_CROPS = True  # Ausschnitte bei 'recognize' untereinander auf eine Fläche legen und in einem Aufruf lesen
+OCR_EARLY_EXIT_SCORE = None  # Score eines Produkttreffers, ab dem keine weiteren Ausschnitte gelesen werden (None deaktiviert, sonst liefert /process nur einen Teil der Flaschen)
+TILED_DETECTION = False  # Hochauflösende Bilder zusätzlich in überlappenden Kacheln durchsuchen, damit kleine Flaschen erkannt werden
+TILE_SIZE = 640  # Minimale Kantenlänge einer Kachel in Pixeln des dekodierten Bildes
+TILE_OVERLAP = 0.2  # Anteil, um den sich benachbarte Kacheln mindestens überlappen
+TILE_MAX_COUNT = 8  # Maximale Anzahl an Kacheln pro Anfrage, größere Bilder erhalten größere Kacheln
+TILE_FUSE_THRESHOLD = 0.6  # Anteil der Fläche, ab dem eine an der Kachelgrenze abgeschnittene Box mit der umschließenden verschmolzen wird
+BATCH_INFERENCE = True  # Bilder paralleler Anfragen gemeinsam durch das Modell führen
+BATCH_MAX_SIZE = 8  # Maximale Anzahl an Bildern pro Vorwärtsdurchlauf
+BATCH_MAX_WAIT = 0.01  # Maximale Wartezeit in Sekunden, bis ein Bündel ausgeführt wird
+OFFLINE_STARTUP = True  # Modelle ausschließlich aus lokalen Dateien laden, ohne Netzwerkzugriff
+TORCHSCRIPT_CACHE = False  # Das Modell einmalig als TorchScript ablegen und bei späteren Starts dieses laden
+WARMUP_RUNS = 2  # Anzahl der Aufwärmdurchläufe für Objekt- und Texterkennung vor dem Start des Servers
+RESPONSE_FORMATS = ('json', 'lean', 'multipart')  # Antwortformate von /process, 'json' ist der Standard
+STREAM_RESPONSE_FORMATS = ('json', 'lean')  # Antwortformate der gestreamten Zeilen von /process/stream und /process/batch
+BATCH_WINDOW_SIZE = 8  # Anzahl der Bilder von /process/batch, die gemeinsam erkannt und gelesen werden (begrenzt den Speicherbedarf)
+BATCH_MAX_IMAGES = 1000  # Maximale Anzahl an Bildern pro Anfrage an /process/batch
+BATCH_MAX_IMAGE_BYTES = 32 * 1024 * 1024  # Maximale Größe eines einzelnen Bildes in /process/batch
+BATCH_ARCHIVE_TYPES = ('application/zip', 'application/x-tar', 'application/gzip')  # Inhaltstypen für ein Archiv direkt im Anfragekörper
+BATCH_SPOOL_BYTES = 16 * 1024 * 1024  # Größe, ab der ein Archiv im Anfragekörper in eine temporäre Datei ausgelagert wird
+CROP_STORE_DIR = None  # Verzeichnis für kurzlebige Ausschnitte, standardmäßig unter /dev/shm
+CROP_TTL = 300  # Lebensdauer der Ausschnitt-URLs in Sekunden
+PRODUCT_IMAGE_MAX_AGE = 24 * 60 * 60  # Cache-Dauer der Produktbilder in Sekunden
+RESULT_CACHE_ENTRIES = 256  # Maximale Anzahl zwischengespeicherter Ergebnisse von /process
+RESULT_CACHE_MAX_BYTES = 128 * 1024 * 1024  # Maximale Größe aller zwischengespeicherten Ergebnisse
+RESULT_CACHE_TTL = 600  # Lebensdauer eines zwischengespeicherten Ergebnisses in Sekunden
+RESULT_CACHE_PERCEPTUAL = False  # Nahezu gleiche Bilder über einen perzeptuellen Hash wiedererkennen
+RESULT_CACHE_MAX_DISTANCE = 4  # Maximale Anzahl abweichender Bits des perzeptuellen Hashes
 
 # Initialisierungen
 app = Flask(__name__)
-model = torch.hub.load('ultralytics/yolov5', 'custom', path=MODEL, force_reload=True)
-reader = easyocr.Reader(['en', 'de'])  # Laden des EasyOCR-Bibliothek mit Englisch und Deutsch
+reader = None  # EasyOCR wird erst in `startup` geladen
 loaded_model = None
-products = []
+detection_scheduler = None
+catalog = CatalogReloader(
+    os.path.join(os.path.dirname(__file__), PRODUCTS_DB),
+    lambda products: ProductIndex(products, normalize_text),  # Index für den Produktabgleich
+    CATALOG_POLL_INTERVAL, CATALOG_HISTORY,
+    on_reload=lambda snapshot: refresh_caches(snapshot)
+)
+image_cache = ImageCache(IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_DIR)
+crop_store = CropStore(CROP_STORE_DIR, CROP_TTL)
+result_cache = ResultCache(RESULT_CACHE_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL, RESULT_CACHE_MAX_DISTANCE)
 
 """
    Hilfsfunktionen
@@ -53,20 +123,99 @@ def load_model(weights_path, device):
     model = DetectMultiBackend(weights_path, device=device)  # Lädt das Modell mit spezifischen Gewichten
     return model
 
-def load_products():
+def export_torchscript(model, output_path, img_size=(640, 640)):
+    """
+    Legt ein geladenes PyTorch-Modell als TorchScript ab, das `DetectMultiBackend` direkt laden kann.
+    
+    Args:
+        model (DetectMultiBackend): Das geladene Modell mit PyTorch-Gewichten.
+        output_path (Path): Der Pfad der TorchScript-Datei.
+        img_size (tuple): Die Eingabegröße (Höhe, Breite), mit der das Modell aufgezeichnet wird.
+    """
+    for module in model.model.modules():
+        if type(module).__name__ == 'Detect':
+            module.export = True  # Nur die zusammengefassten Vorhersagen ausgeben, wie beim Export von YOLOv5
+    im = torch.zeros(1, 3, *img_size).to(model.device)
+    with torch.no_grad():
+        traced = torch.jit.trace(model.model, im, strict=False)  # Aufzeichnen des Modells
+    config = {'shape': list(im.shape), 'stride': int(model.stride), 'names': model.names}
+    temp_path = output_path.with_suffix(f'.{os.getpid()}.tmp')
+    traced.save(str(temp_path), _extra_files={'config.txt': json.dumps(config)})
+    os.replace(temp_path, output_path)  # Atomar ersetzen, damit kein halb geschriebenes Modell geladen wird
+
+def load_detector(weights_path, device, offline=OFFLINE_STARTUP, torchscript_cache=TORCHSCRIPT_CACHE):
+    """
+    Lädt das Modell zur Objekterkennung genau einmal aus lokalen Dateien.
+    
+    Ist der TorchScript-Cache aktiv, wird ein vorhandenes und aktuelles TorchScript-Modell geladen.
+    Andernfalls werden die PyTorch-Gewichte geladen und das TorchScript-Modell für spätere Starts abgelegt.
+    
+    Args:
+        weights_path (str): Der Pfad zu den Gewichten des Modells.
+        device (str): Die zu verwendende Hardware ("cpu" oder "cuda").
+        offline (bool): Ob fehlende Gewichte sofort zu einem Fehler führen statt heruntergeladen zu werden.
+        torchscript_cache (bool): Ob das TorchScript-Modell verwendet und angelegt werden soll.
+    
+    Returns:
+        DetectMultiBackend: Das geladene Modell.
+    """
+    weights = Path(weights_path)
+    if offline and not weights.is_file():
+        raise FileNotFoundError(f'Modellgewichte nicht gefunden: {weights}')
+
+    cache_path = weights.with_suffix('.torchscript')
+    if torchscript_cache and weights.suffix == '.pt':
+        if cache_path.is_file() and cache_path.stat().st_mtime >= weights.stat().st_mtime:
+            return load_model(str(cache_path), device)  # Aktuelles TorchScript-Modell verwenden
+        model = load_model(str(weights), device)
+        export_torchscript(model, cache_path)  # Für den nächsten Start ablegen
+        return model
+    return load_model(str(weights), device)
+
+def load_reader(offline=OFFLINE_STARTUP):
     """
-    Lädt Produktinformationen von einer lokalen Datei.
+    Lädt EasyOCR mit Englisch und Deutsch.
+    
+    Args:
+        offline (bool): Ob nur bereits heruntergeladene Modelle verwendet werden dürfen.
     
     Returns:
-        list: Eine Liste von Produkten.
+        easyocr.Reader: Die geladene Texterkennung.
     """
-    base_dir = os.path.dirname(__file__)
-    file_path = os.path.join(base_dir, PRODUCTS_DB)
+    return easyocr.Reader(['en', 'de'], download_enabled=not offline)
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        products = json.load(file)
+def refresh_caches(snapshot):
+    """
+    Passt die Caches nach dem Neuladen des Produktkatalogs an.
+    
+    Args:
+        snapshot (CatalogSnapshot): Der neue Stand des Katalogs.
+    """
+    result_cache.clear()  # Ergebnisse des alten Katalogs werden nicht mehr abgefragt
+    warm_image_cache(snapshot.products)  # Bilder neuer Produkte vorab laden
 
-    return products
+def send_catalog_data(data, data_gzip, etag, last_modified):
+    """
+    Liefert JSON-Daten des Produktkatalogs mit ETag, Last-Modified und optionaler gzip-Komprimierung.
+    
+    Args:
+        data (bytes): Die unkomprimierten Daten.
+        data_gzip (bytes): Die gzip-komprimierten Daten.
+        etag (str): Das ETag der unkomprimierten Daten.
+        last_modified (datetime): Der Zeitpunkt der letzten Änderung.
+    
+    Returns:
+        Response: Die HTTP-Antwort, bei passenden Bedingungen mit Status 304.
+    """
+    use_gzip = 'gzip' in request.accept_encodings
+    response = Response(data_gzip if use_gzip else data, mimetype='application/json')
+    if use_gzip:
+        response.content_encoding = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{etag}-gzip' if use_gzip else etag)  # Jede Darstellung erhält ihr eigenes ETag
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True  # Clients fragen bei jedem Abruf nach, ob sich der Katalog geändert hat
+    return response.make_conditional(request)
 
 def replace_similar_characters(text):
     """
@@ -89,6 +238,18 @@ def replace_similar_characters(text):
     }
     return ''.join(replacements.get(char, char) for char in text)
 
+def normalize_text(text):
+    """
+    Normalisiert einen Text für den Vergleich von OCR-Texten mit Produktnamen.
+    
+    Args:
+        text (str): Der Eingabetext.
+    
+    Returns:
+        str: Der Text in Kleinbuchstaben mit ersetzten Zeichen.
+    """
+    return replace_similar_characters(text.lower())
+
 def fetch_image_base64(url):
     """
     Lädt ein Bild von einer URL und konvertiert es zu einem Base64-String.
@@ -99,156 +260,1028 @@ def fetch_image_base64(url):
     Returns:
         str: Das Bild als Base64-codierter String.
     """
-    response = requests.get(url)  # Sendet eine HTTP-Anfrage an den gegebenen Bild-URL
+    response = requests.get(url, timeout=IMAGE_FETCH_TIMEOUT)  # Sendet eine HTTP-Anfrage an den gegebenen Bild-URL
     response.raise_for_status()  # Überprüft auf HTTP-Fehler und wirft eine Ausnahme, falls vorhanden
     return base64.b64encode(BytesIO(response.content).read()).decode('utf-8')
 
-def create_directories(directories):
+def local_image_path(url):
     """
-    Erstellt die Verzeichnisse, die in einem Dictionary definiert sind.
+    Ermittelt den lokalen Pfad eines Produktbildes, das über die Route `/db/images` ausgeliefert wird.
     
     Args:
-        directories (dict): Ein Dictionary von Verzeichnisnamen zu Pfaden.
+        url (str): Die URL des Bildes.
+    
+    Returns:
+        str: Der Pfad zur lokalen Bilddatei oder None, wenn das Bild nicht lokal vorliegt.
     """
-    for directory_path in directories.values():
-        Path(directory_path).mkdir(parents=True, exist_ok=True)
+    url_path = urlparse(url).path
+    if not url_path.startswith('/db/images/'):
+        return None
+    file_path = os.path.join(os.path.dirname(__file__), PRODUCT_IMAGES, os.path.basename(url_path))
+    return file_path if os.path.isfile(file_path) else None
 
-def clean_up_images(directories):
+def read_image_base64(file_path):
     """
-    Löscht alle Dateien in den angegebenen Verzeichnissen.
+    Liest eine lokale Bilddatei und konvertiert sie zu einem Base64-String.
     
     Args:
-        directories (dict): Ein Wörterbuch von Verzeichnisnamen zu Pfaden.
+        file_path (str): Der Pfad zur Bilddatei.
+    
+    Returns:
+        str: Das Bild als Base64-codierter String.
+    """
+    with open(file_path, 'rb') as file:
+        return base64.b64encode(file.read()).decode('utf-8')
+
+def get_product_image_base64(url):
+    """
+    Liefert das Produktbild als Base64-String aus dem Cache, der lokalen Datenbank oder von der URL.
+    
+    Args:
+        url (str): Die URL des Bildes.
+    
+    Returns:
+        str: Das Bild als Base64-codierter String oder None, wenn es nicht geladen werden konnte.
+    """
+    encoded_img = image_cache.get(url)
+    if encoded_img is not None:
+        return encoded_img
+
+    file_path = local_image_path(url)
+    try:
+        encoded_img = read_image_base64(file_path) if file_path else fetch_image_base64(url)
+    except (OSError, requests.RequestException) as e:
+        print(f'Fehler beim Laden des Produktbildes {url}. Grund: {e}')
+        return None
+
+    image_cache.put(url, encoded_img)
+    return encoded_img
+
+def warm_image_cache(products):
     """
-    for directory_path in directories.values():
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            try:
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)  # Löschen der Datei
-            except Exception as e:
-                print(f'Fehler beim Löschen von {file_path}. Grund: {e}')
+    Lädt die lokal vorhandenen Produktbilder in den Cache, bis dessen Budget ausgeschöpft ist.
+    
+    Args:
+        products (list): Die Liste der Produkte.
+    
+    Returns:
+        int: Die Anzahl der geladenen Bilder.
+    """
+    loaded = 0
+    for product in products:
+        url = product.get('image_url')
+        file_path = local_image_path(url) if url else None
+        if file_path is None or url in image_cache:
+            continue
+        if not image_cache.has_room_for(os.path.getsize(file_path) * 4 // 3 + 4):  # Größe nach Base64-Codierung
+            break
+        image_cache.put(url, read_image_base64(file_path))
+        loaded += 1
+    return loaded
 
-def resize_image(image_path, target_size=(640, 640)):
+def decode_image(image_bytes, side=SOURCE_SIDE):
     """
-    Skaliert ein Bild auf eine gegebene Zielgröße.
+    Dekodiert die hochgeladenen Bilddaten in einem Durchgang direkt in ein NumPy-Array.
+    
+    JPEG-Bilder werden bereits beim Dekodieren um den Faktor 2, 4 oder 8 verkleinert (Draft-Modus),
+    andere Formate anschließend um einen ganzzahligen Faktor, sodass die längere Kante zwischen
+    `side` und `2 * side` liegt. Die EXIF-Ausrichtung wird angewendet, das Seitenverhältnis bleibt
+    erhalten. Die Objekterkennung skaliert dieses Bild nur noch einmal per Letterbox und rechnet die
+    Boxen auf seine Koordinaten zurück, sodass die Ausschnitte in höherer Auflösung entnommen werden.
     
     Args:
-        image_path (str): Der Pfad zum Originalbild.
-        target_size (tuple): Die Zielgröße (Breite, Höhe).
+        image_bytes (bytes): Der Inhalt der hochgeladenen Bilddatei.
+        side (int): Die Mindestlänge der längeren Kante, sofern das Bild groß genug ist.
     
     Returns:
-        str: Der Pfad zum skalierten Bild.
+        numpy.ndarray: Das Bild im BGR-Format oder None, wenn die Daten kein gültiges Bild sind.
     """
-    with Image.open(image_path) as img:
-        img = img.resize(target_size, Image.LANCZOS)  # Skaliert das Bild auf die gewünschte Größe mit dem LANCZOS-Algorithmus, der für hohe Qualität sorgt
-        filename = os.path.basename(image_path)
-        output_path = os.path.join(IMAGE_DIRECTORIES['resized'], filename)
-        img.save(output_path, format='JPEG')  # Speichert das skalierte Bild als JPEG
-        return output_path
+    if not image_bytes:
+        return None
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            width, height = img.size
+            scale = side / max(width, height)
+            img.draft('RGB', (round(width * scale), round(height * scale)))  # Reduzierte Auflösung direkt aus dem JPEG dekodieren
+            img = ImageOps.exif_transpose(img)  # Ausrichtung gemäß EXIF-Tag anwenden
+            factor = max(img.size) // side
+            if factor > 1:
+                img = img.reduce(factor)  # Formate ohne Draft-Modus ganzzahlig verkleinern
+            image = np.asarray(img.convert('RGB'))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+def prepare_image(im0, img_size, stride, auto):
+    """
+    Bereitet ein Bild im Speicher für das Modell vor (Letterbox, HWC zu CHW, BGR zu RGB).
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+        img_size (int or list): Die Eingabegröße des Modells.
+        stride (int): Der Stride-Wert des Modells.
+        auto (bool): Ob nur bis zum nächsten Vielfachen des Strides aufgefüllt wird.
+    
+    Returns:
+        numpy.ndarray: Das vorbereitete Bild.
+    """
+    img = letterbox(im0, img_size, stride=stride, auto=auto)[0]  # Skalieren und Auffüllen unter Beibehaltung des Seitenverhältnisses
+    img = img.transpose((2, 0, 1))[::-1]  # HWC zu CHW, BGR zu RGB
+    return np.ascontiguousarray(img)
+
+def crop_box(im0, xyxy, gain=1.02, pad=10):
+    """
+    Schneidet einen erkannten Bereich durch Slicing aus dem Bild aus, mit etwas Rand um die Bounding-Box.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild, auf das sich die Koordinaten beziehen.
+        xyxy (list): Die Bounding-Box (x1, y1, x2, y2).
+        gain (float): Der Faktor, um den die Box vergrößert wird.
+        pad (int): Der zusätzliche Rand in Pixeln.
+    
+    Returns:
+        numpy.ndarray: Der ausgeschnittene Bereich als Sicht auf das Bild.
+    """
+    x1, y1, x2, y2 = (float(value) for value in xyxy)
+    width = (x2 - x1) * gain + pad
+    height = (y2 - y1) * gain + pad
+    x_center, y_center = (x1 + x2) / 2, (y1 + y2) / 2
+    img_height, img_width = im0.shape[:2]
+    left = min(max(int(x_center - width / 2), 0), img_width)  # Begrenzen auf die Bildränder
+    top = min(max(int(y_center - height / 2), 0), img_height)
+    right = min(max(int(x_center + width / 2), 0), img_width)
+    bottom = min(max(int(y_center + height / 2), 0), img_height)
+    return im0[top:bottom, left:right]
+
+def encode_image(image):
+    """
+    Codiert ein Bild einmalig als JPEG.
+    
+    Args:
+        image (numpy.ndarray): Das Bild im BGR-Format.
+    
+    Returns:
+        bytes: Das JPEG-codierte Bild.
+    """
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, CROP_JPEG_QUALITY])
+    return buffer.tobytes()
 
 """
    KI-Funktionen
 """
 
-def detect_objects(model, img_path, img_size, conf_thres, iou_thres, device):
+def detection_windows(im0):
+    """
+    Bestimmt die Kacheln der Objekterkennung für ein Bild.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+    
+    Returns:
+        list: Die Kacheln als (x1, y1, x2, y2), leer ohne `TILED_DETECTION` oder bei kleinen Bildern.
+    """
+    return tile_windows(im0.shape[1], im0.shape[0], TILE_SIZE, TILE_OVERLAP, TILE_MAX_COUNT) if TILED_DETECTION else []
+
+def detect_objects(model, im0, img_size, conf_thres, iou_thres, device, windows=None):
     """
     Erkennt Objekte in einem Bild.
     
     Args:
         model (Model): Das geladene Modell.
-        img_path (str): Der Pfad zum Bild.
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+        img_size (int): Die Größe, auf die das Bild skaliert werden soll.
+        conf_thres (float): Der Schwellenwert für die Konfidenz.
+        iou_thres (float): Der Schwellenwert für die Überlappung von Bounding-Boxen.
+        device (str): Die zu verwendende Hardware ("cpu" oder "cuda").
+        windows (list, optional): Die Kacheln aus `detection_windows`, sonst werden sie hier bestimmt.
+    
+    Returns:
+        torch.Tensor: Die Detektionen (x1, y1, x2, y2, Konfidenz, Klasse) in den Koordinaten von `im0`.
+    """
+    with metrics.stage('detect'):
+        if windows is None:
+            windows = detection_windows(im0)
+        if windows:
+            det = run_tiled_detection(model, im0, windows, img_size, conf_thres, iou_thres, device)
+        else:
+            det = run_detection(model, im0, img_size, conf_thres, iou_thres, device)
+    metrics.count('detections', len(det))
+    return det
+
+def run_detection(model, im0, img_size, conf_thres, iou_thres, device):
+    """
+    Führt die Objekterkennung aus, über den Scheduler oder direkt, und erfasst Modell- und NMS-Dauer.
+    
+    Args:
+        model (Model): Das geladene Modell.
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
         img_size (int): Die Größe, auf die das Bild skaliert werden soll.
         conf_thres (float): Der Schwellenwert für die Konfidenz.
         iou_thres (float): Der Schwellenwert für die Überlappung von Bounding-Boxen.
         device (str): Die zu verwendende Hardware ("cpu" oder "cuda").
     
     Returns:
-        tuple: Enthält den Bildpfad, das Bild, das Originalbild und die Detektionen.
+        torch.Tensor: Die Detektionen in den Koordinaten von `im0`.
     """
     imgsz = check_img_size(img_size, s=model.stride)  # Überprüfen und Anpassen der Bildgröße an das Modell
-    dataset = LoadImages(img_path, img_size=imgsz, auto=model.pt)  # Laden des Bildes für die Verarbeitung
+    auto = model.pt and detection_scheduler is None  # Für gemeinsame Bündel müssen alle Bilder gleich groß sein
+    img = prepare_image(im0, imgsz, model.stride, auto)  # Vorbereiten des Bildes im Speicher
+    img = torch.from_numpy(img).to(device)  # Konvertieren des Bildes in ein Torch Tensor und Verschiebung auf das gewählte Gerät
+    img = img.float() / 255.0  # Normalisieren des Bildes
+    if len(img.shape) == 3:
+        img = img[None]  # Hinzufügen einer zusätzlichen Dimension, falls notwendig
+
+    if detection_scheduler is not None:
+        future = detection_scheduler.submit(img[0], conf_thres, iou_thres)  # Gemeinsam mit parallelen Anfragen ausführen
+        det = future.result()
+        for stage, seconds in future.timings.items():
+            metrics.record(stage, seconds)
+        metrics.count('detector_batch_images', future.batch_size)
+    else:
+        with metrics.stage('detect_model'):
+            with torch.no_grad():
+                pred = model(img)  # Vorhersagen des Modells erhalten
+        with metrics.stage('detect_nms'):
+            det = non_max_suppression(pred, conf_thres, iou_thres)[0]  # Anwenden der Non-Max Suppression zur Filterung der Vorhersagen
+    det[:, :4] = scale_boxes(img.shape[2:], det[:, :4], im0.shape).round()  # Boxen auf die Koordinaten des Bildes zurückrechnen
+    return det
 
-    for path, img, im0s, _, _ in dataset:
-        img = torch.from_numpy(img).to(device)  # Konvertieren des Bildes in ein Torch Tensor und Verschiebung auf das gewählte Gerät
-        img = img.float() / 255.0  # Normalisieren des Bildes
-        if len(img.shape) == 3:
-            img = img[None]  # Hinzufügen einer zusätzlichen Dimension, falls notwendig
+def run_tiled_detection(model, im0, windows, img_size, conf_thres, iou_thres, device):
+    """
+    Führt die Objekterkennung auf der Gesamtansicht und den Kacheln des Bildes in einem gemeinsamen Vorwärtsdurchlauf aus.
+    
+    Jede Kachel wird wie ein eigenes Bild auf die Eingabegröße des Modells gebracht, sodass kleine
+    Flaschen in höherer Auflösung erkannt werden. Die Boxen aller Ansichten werden auf die Koordinaten
+    von `im0` zurückgerechnet und mit `fuse_detections` zusammengeführt, bevor die Texterkennung läuft.
+    Die Ansichten bilden bereits ein volles Bündel und laufen daher direkt, ohne den Scheduler.
+    
+    Args:
+        model (Model): Das geladene Modell.
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+        windows (list): Die Kacheln als (x1, y1, x2, y2) aus `tile_windows`.
+        img_size (int): Die Größe, auf die jede Ansicht skaliert werden soll.
+        conf_thres (float): Der Schwellenwert für die Konfidenz.
+        iou_thres (float): Der Schwellenwert für die Überlappung von Bounding-Boxen.
+        device (str): Die zu verwendende Hardware ("cpu" oder "cuda").
+    
+    Returns:
+        torch.Tensor: Die zusammengeführten Detektionen in den Koordinaten von `im0`.
+    """
+    imgsz = check_img_size(img_size, s=model.stride)
+    windows = [(0, 0, im0.shape[1], im0.shape[0])] + list(windows)  # Gesamtansicht für große Flaschen, die über mehrere Kacheln reichen
+    views = [im0[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    img = np.stack([prepare_image(view, imgsz, model.stride, False) for view in views])  # Gleiche Größe für alle Ansichten
+    img = torch.from_numpy(img).to(device).float() / 255.0
+    metrics.count('detector_tiles', len(windows) - 1)
+
+    with metrics.stage('detect_model'):
+        with torch.no_grad():
+            pred = model(img)  # Ein Vorwärtsdurchlauf für alle Ansichten
+    with metrics.stage('detect_nms'):
+        dets = non_max_suppression(pred, conf_thres, iou_thres)  # Non-Max Suppression pro Ansicht
+        for det, view, (x1, y1, _, _) in zip(dets, views, windows):
+            det[:, :4] = scale_boxes(img.shape[2:], det[:, :4], view.shape)  # Boxen auf die Koordinaten der Ansicht zurückrechnen
+            det[:, [0, 2]] += x1  # Verschiebung der Kachel im Bild
+            det[:, [1, 3]] += y1
+        det = fuse_detections(torch.cat(dets), iou_thres, TILE_FUSE_THRESHOLD)  # Globale Non-Max Suppression und Verschmelzen der Bruchstücke
+    det[:, :4] = det[:, :4].round()
+    return det
+
+def detect_images(model, images, img_size, conf_thres, iou_thres, device, windows=None):
+    """
+    Erkennt Objekte in mehreren Bildern gemeinsam in einem Vorwärtsdurchlauf.
+    
+    Alle Bilder werden auf die volle Eingabegröße gebracht, damit sie sich stapeln lassen. Das
+    Fenster bildet bereits ein volles Bündel und läuft daher direkt, ohne den Scheduler. Mit
+    `TILED_DETECTION` läuft jedes Bild mit seinen Kacheln als eigenes Bündel.
+    
+    Args:
+        model (Model): Das geladene Modell.
+        images (list): Die Bilder im BGR-Format.
+        img_size (int): Die Größe, auf die die Bilder skaliert werden sollen.
+        conf_thres (float): Der Schwellenwert für die Konfidenz.
+        iou_thres (float): Der Schwellenwert für die Überlappung von Bounding-Boxen.
+        device (str): Die zu verwendende Hardware ("cpu" oder "cuda").
+        windows (list, optional): Pro Bild die Kacheln aus `detection_windows`.
+    
+    Returns:
+        list: Die Detektionen pro Bild in den Koordinaten des jeweiligen Bildes.
+    """
+    if TILED_DETECTION:
+        windows = windows or [None] * len(images)
+        return [detect_objects(model, im0, img_size, conf_thres, iou_thres, device, image_windows)
+                for im0, image_windows in zip(images, windows)]
 
-        pred = model(img)  # Vorhersagen des Modells erhalten
-        det = non_max_suppression(pred, conf_thres, iou_thres)[0]  # Anwenden der Non-Max Suppression zur Filterung der Vorhersagen
-        return path, img, im0s, det
+    with metrics.stage('detect'):
+        imgsz = check_img_size(img_size, s=model.stride)
+        img = np.stack([prepare_image(im0, imgsz, model.stride, False) for im0 in images])  # Gleiche Größe für alle Bilder
+        img = torch.from_numpy(img).to(device).float() / 255.0
+        with metrics.stage('detect_model'):
+            with torch.no_grad():
+                pred = model(img)  # Ein Vorwärtsdurchlauf für alle Bilder
+        with metrics.stage('detect_nms'):
+            dets = non_max_suppression(pred, conf_thres, iou_thres)  # Non-Max Suppression pro Bild
+        for det, im0 in zip(dets, images):
+            det[:, :4] = scale_boxes(img.shape[2:], det[:, :4], im0.shape).round()  # Boxen auf die Koordinaten des Bildes zurückrechnen
+    metrics.count('detections', sum(len(det) for det in dets))
+    metrics.count('detector_batch_images', len(images))
+    return dets
 
 def recognize_text(image):
     """
     Erkennt Text in einem Bild.
     
     Args:
-        image (Image): Das Bild, auf dem der Text erkannt werden soll.
+        image (Image or numpy.ndarray): Das Bild, auf dem der Text erkannt werden soll.
     
     Returns:
         tuple: Enthält den erkannten Text und das OCR-Ergebnis.
     """
-    image_np = np.array(image)  # Konvertieren des PIL-Bildes in ein NumPy-Array
+    image_np = np.array(image)  # Konvertieren des Bildes in ein zusammenhängendes NumPy-Array
     ocr_result = reader.readtext(image_np)  # Ausführen der Texterkennung
     recognized_texts = [result[1] for result in ocr_result]  # Extrahieren des erkannten Textes aus dem OCR-Ergebnis
     return " ".join(recognized_texts), ocr_result
 
-def post_process_images(im0s, det):
+def normalize_crops(crops, max_side=OCR_MAX_SIDE):
+    """
+    Bringt mehrere Ausschnitte auf eine gemeinsame Größe, damit sie gemeinsam verarbeitet werden können.
+    
+    Zu große Ausschnitte werden verkleinert, anschließend werden alle rechts und unten aufgefüllt,
+    sodass das Seitenverhältnis und damit die Schrift unverzerrt bleibt.
+    
+    Args:
+        crops (list): Die Ausschnitte als NumPy-Arrays.
+        max_side (int): Die maximale Kantenlänge eines Ausschnitts.
+    
+    Returns:
+        list: Die Ausschnitte in einheitlicher Größe.
+    """
+    scaled_crops = []
+    for crop in crops:
+        height, width = crop.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        scaled_crops.append(crop)
+
+    target_height = max(crop.shape[0] for crop in scaled_crops)
+    target_width = max(crop.shape[1] for crop in scaled_crops)
+    return [cv2.copyMakeBorder(crop, 0, target_height - crop.shape[0], 0, target_width - crop.shape[1],
+                               cv2.BORDER_CONSTANT, value=OCR_PAD_COLOR) for crop in scaled_crops]
+
+def recognize_texts(images, batch_size=OCR_BATCH_SIZE):
+    """
+    Erkennt Text in mehreren Bildern mit gebündelten Aufrufen der Texterkennung.
+    
+    Die Bilder werden nach Seitenverhältnis sortiert, damit innerhalb eines Bündels möglichst wenig
+    aufgefüllt werden muss. Die Ergebnisse werden anschließend wieder den Eingabebildern zugeordnet.
+    Auf der CPU bündelt `readtext_batched` nur die Textdetektion (CRAFT), die Erkennung läuft weiterhin
+    pro gefundener Textbox. Die Bündelung spart daher vor allem den Aufwand pro Aufruf, nicht die
+    Rechenzeit der Erkennung.
+    
+    Args:
+        images (list): Die Bilder als NumPy-Arrays im BGR-Format.
+        batch_size (int): Die Anzahl der Bilder pro Bündel.
+    
+    Returns:
+        list: Pro Bild ein Tupel aus erkanntem Text und OCR-Ergebnis, in der Reihenfolge der Eingabe.
+    """
+    if OCR_MODE == 'recognize':
+        return recognize_bands(images, batch_size)
+    results = [None] * len(images)
+    order = sorted(range(len(images)), key=lambda i: images[i].shape[1] / images[i].shape[0])  # Nach Seitenverhältnis sortieren
+    for start in range(0, len(order), batch_size):
+        group = order[start:start + batch_size]
+        batch = normalize_crops([images[i] for i in group])  # Einheitliche Größe für den gebündelten Aufruf
+        ocr_results = reader.readtext_batched(batch, batch_size=batch_size)  # Ein Aufruf pro Bündel
+        for i, ocr_result in zip(group, ocr_results):
+            results[i] = (" ".join(result[1] for result in ocr_result), ocr_result)  # Ergebnis dem Ausschnitt zuordnen
+    return results
+
+def crop_bands(gray):
     """
-    Schneidt des erkannten Bereichs aus dem Bild aus und führt OCR auf den erkannten Objekten eines Bildes aus.
+    Bestimmt die Textbänder eines Ausschnitts gemäß `OCR_BAND_MODE`.
     
     Args:
-        im0s (numpy.ndarray): Das Originalbild.
+        gray (numpy.ndarray): Der Ausschnitt in Graustufen.
+    
+    Returns:
+        list: Die Bänder als (y1, y2), ohne gefundene Bänder der ganze Ausschnitt.
+    """
+    if OCR_BAND_MODE == 'fixed':
+        bands = fixed_bands(gray.shape[0], OCR_FIXED_BANDS)
+    else:
+        bands = profile_bands(gray, OCR_MAX_BANDS)
+    return bands or [(0, gray.shape[0])]
+
+def recognize_bands(images, batch_size=OCR_BATCH_SIZE):
+    """
+    Erkennt Text in mehreren Ausschnitten nur mit dem Erkennungsmodell von EasyOCR, ohne dessen Textdetektion.
+    
+    Die Ausschnitte stammen bereits aus der Objekterkennung, daher werden die Textzeilen nur über
+    `crop_bands` bestimmt und direkt an `reader.recognize` übergeben. Mit `OCR_STACK_CROPS` liegen
+    alle Ausschnitte untereinander auf einer Fläche, sodass ein einziger Aufruf alle Bänder liest;
+    die Ergebnisse werden über ihre Lage wieder den Ausschnitten zugeordnet.
+    
+    Args:
+        images (list): Die Bilder als NumPy-Arrays im BGR-Format.
+        batch_size (int): Die Anzahl der Bänder pro Bündel des Erkennungsmodells.
+    
+    Returns:
+        list: Pro Bild ein Tupel aus erkanntem Text und OCR-Ergebnis, in der Reihenfolge der Eingabe.
+    """
+    if not images:
+        return []
+    grays = [to_gray(image, OCR_MAX_SIDE) for image in images]
+    bands = [crop_bands(gray) for gray in grays]
+    ocr_results = [[] for _ in images]
+    if OCR_STACK_CROPS and len(grays) > 1:
+        canvas, boxes, offsets = stack_crops(grays, bands)
+        for box, text, confidence in reader.recognize(canvas, horizontal_list=boxes, free_list=[], batch_size=batch_size):
+            i = bisect.bisect_right(offsets, (box[0][1] + box[2][1]) / 2) - 1  # Ausschnitt anhand der Mitte des Bandes
+            ocr_results[i].append(([[x, y - offsets[i]] for x, y in box], text, confidence))
+    else:
+        for i, (gray, crop_band) in enumerate(zip(grays, bands)):
+            boxes = [[0, gray.shape[1], y1, y2] for y1, y2 in crop_band]
+            ocr_results[i] = reader.recognize(gray, horizontal_list=boxes, free_list=[], batch_size=batch_size)
+
+    results = []
+    for ocr_result in ocr_results:
+        ocr_result = sorted(ocr_result, key=lambda result: result[0][0][1])  # Von oben nach unten lesen
+        results.append((" ".join(result[1] for result in ocr_result), ocr_result))
+    return results
+
+def select_crops(im0, det, stats, windows=None):
+    """
+    Wählt die Ausschnitte für die Texterkennung aus und bringt sie in die Reihenfolge, in der sie gelesen werden.
+    
+    Boxen mit hoher Konfidenz und großer Fläche kommen zuerst. Zu kleine Boxen werden übersprungen
+    und es werden höchstens `OCR_MAX_CROPS` Ausschnitte ausgewählt.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
         det (list): Die Liste der Detektionen.
+        stats (dict): Erhält die Anzahl der erkannten und übersprungenen Boxen.
+        windows (list, optional): Die Kacheln, mit denen `det` erkannt wurde, sonst werden sie hier bestimmt.
     
     Returns:
-        list: Liste der erkannten Texte.
+        list: Die ausgewählten Ausschnitte.
     """
-    save_path = Path(IMAGE_DIRECTORIES['output'])  # Definieren des Speicherpfades für die Bilder
-    text_results = []
-    images_base64 = []
+    side = max(im0.shape[:2])
+    if windows is None:
+        windows = detection_windows(im0)
+    if windows:
+        side = max(windows[0][2] - windows[0][0], windows[0][3] - windows[0][1])  # Kleine Boxen stammen aus den Kacheln
+    scale = 640 / side  # Mindestgröße bezieht sich auf die Eingabegröße des Modells
+    boxes = []
     for *xyxy, conf, cls in det:
-        filename = f"{uuid.uuid4().hex}.jpg"  # Generieren eines einzigartigen Dateinamens
-        file_full_path = save_path / filename  # Zusammenbauen des vollständigen Dateipfades
-        cropped_image = save_one_box(xyxy, im0s, file=file_full_path, BGR=True)  # Ausschneiden des erkannten Bereichs aus dem Bild
-        if cropped_image is not None and cropped_image.size > 0:
-            cropped_pil_image = Image.fromarray(cropped_image)  # Konvertieren des ausgeschnittenen Bereichs in ein PIL-Bild
+        width, height = float(xyxy[2] - xyxy[0]), float(xyxy[3] - xyxy[1])
+        if min(width, height) * scale < OCR_MIN_CROP_SIDE:
+            stats['skipped_small'] += 1  # Auf so kleinen Boxen ist kaum lesbarer Text zu erwarten
+            continue
+        boxes.append((float(conf) * width * height, xyxy))
+    boxes.sort(key=lambda box: box[0], reverse=True)  # Nach Konfidenz und Fläche priorisieren
 
-            recognized_text, _ = recognize_text(cropped_pil_image)  # Erkennen von Text im ausgeschnittenen Bild
-            if recognized_text is not None and len(recognized_text) >= 4:
-                text_results.append(recognized_text) # Hinzufügen des erkannten Textes zur Liste der Ergebnisse
-                
-                img_byte_arr = io.BytesIO()
-                cropped_pil_image.save(img_byte_arr, format='JPEG')
-                encoded_img = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-                images_base64.append(encoded_img)
+    stats['skipped_limit'] += max(0, len(boxes) - OCR_MAX_CROPS)
+    cropped_images = [crop_box(im0, xyxy) for _, xyxy in boxes[:OCR_MAX_CROPS]]  # Ausschneiden der erkannten Bereiche aus dem Bild
+    return [cropped_image for cropped_image in cropped_images if cropped_image.size > 0]
 
-    return text_results, images_base64
+def ocr_chunks(count, batch_size=OCR_BATCH_SIZE):
+    """
+    Teilt die Ausschnitte in Abschnitte für die Texterkennung auf.
+    
+    Mit aktivem vorzeitigem Abbruch wird zuerst nur der wichtigste Ausschnitt gelesen, danach
+    verdoppelt sich die Größe der Abschnitte bis `batch_size`. So wird bei einem eindeutigen
+    Treffer möglichst wenig zusätzlich gelesen, ohne auf gebündelte Aufrufe zu verzichten.
+    
+    Args:
+        count (int): Die Anzahl der Ausschnitte.
+        batch_size (int): Die maximale Größe eines Abschnitts.
+    
+    Returns:
+        list: Tupel aus Start- und Endindex der Abschnitte.
+    """
+    chunks = []
+    size = 1 if OCR_EARLY_EXIT_SCORE is not None else batch_size
+    start = 0
+    while start < count:
+        chunks.append((start, min(start + size, count)))
+        start += size
+        size = min(size * 2, batch_size)
+    return chunks
+
+def init_ocr_stats(stats, det):
+    """
+    Setzt die Zähler der Texterkennung für ein Bild zurück.
+    
+    Args:
+        stats (dict): Erhält die Zähler.
+        det (list): Die Liste der Detektionen.
+    
+    Returns:
+        dict: Die Zähler.
+    """
+    stats.update({'detected': len(det), 'processed': 0, 'skipped_small': 0, 'skipped_limit': 0,
+                  'skipped_early_exit': 0, 'early_exit': False})
+    return stats
+
+def match_crop(cropped_image, recognized_text):
+    """
+    Codiert einen gelesenen Ausschnitt und sucht das passende Produkt.
+    
+    Args:
+        cropped_image (numpy.ndarray): Der Ausschnitt im BGR-Format.
+        recognized_text (str): Der erkannte Text.
+    
+    Returns:
+        tuple: Ausschnitt als JPEG-Bytes, gefundenes Produkt (oder None) und dessen Score, oder None bei zu kurzem Text.
+    """
+    if recognized_text is None or len(recognized_text) < 4:
+        return None
+    with metrics.stage('encode'):
+        image_jpeg = encode_image(cropped_image)  # Ausschnitt einmalig codieren
+    match_stats = {}
+    with metrics.stage('find_products'):
+        matched_product = find_products(recognized_text, include_image=False, stats=match_stats)  # Produkt basierend auf dem OCR-Text suchen
+    return image_jpeg, matched_product, match_stats.get('score', 0)
 
-def find_products(ocr_text):
+def post_process_images(im0, det, stats=None, windows=None):
+    """
+    Schneidet die erkannten Bereiche aus dem Bild aus, führt OCR darauf aus und sucht die passenden Produkte.
+    
+    Die Ausschnitte werden in der Reihenfolge von `select_crops` abschnittsweise gelesen. Erreicht ein
+    Produkttreffer `OCR_EARLY_EXIT_SCORE`, werden die übrigen Ausschnitte nicht mehr gelesen.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+        det (list): Die Liste der Detektionen.
+        stats (dict, optional): Erhält die Zähler der Texterkennung (gelesen, übersprungen, vorzeitiger Abbruch).
+        windows (list, optional): Die Kacheln, mit denen `det` erkannt wurde.
+    
+    Yields:
+        tuple: Erkannter Text, Ausschnitt als JPEG-Bytes und gefundenes Produkt (oder None) pro Flasche.
+    """
+    stats = init_ocr_stats({} if stats is None else stats, det)
+    with metrics.stage('crop'):
+        cropped_images = select_crops(im0, det, stats, windows)
+    metrics.count('crops_skipped_small', stats['skipped_small'])
+    metrics.count('crops_skipped_limit', stats['skipped_limit'])
+
+    for start, end in ocr_chunks(len(cropped_images)):
+        chunk = cropped_images[start:end]
+        with metrics.stage('ocr'):
+            ocr_results = recognize_texts(chunk)  # Erkennen von Text in allen Ausschnitten des Abschnitts gemeinsam
+        metrics.count('crops_ocr', len(chunk))
+        stats['processed'] += len(chunk)
+
+        for cropped_image, (recognized_text, _) in zip(chunk, ocr_results):
+            match = match_crop(cropped_image, recognized_text)
+            if match is None:
+                continue
+            image_jpeg, matched_product, score = match
+            if OCR_EARLY_EXIT_SCORE is not None and score >= OCR_EARLY_EXIT_SCORE:
+                stats['early_exit'] = True
+            yield recognized_text, image_jpeg, matched_product
+
+        if stats['early_exit']:
+            stats['skipped_early_exit'] = len(cropped_images) - end  # Eindeutiger Treffer, restliche Ausschnitte nicht lesen
+            metrics.count('ocr_early_exits')
+            metrics.count('crops_skipped_early_exit', stats['skipped_early_exit'])
+            break
+
+def find_products(ocr_text, include_image=True, stats=None):
     """
     Findet Produkte basierend auf OCR-Text.
     
     Args:
         ocr_text (str): Der erkannte Text aus dem OCR-Prozess.
+        include_image (bool): Ob das Produktbild als Base64 beigefügt wird, sonst nur über `image_url` referenziert.
+        stats (dict, optional): Erhält unter `score` den Score des gefundenen Produkts.
     
     Returns:
         dict: Das gefundene Produkt oder None, wenn kein Produkt gefunden wurde.
     """
-    ocr_text = replace_similar_characters(ocr_text.lower())  # Umwandlung des Textes in Kleinbuchstaben und Ersetzen ähnlicher Zeichen
-    ocr_parts = ocr_text.split()  # Zerlegen des Textes in Einzelteile
-    best_score = 0
-    best_product = None
-    for product in products:
-        product_name = replace_similar_characters(product['name'].lower())  # Anpassung der Produktnamen
-        score = fuzz.ratio(ocr_text, product_name)
-        if score > best_score:  # Überprüfung, ob der neue Score höher ist als der bisher beste
-            best_score = score
-            best_product = product
-            best_product['image_base64'] = fetch_image_base64(best_product['image_url'])
+    search_stats = {}
+    with metrics.stage('match_scoring'):
+        matches = catalog.current.index.search(ocr_text, limit=1, stats=search_stats)  # Vorauswahl über den Index und Bewertung der Kandidaten
+    metrics.count('catalog_comparisons', search_stats.get('comparisons', 0))
+    if not matches:
+        return None
+    best_product, score = matches[0]
+    if stats is not None:
+        stats['score'] = score
+    best_product = dict(best_product)  # Kopie, damit der gemeinsame Produktkatalog unverändert bleibt
+    if include_image:
+        with metrics.stage('product_image'):
+            best_product['image_base64'] = get_product_image_base64(best_product['image_url'])  # Bild erst für den endgültigen Treffer laden
     return best_product
 
+def detection_boxes(det):
+    """
+    Wandelt Detektionen in eine JSON-taugliche Liste um.
+    
+    Args:
+        det (torch.Tensor): Die Detektionen (x1, y1, x2, y2, Konfidenz, Klasse).
+    
+    Returns:
+        list: Pro Detektion [x1, y1, x2, y2, Konfidenz, Klasse] in den Koordinaten des dekodierten Bildes.
+    """
+    return [[int(x1), int(y1), int(x2), int(y2), round(float(conf), 4), int(cls)] for x1, y1, x2, y2, conf, cls in det.tolist()]
+
+def pipeline_events(im0):
+    """
+    Führt Objekterkennung, OCR und Produktsuche für ein dekodiertes Bild aus und liefert die
+    Zwischenergebnisse, sobald sie vorliegen.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+    
+    Yields:
+        tuple: ('detections', Boxen aus `detection_boxes`), pro Flasche ('bottle', (Text, Ausschnitt als
+            JPEG-Bytes, Produkt oder None)) und zuletzt ('done', Ergebnis wie bei `run_pipeline`).
+    """
+    windows = detection_windows(im0)  # Kacheln einmal bestimmen, für Objekterkennung und Auswahl der Ausschnitte
+    det = detect_objects(loaded_model, im0, (640, 640), 0.25, 0.45, "cpu", windows)  # Objekterkennung durchführen
+    boxes = detection_boxes(det)
+    yield 'detections', boxes
+
+    bottle_texts, images_jpeg, matches, ocr_stats = [], [], [], {}
+    bottles = post_process_images(im0, det, ocr_stats, windows)  # OCR und Produktsuche auf den erkannten Objekten
+    for bottle in metrics.stage_iter('post_process', bottles):  # Ohne die Zeit, in der der Aufrufer eine Flasche verarbeitet
+        bottle_texts.append(bottle[0])
+        images_jpeg.append(bottle[1])
+        matches.append(bottle[2])
+        yield 'bottle', bottle
+
+    found_products = [product for product in matches if product is not None]
+    yield 'done', {'texts': bottle_texts, 'products': found_products, 'images_jpeg': images_jpeg, 'ocr': ocr_stats,
+                   'boxes': boxes, 'matches': matches}
+
+def run_pipeline(im0):
+    """
+    Führt Objekterkennung, OCR und Produktsuche für ein dekodiertes Bild aus.
+    
+    Args:
+        im0 (numpy.ndarray): Das Bild im BGR-Format.
+    
+    Returns:
+        dict: Die erkannten Texte, die gefundenen Produkte (ohne Bilddaten), die Ausschnitte als JPEG-Bytes,
+            die Zähler der Texterkennung, die Boxen und das Produkt (oder None) pro Flasche.
+    """
+    for event, payload in pipeline_events(im0):
+        if event == 'done':
+            return payload
+
+def process_upload(image_bytes):
+    """
+    Verarbeitet hochgeladene Bilddaten und nutzt dabei den Ergebniscache.
+    
+    Gleiche Bilddaten werden über ihren SHA-256-Hash erkannt, optional auch nahezu gleiche Bilder
+    über einen perzeptuellen Hash. Die Ergebnisse sind an die Version des Produktkatalogs gebunden.
+    
+    Args:
+        image_bytes (bytes): Der Inhalt der hochgeladenen Bilddatei.
+    
+    Returns:
+        dict: Das Ergebnis von `run_pipeline` oder None, wenn die Daten kein gültiges Bild sind.
+    """
+    version = catalog.current.version  # Version zu Beginn festhalten, falls der Katalog währenddessen wechselt
+    key = hashlib.sha256(image_bytes).hexdigest()
+    result = result_cache.get(key, version)
+    if result is not None:
+        metrics.count('result_cache_hits')
+        return result
+
+    with metrics.stage('decode'):
+        im0 = decode_image(image_bytes)  # Bild direkt im Speicher dekodieren
+    if im0 is None:
+        return None
+
+    image_hash = None
+    if RESULT_CACHE_PERCEPTUAL:
+        image_hash = perceptual_hash(im0)
+        result = result_cache.get_similar(image_hash, version)
+        if result is not None:
+            metrics.count('result_cache_hits')
+            return result
+
+    metrics.count('result_cache_misses')
+    result = run_pipeline(im0)
+    store_result(key, result, version, image_hash)
+    return result
+
+def process_upload_events(image_bytes):
+    """
+    Verarbeitet hochgeladene Bilddaten wie `process_upload`, liefert die Zwischenergebnisse aber einzeln.
+    
+    Ein Ergebnis aus dem Cache wird in derselben Abfolge wiedergegeben.
+    
+    Args:
+        image_bytes (bytes): Der Inhalt der hochgeladenen Bilddatei.
+    
+    Yields:
+        tuple: Die Ereignisse wie bei `pipeline_events` oder ('error', Fehlermeldung), wenn die Daten kein gültiges Bild sind.
+    """
+    version = catalog.current.version
+    key = hashlib.sha256(image_bytes).hexdigest()
+    result = result_cache.get(key, version)
+    if result is None:
+        with metrics.stage('decode'):
+            im0 = decode_image(image_bytes)
+        if im0 is None:
+            yield 'error', 'Invalid image'
+            return
+        image_hash = perceptual_hash(im0) if RESULT_CACHE_PERCEPTUAL else None
+        if image_hash is not None:
+            result = result_cache.get_similar(image_hash, version)
+
+    if result is not None:
+        metrics.count('result_cache_hits')
+        yield 'detections', result['boxes']
+        for bottle in zip(result['texts'], result['images_jpeg'], result['matches']):
+            yield 'bottle', bottle
+        yield 'done', result
+        return
+
+    metrics.count('result_cache_misses')
+    for event, payload in pipeline_events(im0):
+        if event == 'done':
+            store_result(key, payload, version, image_hash)
+        yield event, payload
+
+def store_result(key, result, version, image_hash=None):
+    """
+    Legt ein Ergebnis von `run_pipeline` im Ergebniscache ab.
+    
+    Args:
+        key (str): Der SHA-256-Hash der Bilddaten.
+        result (dict): Das Ergebnis.
+        version (str): Die Version des Produktkatalogs, mit der das Ergebnis berechnet wurde.
+        image_hash (int, optional): Der perzeptuelle Hash des Bildes.
+    """
+    size = sum(len(image) for image in result['images_jpeg']) + len(json.dumps(result['products'])) + len(json.dumps(result['texts']))
+    result_cache.put(key, result, size, version, image_hash)
+
+def process_batch(uploads):
+    """
+    Verarbeitet die Bilder von /process/batch fensterweise und liefert jedes Ergebnis, sobald es vorliegt.
+    
+    Pro Fenster von `BATCH_WINDOW_SIZE` Bildern läuft die Objekterkennung in einem gemeinsamen
+    Vorwärtsdurchlauf und die Texterkennung gemeinsam über die Ausschnitte aller Bilder des Fensters.
+    Es liegen immer nur die Bilder eines Fensters im Speicher. Ergebnisse aus dem Cache und
+    fehlerhafte Bilder werden sofort geliefert. Da alle Ausschnitte gemeinsam gelesen werden,
+    entfällt der vorzeitige Abbruch der Texterkennung.
+    
+    Args:
+        uploads (iterable): Nummer, Name, Inhalt (oder None) und Fehlermeldung (oder None) pro Bild.
+    
+    Yields:
+        tuple: Nummer, Name, Ergebnis wie bei `run_pipeline` (oder None) und Fehlermeldung (oder None) pro Bild.
+    """
+    for window in windows(uploads, BATCH_WINDOW_SIZE):
+        version = catalog.current.version
+        pending = []
+        for index, name, image_bytes, error in window:
+            if error is not None:
+                yield index, name, None, error
+                continue
+            key = hashlib.sha256(image_bytes).hexdigest()
+            result = result_cache.get(key, version)
+            if result is not None:
+                metrics.count('result_cache_hits')
+                yield index, name, result, None
+                continue
+            with metrics.stage('decode'):
+                im0 = decode_image(image_bytes)
+            if im0 is None:
+                yield index, name, None, 'Invalid image'
+                continue
+            image_hash = None
+            if RESULT_CACHE_PERCEPTUAL:
+                image_hash = perceptual_hash(im0)
+                result = result_cache.get_similar(image_hash, version)
+                if result is not None:
+                    metrics.count('result_cache_hits')
+                    yield index, name, result, None
+                    continue
+            metrics.count('result_cache_misses')
+            pending.append((index, name, key, image_hash, im0))
+        if not pending:
+            continue
+
+        windows = [detection_windows(im0) for *_, im0 in pending]
+        dets = detect_images(loaded_model, [im0 for *_, im0 in pending], (640, 640), 0.25, 0.45, "cpu", windows)
+        crops, stats = [], []
+        with metrics.stage('crop'):
+            for (*_, im0), det, image_windows in zip(pending, dets, windows):
+                ocr_stats = init_ocr_stats({}, det)
+                crops.append(select_crops(im0, det, ocr_stats, image_windows))
+                stats.append(ocr_stats)
+                metrics.count('crops_skipped_small', ocr_stats['skipped_small'])
+                metrics.count('crops_skipped_limit', ocr_stats['skipped_limit'])
+        all_crops = [crop for image_crops in crops for crop in image_crops]
+        with metrics.stage('ocr'):
+            ocr_results = recognize_texts(all_crops)  # Alle Ausschnitte des Fensters gemeinsam lesen
+        metrics.count('crops_ocr', len(all_crops))
+
+        offset = 0
+        for (index, name, key, image_hash, _), det, image_crops, ocr_stats in zip(pending, dets, crops, stats):
+            bottle_texts, images_jpeg, matches = [], [], []
+            with metrics.stage('post_process'):
+                for cropped_image, (recognized_text, _) in zip(image_crops, ocr_results[offset:offset + len(image_crops)]):
+                    match = match_crop(cropped_image, recognized_text)
+                    if match is None:
+                        continue
+                    bottle_texts.append(recognized_text)
+                    images_jpeg.append(match[0])
+                    matches.append(match[1])
+            offset += len(image_crops)
+            ocr_stats['processed'] = len(image_crops)
+            found_products = [product for product in matches if product is not None]
+            result = {'texts': bottle_texts, 'products': found_products, 'images_jpeg': images_jpeg, 'ocr': ocr_stats,
+                      'boxes': detection_boxes(det), 'matches': matches}
+            store_result(key, result, version, image_hash)
+            yield index, name, result, None
+
+def build_payload(bottle_texts, found_products, images_jpeg, response_format='json', timings=None, ocr_stats=None):
+    """
+    Erstellt den JSON-Inhalt der Antwort im gewünschten Format.
+    
+    Args:
+        bottle_texts (list): Die erkannten Texte.
+        found_products (list): Die gefundenen Produkte.
+        images_jpeg (list): Die Ausschnitte als JPEG-Bytes.
+        response_format (str): Das Antwortformat, bei 'multipart' ohne Bilddaten.
+        timings (dict, optional): Die Aufschlüsselung der Verarbeitungszeiten, die der Antwort beigefügt wird.
+        ocr_stats (dict, optional): Die Zähler der Texterkennung (gelesene, übersprungene Ausschnitte, vorzeitiger Abbruch).
+    
+    Returns:
+        dict: Der Inhalt der Antwort.
+    """
+    response = {
+        'bottles': len(found_products),
+        'text': ", ".join([f"'{text}'" for text in bottle_texts]),
+        'results': found_products
+    }
+    if ocr_stats is not None:
+        response['ocr'] = ocr_stats
+    if timings is not None:
+        response['timings'] = timings
+
+    if response_format == 'json':
+        with metrics.stage('product_image'):
+            response['results'] = [dict(product, image_base64=get_product_image_base64(product['image_url'])) for product in found_products]
+        response['images_base64'] = [base64.b64encode(image).decode('utf-8') for image in images_jpeg]
+    elif response_format == 'lean':
+        response['image_urls'] = [url_for('serve_crop', filename=crop_store.put(image), _external=True) for image in images_jpeg]
+    return response
+
+def build_response(bottle_texts, found_products, images_jpeg, response_format='json', timings=None, ocr_stats=None):
+    """
+    Erstellt die Antwort von /process im gewünschten Format.
+    
+    'json' enthält alle Bilder Base64-codiert. 'lean' verweist auf die Produktbilder über `image_url`
+    und auf die Ausschnitte über kurzlebige URLs. 'multipart' liefert die Ausschnitte als binäre Teile
+    einer multipart/mixed-Antwort nach dem JSON-Teil.
+    
+    Args:
+        bottle_texts (list): Die erkannten Texte.
+        found_products (list): Die gefundenen Produkte.
+        images_jpeg (list): Die Ausschnitte als JPEG-Bytes.
+        response_format (str): Das Antwortformat.
+        timings (dict, optional): Die Aufschlüsselung der Verarbeitungszeiten, die der Antwort beigefügt wird.
+        ocr_stats (dict, optional): Die Zähler der Texterkennung (gelesene, übersprungene Ausschnitte, vorzeitiger Abbruch).
+    
+    Returns:
+        Response: Die HTTP-Antwort.
+    """
+    response = build_payload(bottle_texts, found_products, images_jpeg, response_format, timings, ocr_stats)
+    if response_format in ('json', 'lean'):
+        return jsonify(response)
+
+    boundary = secrets.token_hex(16)
+    response['image_parts'] = [f'crop-{i}' for i in range(len(images_jpeg))]  # Content-IDs der binären Teile
+    parts = [b'Content-Type: application/json\r\n\r\n' + json.dumps(response).encode('utf-8')]
+    for content_id, image in zip(response['image_parts'], images_jpeg):
+        parts.append(f'Content-Type: image/jpeg\r\nContent-ID: <{content_id}>\r\nContent-Length: {len(image)}\r\n\r\n'.encode('utf-8') + image)
+    delimiter = f'\r\n--{boundary}\r\n'.encode('utf-8')
+    body = f'--{boundary}\r\n'.encode('utf-8') + delimiter.join(parts) + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return Response(body, mimetype=f'multipart/mixed; boundary={boundary}')
+
+"""
+   Start
+"""
+
+def warmup_detector(runs=WARMUP_RUNS):
+    """
+    Führt Aufwärmdurchläufe der Objekterkennung aus, einschließlich eines vollen Bündels des Schedulers.
+    
+    Ist das Modell nicht in der Lage, volle Bündel zu verarbeiten, wird die Bündelung deaktiviert.
+    
+    Args:
+        runs (int): Die Anzahl der Durchläufe.
+    """
+    global detection_scheduler
+    dummy = np.full((640, 640, 3), 114, dtype=np.uint8)  # Graues Bild in der Eingabegröße des Modells
+    for _ in range(runs):
+        detect_objects(loaded_model, dummy, (640, 640), 0.25, 0.45, "cpu")
+
+    if detection_scheduler is not None and runs > 0:
+        img = torch.from_numpy(prepare_image(dummy, [640, 640], loaded_model.stride, False)).float() / 255.0
+        futures = [detection_scheduler.submit(img, 0.25, 0.45) for _ in range(detection_scheduler.max_batch_size)]
+        try:
+            for future in futures:
+                future.result()
+        except Exception as e:
+            print(f'Gebündelte Objekterkennung nicht möglich, Bündelung wird deaktiviert. Grund: {e}')
+            detection_scheduler = None
+
+def warmup_reader(runs=WARMUP_RUNS):
+    """
+    Führt Aufwärmdurchläufe der Texterkennung auf einem künstlichen Etikett aus.
+    
+    Args:
+        runs (int): Die Anzahl der Durchläufe.
+    """
+    label = np.full((64, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(label, 'WARMUP 2024', (10, 44), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)  # Text, damit auch die Erkennung läuft
+    for _ in range(runs):
+        recognize_texts([label])
+
+def startup(offline=OFFLINE_STARTUP, warmup_runs=WARMUP_RUNS):
+    """
+    Lädt Produkte und Modelle genau einmal, wärmt sie auf und gibt die Ladezeit jeder Stufe aus.
+    
+    Args:
+        offline (bool): Ob Modelle ausschließlich aus lokalen Dateien geladen werden.
+        warmup_runs (int): Die Anzahl der Aufwärmdurchläufe.
+    
+    Returns:
+        dict: Die Dauer jeder Stufe in Sekunden.
+    """
+    global loaded_model, reader, detection_scheduler
+    timings = {}
+
+    start = time.perf_counter()
+    catalog.load()  # Produkte beim Start laden und den Index für den Produktabgleich aufbauen
+    timings['products'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_image_cache(catalog.current.products)  # Lokale Produktbilder vorab in den Cache laden
+    timings['image_cache'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded_model = load_detector(DETECTION_WEIGHTS[DETECTION_BACKEND], "cpu", offline=offline)  # Modell des gewählten Backends laden
+    if BATCH_INFERENCE:
+        detection_scheduler = BatchScheduler(loaded_model, BATCH_MAX_SIZE, BATCH_MAX_WAIT)  # Bündelung paralleler Anfragen
+    timings['detector'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reader = load_reader(offline)  # Laden der EasyOCR-Bibliothek mit Englisch und Deutsch
+    timings['ocr'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warmup_detector(warmup_runs)
+    timings['warmup_detector'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warmup_reader(warmup_runs)
+    timings['warmup_ocr'] = time.perf_counter() - start
+
+    for stage, seconds in timings.items():
+        print(f'Start {stage}: {seconds:.2f}s')
+    return timings
+
+def create_app():
+    """
+    Erzeugt die Anwendung für einen WSGI-Server mit mehreren Worker-Prozessen (siehe `gunicorn.conf.py`).
+    
+    Produkte und Modelle werden einmalig im Hauptprozess geladen. Die Worker-Prozesse entstehen
+    per fork und teilen sich diesen Speicher (copy-on-write). Das Aufwärmen übernimmt jeder Worker
+    selbst in `configure_worker`, damit im Hauptprozess keine Thread-Pools entstehen.
+    
+    Returns:
+        Flask: Die initialisierte Anwendung.
+    """
+    startup(warmup_runs=0)
+    return app
+
+def configure_worker(num_threads, cpus=None, warmup_runs=WARMUP_RUNS):
+    """
+    Richtet einen Worker-Prozess nach dem fork ein.
+    
+    Args:
+        num_threads (int): Die Anzahl der Threads für Operationen innerhalb eines Torch-Operators.
+        cpus (list, optional): Die CPU-Kerne, an die der Worker gebunden wird.
+        warmup_runs (int): Die Anzahl der Aufwärmdurchläufe.
+    """
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)  # Worker an feste Kerne binden
+    torch.set_num_threads(num_threads)  # Feste Thread-Anzahl pro Worker, damit sich die Worker die Kerne teilen
+    catalog.start()  # Jeder Worker überwacht den Produktkatalog selbst
+    warmup_detector(warmup_runs)
+    warmup_reader(warmup_runs)
+
 """
    API-Routen
 """
@@ -268,50 +1301,182 @@ def process_image():
     if 'image' not in request.files:
         return jsonify({'error': 'No image provided'}), 400  # Überprüfung, ob ein Bild hochgeladen wurde
 
-    found_products = []
+    response_format = request.args.get('format', 'json')  # Antwortformat, standardmäßig JSON mit Base64-Bildern
+    if response_format not in RESPONSE_FORMATS:
+        return jsonify({'error': 'Unknown response format'}), 400
+    include_timings = request.args.get('timings') in ('1', 'true')  # Optionale Aufschlüsselung der Verarbeitungszeiten
 
-    file = request.files['image']
-    file_path = os.path.join(IMAGE_DIRECTORIES['input'], file.filename)  # Speichern der Datei
-    file.save(file_path)
+    with metrics.track_request() as timings:
+        result = process_upload(request.files['image'].read())  # Bild verarbeiten oder Ergebnis aus dem Cache holen
+        if result is None:
+            return jsonify({'error': 'Invalid image'}), 400
 
-    resized_image_path = resize_image(file_path)  # Bild skalieren
-    _, _, im0s, det = detect_objects(loaded_model, resized_image_path, (640, 640), 0.25, 0.45, "cpu")  # Objekterkennung durchführen
-    bottle_texts, images_base64 = post_process_images(im0s, det)  # OCR auf den erkannten Objekten ausführen
+        with metrics.stage('response'):
+            return build_response(result['texts'], result['products'], result['images_jpeg'], response_format,
+                                  timings.as_dict() if include_timings else None, result['ocr']), 200
 
-    if len(im0s) > 0:
-        for bottle_text in bottle_texts:
-            matched_product = find_products(bottle_text) # Produkte basierend auf dem OCR-Text suchen
-            found_products.append(matched_product) if matched_product is not None else None
 
-        text_summary = ", ".join([f"'{text}'" for text in bottle_texts])
-        response = {
-            'bottles': len(found_products),
-            'text': text_summary,
-            'results': found_products,
-            'images_base64': images_base64
-        }
-    else:
-        response = {
-            'bottles': 0,
-            'text': "-",
-            'results': [],
-            'images_base64': []
-        }
+@app.route('/process/stream', methods=['POST'])
+def process_image_stream():
+    """
+    Verarbeitet ein Bild wie /process und streamt die Zwischenergebnisse als NDJSON, sobald sie vorliegen.
+    
+    Die erste Zeile (`detections`) enthält die Boxen der Objekterkennung, danach folgt pro gelesener
+    Flasche eine Zeile (`bottle`) mit Text, Produkt und Ausschnitt. Die letzte Zeile (`summary`)
+    entspricht der Antwort von /process im gewählten Format.
+    
+    Returns:
+        Response: Die gestreamte NDJSON-Antwort.
+    """
+    api_key_header = request.headers.get('X-API-KEY')
+    if not api_key_header or api_key_header.split()[-1] != API_KEY:
+        return jsonify({'error': 'Unauthorized access'}), 401
+
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
 
-    clean_up_images(IMAGE_DIRECTORIES)
-    return jsonify(response), 200
+    response_format = request.args.get('format', 'json')
+    if response_format not in STREAM_RESPONSE_FORMATS:
+        return jsonify({'error': 'Unknown response format'}), 400
+    include_timings = request.args.get('timings') in ('1', 'true')
+    image_bytes = request.files['image'].read()
 
+    def generate():
+        summary = None
+        with metrics.track_request('stream_request') as timings:  # Eigene Stufe, die Zwischenzeilen liest der Client während der Messung
+            image_urls = []
+            for event, payload in process_upload_events(image_bytes):
+                if event == 'error':
+                    yield {'event': 'error', 'error': payload}
+                    return
+                if event == 'detections':
+                    yield {'event': 'detections', 'count': len(payload), 'boxes': payload}
+                elif event == 'bottle':
+                    bottle_text, image_jpeg, matched_product = payload
+                    line = {'event': 'bottle', 'index': len(image_urls), 'text': bottle_text, 'result': matched_product}
+                    if response_format == 'json':
+                        if matched_product is not None:
+                            with metrics.stage('product_image'):
+                                line['result'] = dict(matched_product, image_base64=get_product_image_base64(matched_product['image_url']))
+                        line['image_base64'] = base64.b64encode(image_jpeg).decode('utf-8')
+                        image_urls.append(None)
+                    else:
+                        line['image_url'] = url_for('serve_crop', filename=crop_store.put(image_jpeg), _external=True)
+                        image_urls.append(line['image_url'])
+                    yield line
+                else:
+                    summary_format = response_format if response_format == 'json' else 'multipart'  # Ausschnitte bei 'lean' nicht erneut ablegen
+                    line = build_payload(payload['texts'], payload['products'], payload['images_jpeg'], summary_format,
+                                         timings.as_dict() if include_timings else None, payload['ocr'])
+                    if response_format == 'lean':
+                        line['image_urls'] = image_urls
+                    summary = dict(line, event='summary')
+        if summary is not None:
+            yield summary  # Erst nach dem Ende der Messung, das Lesen der letzten Zeile zählt nicht mehr mit
+
+    events = generate()
+    first = next(events)  # Bis zu den Boxen verarbeiten, damit ungültige Bilder noch mit Status 400 beantwortet werden
+    if first['event'] == 'error':
+        events.close()
+        return jsonify({'error': first['error']}), 400
+    lines = (json.dumps(line) + '\n' for line in chain([first], events))
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+@app.route('/process/batch', methods=['POST'])
+def process_batch_images():
+    """
+    Verarbeitet viele Bilder in einer Anfrage und streamt pro Bild eine Zeile NDJSON, sobald es fertig ist.
+    
+    Die Bilder werden als beliebig viele Dateien einer multipart-Anfrage hochgeladen, auch als ZIP- oder
+    TAR-Archiv, oder als Archiv direkt im Anfragekörper. Jede Zeile enthält `index` und `name` des Bildes
+    und entweder die Felder der Antwort von /process oder `error`. Die letzte Zeile fasst die Anfrage zusammen.
+    
+    Returns:
+        Response: Die gestreamte NDJSON-Antwort.
+    """
+    api_key_header = request.headers.get('X-API-KEY')
+    if not api_key_header or api_key_header.split()[-1] != API_KEY:
+        return jsonify({'error': 'Unauthorized access'}), 401
+
+    response_format = request.args.get('format', 'json')
+    if response_format not in STREAM_RESPONSE_FORMATS:
+        return jsonify({'error': 'Unknown response format'}), 400
+    include_timings = request.args.get('timings') in ('1', 'true')
+
+    files = [storage for key in request.files for storage in request.files.getlist(key)]
+    if not files and request.mimetype in BATCH_ARCHIVE_TYPES:
+        spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)  # Große Archive landen in einer temporären Datei
+        shutil.copyfileobj(request.stream, spool)
+        files = [FileStorage(spool, filename='upload', content_type=request.mimetype)]
+    if not files:
+        return jsonify({'error': 'No images provided'}), 400
+    files = detach_uploads(files)  # Sonst schließt Flask die Dateien, bevor die Antwort gestreamt wird
+
+    truncated = False
+
+    def numbered(uploads):
+        nonlocal truncated
+        for index, upload in enumerate(islice(uploads, BATCH_MAX_IMAGES + 1)):  # Ein Bild mehr zeigt eine Kürzung an
+            if index == BATCH_MAX_IMAGES:
+                truncated = True
+                return
+            yield (index, *upload)
+
+    def generate():
+        images, failed = 0, 0
+        with metrics.track_request('batch_request') as timings:
+            for index, name, result, error in process_batch(numbered(iter_uploads(files, BATCH_MAX_IMAGE_BYTES))):
+                line = {'index': index, 'name': name}
+                if error is not None:
+                    line['error'] = error
+                    failed += 1
+                else:
+                    line.update(build_payload(result['texts'], result['products'], result['images_jpeg'], response_format, ocr_stats=result['ocr']))
+                images += 1
+                yield json.dumps(line) + '\n'
+            summary = {'done': True, 'images': images, 'failed': failed, 'truncated': truncated}
+        if include_timings:
+            summary['timings'] = timings.as_dict()
+        yield json.dumps(summary) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(lambda: close_uploads(files))  # Temporäre Dateien erst nach dem Streamen freigeben
+    return response
+
+@app.route('/metrics')
+def serve_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/products.json')
 def serve_json_file():
-    return send_from_directory('db', 'products.json')
+    """
+    Liefert den Produktkatalog oder mit `since` nur die Änderungen seit einer früheren Version.
+    
+    Returns:
+        Response: Der Katalog, die Änderungen oder Status 304, wenn der Client bereits aktuell ist.
+    """
+    snapshot = catalog.current
+    since = request.args.get('since')
+    delta = catalog.delta(since, snapshot) if since else None
+    if delta is not None:
+        response = send_catalog_data(*delta, f'{snapshot.version}-since-{since}', snapshot.modified)
+    else:
+        response = send_catalog_data(snapshot.data, snapshot.data_gzip, snapshot.version, snapshot.modified)  # Vollständiger Katalog, auch bei unbekannter Version
+    response.headers['X-Catalog-Version'] = snapshot.version
+    return response
 
 @app.route('/db/images/<path:filename>')
 def serve_images(filename):
-    return send_from_directory('db/images', filename)
+    return send_from_directory('db/images', filename, max_age=PRODUCT_IMAGE_MAX_AGE)  # Mit Cache-Headern, ETag und Last-Modified
+
+@app.route('/crops/<filename>')
+def serve_crop(filename):
+    file_path = crop_store.path(filename)
+    if file_path is None:
+        return jsonify({'error': 'Not found'}), 404
+    return send_file(file_path, mimetype='image/jpeg', max_age=CROP_TTL)
 
 if __name__ == '__main__':
-    products = load_products()  # Produkte beim Start laden
-    create_directories(IMAGE_DIRECTORIES)  # Verzeichnisse beim Start erstellen
-    loaded_model = load_model(MODEL, "cpu")  # Modell laden
-    app.run(debug=False, host='0.0.0.0', port=56789)  # Server starten
+    startup()  # Produkte und Modelle laden und aufwärmen
+    catalog.start()  # Änderungen an `products.json` im Hintergrund übernehmen
+    app.run(debug=False, host='0.0.0.0', port=56789, threaded=True)  # Server starten
@@ -0,0 +1,155 @@
+import os
+import tarfile
+import zipfile
+from io import BytesIO
+from itertools import islice
+from werkzeug.datastructures import FileStorage
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_image_name(name):
+    """
+    Prüft, ob ein Eintrag eines Archivs ein Bild ist. Versteckte Dateien (z. B. `__MACOSX/._bild.jpg`) werden übergangen.
+
+    Args:
+        name (str): Der Pfad des Eintrags.
+
+    Returns:
+        bool: Ob der Eintrag als Bild verarbeitet wird.
+    """
+    base = os.path.basename(name)
+    return bool(base) and not base.startswith('.') and '__MACOSX' not in name and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def is_archive(storage):
+    """
+    Erkennt hochgeladene Archive an Dateiendung oder Inhaltstyp.
+
+    Args:
+        storage (FileStorage): Die hochgeladene Datei.
+
+    Returns:
+        bool: Ob die Datei als ZIP- oder TAR-Archiv gelesen wird.
+    """
+    name = (storage.filename or '').lower()
+    return name.endswith(ARCHIVE_EXTENSIONS) or storage.mimetype in ('application/zip', 'application/x-tar', 'application/gzip')
+
+
+def iter_archive(stream, archive_name, max_bytes):
+    """
+    Liest die Bilder eines ZIP- oder TAR-Archivs nacheinander, ohne das Archiv zu entpacken.
+
+    ZIP-Archive werden über ihr Inhaltsverzeichnis gelesen, TAR-Archive (auch komprimiert) als Strom.
+    Es liegt immer nur ein Bild im Speicher.
+
+    Args:
+        stream (file): Das Archiv als Datei-Objekt.
+        archive_name (str): Der Name des Archivs für Fehlermeldungen.
+        max_bytes (int): Die maximale Größe eines Bildes in Bytes.
+
+    Yields:
+        tuple: Name, Inhalt (oder None) und Fehlermeldung (oder None) pro Bild.
+    """
+    try:
+        if zipfile.is_zipfile(stream):
+            stream.seek(0)
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not is_image_name(info.filename):
+                        continue
+                    if info.file_size > max_bytes:
+                        yield info.filename, None, 'Image too large'
+                        continue
+                    yield info.filename, archive.read(info), None
+            return
+
+        stream.seek(0)
+        with tarfile.open(fileobj=stream, mode='r|*') as archive:  # Streaming-Modus, ohne wahlfreien Zugriff
+            for member in archive:
+                if not member.isfile() or not is_image_name(member.name):
+                    continue
+                if member.size > max_bytes:
+                    yield member.name, None, 'Image too large'
+                    continue
+                yield member.name, archive.extractfile(member).read(), None
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError):
+        yield archive_name, None, 'Invalid archive'
+
+
+def iter_uploads(files, max_bytes):
+    """
+    Liefert die Bilder aller hochgeladenen Dateien und Archive in der Reihenfolge des Uploads.
+
+    Die Bilder werden erst beim Abruf gelesen. Große Uploads legt Werkzeug in temporären Dateien ab,
+    sodass der Speicherbedarf nur von den gerade verarbeiteten Bildern abhängt.
+
+    Args:
+        files (list): Die hochgeladenen Dateien (`FileStorage`).
+        max_bytes (int): Die maximale Größe eines Bildes in Bytes.
+
+    Yields:
+        tuple: Name, Inhalt (oder None) und Fehlermeldung (oder None) pro Bild.
+    """
+    for storage in files:
+        name = storage.filename or storage.name
+        if is_archive(storage):
+            yield from iter_archive(storage.stream, name, max_bytes)
+            continue
+        data = storage.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            yield name, None, 'Image too large'
+        else:
+            yield name, data, None
+
+
+def detach_uploads(files):
+    """
+    Löst die hochgeladenen Dateien von der Anfrage, damit sie in einer gestreamten Antwort lesbar bleiben.
+
+    Flask schließt beim Abbau des Anfragekontexts alle Dateien der Anfrage, bevor eine gestreamte
+    Antwort gelesen wird. Die Datenströme werden deshalb in neue `FileStorage`-Objekte übernommen und
+    in der Anfrage durch leere ersetzt. Geschlossen werden sie danach mit `close_uploads`.
+
+    Args:
+        files (list): Die hochgeladenen Dateien (`FileStorage`) der Anfrage.
+
+    Returns:
+        list: Die übernommenen Dateien in derselben Reihenfolge.
+    """
+    detached = []
+    for storage in files:
+        detached.append(FileStorage(storage.stream, storage.filename, storage.name, headers=storage.headers))
+        storage.stream = BytesIO()  # Die Anfrage schließt nur noch den leeren Ersatz
+    return detached
+
+
+def close_uploads(files):
+    """
+    Schließt die mit `detach_uploads` übernommenen Dateien und löscht damit ihre temporären Dateien.
+
+    Args:
+        files (list): Die übernommenen Dateien (`FileStorage`).
+    """
+    for storage in files:
+        storage.close()
+
+
+def windows(iterable, size):
+    """
+    Teilt eine Folge in aufeinanderfolgende Fenster fester Größe auf, ohne sie vollständig zu lesen.
+
+    Args:
+        iterable (iterable): Die Folge.
+        size (int): Die maximale Größe eines Fensters.
+
+    Yields:
+        list: Die Elemente des nächsten Fensters.
+    """
+    iterator = iter(iterable)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
@@ -0,0 +1,437 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import torch
+import backend
+import metrics
+from inference import BatchScheduler
+
+PALETTE_HUES = 18  # Anzahl der Farbtöne (Schritte von 10 im OpenCV-HSV-Raum)
+PALETTE_VALUES = (255, 160)  # Helligkeitsstufen der Flaschenfarben
+SATURATION_THRESHOLD = 0.35  # Mindestsättigung (0-1), ab der ein Pixel zu einer Flasche gehört
+DISTRACTOR_TEXTS = ['mineralwasser classic 1,0 l', 'apfelschorle naturtrueb', 'orangensaft 100% direktsaft', 'pfand 0,25']
+SHORT_TEXTS = ['ok', 'ab']  # Zu kurz für die Produktsuche
+BRANDS = ['Glen', 'Old', 'Royal', 'Black', 'Highland', 'Golden', 'Silver', 'Baron', 'Kings', 'Captain', 'Château', 'Casa']
+KINDS = ['Whisky', 'Vodka', 'Gin', 'Rum', 'Tequila', 'Cognac', 'Brandy', 'Liqueur', 'Bourbon', 'Wine', 'Sherry', 'Porto']
+ADDITIONS = ['Reserve', 'Single Malt', 'Blended', 'Spiced', 'Dry', 'Extra Old', 'Select', 'Cask Strength', 'Original', 'Premium']
+SIMILAR_CHARACTERS = {'o': '0', 'i': '1', 'e': '3', 'a': '4', 's': '5', 't': '7', 'b': '8'}
+STAGES = ('request', 'decode', 'detect', 'detect_model', 'detect_nms', 'post_process', 'crop', 'ocr', 'encode',
+          'find_products', 'match_scoring')
+
+"""
+   Synthetische Daten
+"""
+
+def palette_color(index):
+    """
+    Liefert die Farbe einer Flasche, über die der Stub der Texterkennung ihren Text zuordnet.
+
+    Args:
+        index (int): Der Index in der Palette.
+
+    Returns:
+        tuple: Die Farbe im BGR-Format.
+    """
+    hue = (index % PALETTE_HUES) * 10
+    value = PALETTE_VALUES[index // PALETTE_HUES % len(PALETTE_VALUES)]
+    color = cv2.cvtColor(np.uint8([[[hue, 255, value]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return tuple(int(channel) for channel in color)
+
+def make_shelf_image(rng, width, height, bottles, labels):
+    """
+    Zeichnet ein künstliches Regalfoto mit Flaschen in Palettenfarben, Etiketten und kleinen Störobjekten.
+
+    Args:
+        rng (numpy.random.Generator): Der Zufallsgenerator.
+        width (int): Die Breite des Bildes.
+        height (int): Die Höhe des Bildes.
+        bottles (int): Die Anzahl der Flaschen.
+        labels (list): Die Etikettentexte, deren Index zugleich der Palettenindex ist.
+
+    Returns:
+        numpy.ndarray: Das Bild im BGR-Format.
+    """
+    gradient = np.linspace(40, 90, height, dtype=np.float32)[:, None, None]
+    image = np.clip(gradient + rng.normal(0, 6, (height, width, 1)), 0, 255).astype(np.uint8).repeat(3, axis=2)  # Graues Regal mit Rauschen
+    shelf_height = height // 2
+    for y in range(shelf_height, height, shelf_height):
+        cv2.rectangle(image, (0, y - 8), (width, y + 8), (150, 150, 150), -1)  # Regalböden
+
+    slot_width = width // max(bottles, 1)
+    for slot in range(bottles):
+        index = int(rng.integers(len(labels)))
+        bottle_width = int(slot_width * rng.uniform(0.45, 0.8))
+        bottle_height = int(shelf_height * rng.uniform(0.55, 0.9))
+        x1 = slot * slot_width + int(rng.integers(0, slot_width - bottle_width + 1))
+        y2 = shelf_height * (1 + slot % 2) - 10
+        y1 = y2 - bottle_height
+        cv2.rectangle(image, (x1, y1), (x1 + bottle_width, y2), palette_color(index), -1)
+        label_top = y1 + bottle_height // 3
+        cv2.rectangle(image, (x1 + bottle_width // 8, label_top), (x1 + bottle_width * 7 // 8, label_top + bottle_height // 4),
+                      (245, 245, 245), -1)  # Weißes Etikett
+        cv2.putText(image, labels[index][:14], (x1 + bottle_width // 6, label_top + bottle_height // 8),
+                    cv2.FONT_HERSHEY_SIMPLEX, max(0.4, bottle_width / 250), (20, 20, 20), 2)
+
+    for _ in range(int(rng.integers(2, 6))):
+        x, y, size = int(rng.integers(0, width - 30)), int(rng.integers(0, height - 30)), int(rng.integers(6, 24))
+        cv2.rectangle(image, (x, y), (x + size, y + size), palette_color(int(rng.integers(len(labels)))), -1)  # Kleine Störobjekte
+    return image
+
+def make_corpus(count, width, height, bottles, labels, seed=0, quality=90):
+    """
+    Erzeugt einen festen Satz an Regalfotos als JPEG-Bytes.
+
+    Args:
+        count (int): Die Anzahl der Bilder.
+        width (int): Die Breite der Bilder.
+        height (int): Die Höhe der Bilder.
+        bottles (int): Die mittlere Anzahl an Flaschen pro Bild.
+        labels (list): Die Etikettentexte der Palette.
+        seed (int): Der Startwert des Zufallsgenerators.
+        quality (int): Die JPEG-Qualität.
+
+    Returns:
+        list: Die codierten Bilder.
+    """
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(count):
+        image = make_shelf_image(rng, width, height, max(1, int(rng.poisson(bottles))), labels)
+        corpus.append(cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return corpus
+
+def add_ocr_noise(rng, text, rate=0.1):
+    """
+    Verfälscht einen Text wie eine fehlerhafte Texterkennung (ähnliche Zeichen, fehlende Zeichen).
+
+    Args:
+        rng (numpy.random.Generator): Der Zufallsgenerator.
+        text (str): Der Originaltext.
+        rate (float): Der Anteil veränderter Zeichen.
+
+    Returns:
+        str: Der verfälschte Text.
+    """
+    characters = []
+    for char in text.lower():
+        roll = rng.random()
+        if roll < rate / 2:
+            continue  # Zeichen fehlt
+        characters.append(SIMILAR_CHARACTERS.get(char, char) if roll < rate else char)
+    return ''.join(characters)
+
+def make_labels(base_products, seed=0):
+    """
+    Legt die Texte fest, die der Stub der Texterkennung für jede Palettenfarbe liefert.
+
+    Die meisten Farben stehen für verrauschte Namen echter Produkte, einige für Texte ohne
+    passendes Produkt und einige für zu kurze Texte.
+
+    Args:
+        base_products (list): Die Produkte aus `products.json`.
+        seed (int): Der Startwert des Zufallsgenerators.
+
+    Returns:
+        list: Pro Palettenfarbe der erkannte Text.
+    """
+    rng = np.random.default_rng(seed)
+    size = PALETTE_HUES * len(PALETTE_VALUES)
+    matched = size - len(DISTRACTOR_TEXTS) - len(SHORT_TEXTS)
+    labels = [add_ocr_noise(rng, base_products[i % len(base_products)]['name']) for i in range(matched)]
+    return labels + DISTRACTOR_TEXTS + SHORT_TEXTS
+
+def make_catalog(base_products, size, seed=0):
+    """
+    Erzeugt einen Produktkatalog der gewünschten Größe aus den echten Produkten und künstlichen Namen.
+
+    Args:
+        base_products (list): Die Produkte aus `products.json`.
+        size (int): Die Anzahl der Produkte.
+        seed (int): Der Startwert des Zufallsgenerators.
+
+    Returns:
+        list: Die Produkte.
+    """
+    rng = np.random.default_rng(seed)
+    catalog = [dict(product) for product in base_products[:size]]
+    template = base_products[0]
+    while len(catalog) < size:
+        name = f"{rng.choice(BRANDS)} {rng.choice(BRANDS)} {rng.choice(KINDS)} {rng.choice(ADDITIONS)} {int(rng.integers(3, 30))}"
+        catalog.append(dict(template, name=name, description=f'{name} ({len(catalog)})'))
+    return catalog
+
+"""
+   Stub-Modelle
+"""
+
+def find_bottles(image, min_area=16):
+    """
+    Findet gesättigte Flächen in einem Bild, wie es für die Objekterkennung vorbereitet wird.
+
+    Args:
+        image (numpy.ndarray): Das Bild mit der Form (3, Höhe, Breite) und Werten zwischen 0 und 1.
+        min_area (int): Die minimale Fläche einer Fläche in Pixeln.
+
+    Returns:
+        list: Tupel aus Mittelpunkt, Breite, Höhe und Konfidenz (cx, cy, w, h, conf).
+    """
+    mask = ((image.max(axis=0) - image.min(axis=0)) > SATURATION_THRESHOLD).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = []
+    for x, y, width, height, area in stats[1:count]:  # Komponente 0 ist der Hintergrund
+        if area < min_area:
+            continue
+        conf = min(0.95, 0.3 + height / image.shape[1])  # Hohe Flaschen sind sicherer als kleine Störobjekte
+        boxes.append((x + width / 2, y + height / 2, width, height, conf))
+    return boxes
+
+class StubDetector:
+    """
+    Ersatz für `DetectMultiBackend`, der Flaschen anhand ihrer Sättigung findet und Vorhersagen im
+    Rohformat von YOLOv5 liefert, sodass Letterbox, Scheduler und Non-Max Suppression echt laufen.
+    """
+
+    def __init__(self, latency_ms=0.0, stride=32):
+        """
+        Initialisiert den Stub.
+
+        Args:
+            latency_ms (float): Die simulierte Rechenzeit des Modells pro Bild in Millisekunden.
+            stride (int): Der Stride-Wert, den das Modell meldet.
+        """
+        self.latency_ms = latency_ms
+        self.stride = stride
+        self.pt = True
+        self.names = {0: 'bottle'}
+
+    def __call__(self, imgs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(imgs) / 1000)
+        detections = [find_bottles(img) for img in imgs.cpu().numpy()]
+        pred = torch.zeros(len(imgs), max(1, max(len(boxes) for boxes in detections)), 6)  # (x, y, w, h, Objekt, Klasse)
+        for i, boxes in enumerate(detections):
+            for j, (cx, cy, width, height, conf) in enumerate(boxes):
+                pred[i, j] = torch.tensor([cx, cy, width, height, conf, 1.0])
+        return pred
+
+class StubReader:
+    """
+    Ersatz für `easyocr.Reader`, der den Text eines Ausschnitts über die Farbe der Flasche nachschlägt.
+    """
+
+    def __init__(self, labels, latency_ms=0.0):
+        """
+        Initialisiert den Stub.
+
+        Args:
+            labels (list): Pro Palettenfarbe der erkannte Text.
+            latency_ms (float): Die simulierte Rechenzeit der Texterkennung pro Ausschnitt in Millisekunden.
+        """
+        self.labels = labels
+        self.latency_ms = latency_ms
+
+    def _read(self, image):
+        height, width = image.shape[:2]
+        hsv = cv2.cvtColor(np.ascontiguousarray(image[::4, ::4]), cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.int32)
+        hsv = hsv[(hsv[:, 1] > 90) & (hsv[:, 2] > 80)]  # Nur gesättigte Pixel der Flasche
+        if len(hsv) < 20:
+            return []
+        hue_bins = np.round(hsv[:, 0] / 10).astype(np.int32) % PALETTE_HUES
+        value_bins = (hsv[:, 2] < (PALETTE_VALUES[0] + PALETTE_VALUES[1]) / 2).astype(np.int32)
+        index = int(np.bincount(value_bins * PALETTE_HUES + hue_bins).argmax())  # Häufigste Palettenfarbe
+        return [([[0, 0], [width, 0], [width, height], [0, height]], self.labels[index % len(self.labels)], 0.9)]
+
+    def readtext(self, image, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._read(np.asarray(image))
+
+    def readtext_batched(self, images, batch_size=1, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(images) / 1000)
+        return [self._read(image) for image in images]
+
+"""
+   Messung
+"""
+
+def run_request(image_bytes):
+    """
+    Verarbeitet ein Bild wie die Route `/process`, ohne Ergebniscache und Antwort.
+
+    Args:
+        image_bytes (bytes): Die codierten Bilddaten.
+
+    Returns:
+        RequestTimings: Die Dauer der Stufen und die Zähler der Anfrage.
+    """
+    with metrics.track_request() as timings:
+        with metrics.stage('decode'):
+            im0 = backend.decode_image(image_bytes)
+        backend.run_pipeline(im0)
+    return timings
+
+def summarize(values, wall_seconds=None):
+    """
+    Fasst Messwerte einer Stufe zusammen.
+
+    Args:
+        values (list): Die Dauer jeder Ausführung in Sekunden.
+        wall_seconds (float, optional): Die Gesamtdauer des Laufs für den Durchsatz.
+
+    Returns:
+        dict: Anzahl, Mittelwert, Perzentile und Durchsatz.
+    """
+    values_ms = np.array(values) * 1000
+    summary = {
+        'count': len(values),
+        'mean_ms': round(float(values_ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(values_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(values_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(values_ms, 99)), 3)
+    }
+    seconds = wall_seconds if wall_seconds is not None else float(np.sum(values))  # Ohne Gesamtdauer: Kapazität eines Threads
+    summary['throughput_per_s'] = round(len(values) / seconds, 3) if seconds > 0 else None
+    return summary
+
+def run_benchmark(corpus, base_products, catalog_size, concurrency, requests_count, seed=0):
+    """
+    Misst die Verarbeitung des Korpus mit einem Katalog gegebener Größe und gegebener Parallelität.
+
+    Args:
+        corpus (list): Die codierten Bilder.
+        base_products (list): Die Produkte aus `products.json`.
+        catalog_size (int): Die Anzahl der Produkte im Katalog.
+        concurrency (int): Die Anzahl paralleler Anfragen.
+        requests_count (int): Die Anzahl der Anfragen.
+        seed (int): Der Startwert für den Katalog.
+
+    Returns:
+        dict: Das Ergebnis des Laufs.
+    """
+    start = time.perf_counter()
+    data = json.dumps(make_catalog(base_products, catalog_size, seed)).encode('utf-8')
+    backend.catalog.swap(backend.catalog.build(data, time.time()))  # Katalog und Index wie beim Neuladen austauschen
+    index_seconds = time.perf_counter() - start
+
+    for image_bytes in corpus[:concurrency]:
+        run_request(image_bytes)  # Aufwärmen mit dem neuen Katalog
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run_request, (corpus[i % len(corpus)] for i in range(requests_count))))
+    wall_seconds = time.perf_counter() - start
+
+    stages, counts = {}, {}
+    for timings in results:
+        for stage, seconds in timings.stages.items():
+            stages.setdefault(stage, []).append(seconds)
+        for name, value in timings.counts.items():
+            counts[name] = counts.get(name, 0) + value
+
+    return {
+        'catalog_size': catalog_size,
+        'concurrency': concurrency,
+        'requests': requests_count,
+        'index_build_ms': round(index_seconds * 1000, 3),
+        'wall_s': round(wall_seconds, 3),
+        'throughput_rps': round(requests_count / wall_seconds, 3),
+        'stages': {stage: summarize(values, wall_seconds if stage == 'request' else None)
+                   for stage, values in sorted(stages.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))},
+        'counts': counts
+    }
+
+def compare_reports(report, baseline, tolerance):
+    """
+    Vergleicht die Läufe mit einem früheren Bericht.
+
+    Args:
+        report (dict): Der aktuelle Bericht.
+        baseline (dict): Der frühere Bericht.
+        tolerance (float): Die zulässige relative Verschlechterung.
+
+    Returns:
+        list: Die Beschreibungen aller Verschlechterungen über der Toleranz.
+    """
+    previous_runs = {(run['catalog_size'], run['concurrency']): run for run in baseline['runs']}
+    regressions = []
+    for run in report['runs']:
+        previous = previous_runs.get((run['catalog_size'], run['concurrency']))
+        if previous is None:
+            continue
+        name = f"Katalog {run['catalog_size']}, Parallelität {run['concurrency']}"
+        current_p95, previous_p95 = run['stages']['request']['p95_ms'], previous['stages']['request']['p95_ms']
+        if current_p95 > previous_p95 * (1 + tolerance):
+            regressions.append(f'{name}: p95 {previous_p95:.1f} ms -> {current_p95:.1f} ms')
+        if run['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: Durchsatz {previous['throughput_rps']:.2f}/s -> {run['throughput_rps']:.2f}/s")
+    return regressions
+
+def parse_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Misst Latenz und Durchsatz der Verarbeitung von /process auf künstlichen Regalfotos.')
+    parser.add_argument('--images', type=int, default=32, help='Anzahl der künstlichen Regalfotos')
+    parser.add_argument('--size', default='2016x1512', help='Größe der Regalfotos (BreitexHöhe)')
+    parser.add_argument('--bottles', type=float, default=6, help='Mittlere Anzahl an Flaschen pro Foto')
+    parser.add_argument('--catalog-sizes', type=parse_list, default=[36, 1000, 10000], help='Katalogrößen, kommagetrennt')
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 4, 8], help='Anzahl paralleler Anfragen, kommagetrennt')
+    parser.add_argument('--requests', type=int, help='Anfragen pro Lauf (Standard: Anzahl der Fotos)')
+    parser.add_argument('--detector', choices=('stub', 'real'), default='stub', help='Stub oder das konfigurierte Modell')
+    parser.add_argument('--ocr', choices=('stub', 'real'), default='stub', help='Stub oder EasyOCR')
+    parser.add_argument('--detector-ms', type=float, default=0.0, help='Simulierte Rechenzeit des Stub-Detektors pro Bild')
+    parser.add_argument('--ocr-ms', type=float, default=0.0, help='Simulierte Rechenzeit der Stub-Texterkennung pro Ausschnitt')
+    parser.add_argument('--seed', type=int, default=0, help='Startwert für Fotos und Katalog')
+    parser.add_argument('--output', help='Datei, in die der Bericht als JSON geschrieben wird')
+    parser.add_argument('--baseline', help='Früherer Bericht, mit dem verglichen wird')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Zulässige relative Verschlechterung gegenüber --baseline')
+    args = parser.parse_args()
+
+    backend.catalog.load()
+    base_products = backend.catalog.current.products
+    labels = make_labels(base_products, args.seed)
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    corpus = make_corpus(args.images, width, height, args.bottles, labels, args.seed)
+
+    if args.detector == 'real':
+        backend.loaded_model = backend.load_detector(backend.DETECTION_WEIGHTS[backend.DETECTION_BACKEND], "cpu")
+    else:
+        backend.loaded_model = StubDetector(args.detector_ms)
+    backend.detection_scheduler = BatchScheduler(backend.loaded_model, backend.BATCH_MAX_SIZE, backend.BATCH_MAX_WAIT) if backend.BATCH_INFERENCE else None
+    backend.reader = backend.load_reader() if args.ocr == 'real' else StubReader(labels, args.ocr_ms)
+    backend.warmup_detector()
+    backend.warmup_reader()
+
+    report = {
+        'config': dict(vars(args), batch_inference=backend.detection_scheduler is not None, ocr_max_crops=backend.OCR_MAX_CROPS,
+                       ocr_early_exit_score=backend.OCR_EARLY_EXIT_SCORE, source_side=backend.SOURCE_SIDE),
+        'environment': {'python': platform.python_version(), 'torch': torch.__version__, 'torch_threads': torch.get_num_threads(),
+                        'cpus': os.cpu_count(), 'platform': platform.platform()},
+        'runs': []
+    }
+    for catalog_size in args.catalog_sizes:
+        for concurrency in args.concurrency:
+            run = run_benchmark(corpus, base_products, catalog_size, concurrency, args.requests or args.images, args.seed)
+            report['runs'].append(run)
+            request = run['stages']['request']
+            print(f"Katalog {catalog_size:>6}, Parallelität {concurrency:>2}: {run['throughput_rps']:.2f} Anfragen/s, "
+                  f"p50 {request['p50_ms']:.1f} ms, p95 {request['p95_ms']:.1f} ms, p99 {request['p99_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f'Bericht gespeichert: {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare_reports(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'Verschlechterung: {regression}')
+        sys.exit(1 if regressions else 0)
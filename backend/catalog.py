@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class CatalogSnapshot:
+    """
+    Unveränderlicher Stand des Produktkatalogs mit allen daraus abgeleiteten Strukturen.
+
+    Anfragen lesen immer genau einen Stand, sodass Produktliste, Index und Version zueinander passen.
+    """
+
+    def __init__(self, products, index, data, modified):
+        """
+        Initialisiert den Stand.
+
+        Args:
+            products (list): Die Liste der Produkte.
+            index (ProductIndex): Der Index für den Produktabgleich.
+            data (bytes): Der Inhalt von `products.json`.
+            modified (float): Der Zeitpunkt der letzten Änderung der Datei als Unix-Zeitstempel.
+        """
+        self.products = products
+        self.index = index
+        self.data = data
+        self.data_gzip = gzip.compress(data, compresslevel=6)  # Einmalig komprimieren statt bei jeder Anfrage
+        self.version = hashlib.sha1(data).hexdigest()
+        self.modified = datetime.fromtimestamp(int(modified), timezone.utc)  # HTTP-Datumsangaben haben nur Sekunden
+        self.deltas = {}  # Bereits berechnete Änderungen seit einer früheren Version
+
+
+class CatalogReloader:
+    """
+    Lädt `products.json` neu, sobald sich die Datei ändert, ohne laufende Anfragen zu blockieren.
+
+    Ein Hintergrund-Thread prüft die Datei regelmäßig, baut bei einer Änderung Produktliste und Index
+    vollständig neu auf und ersetzt erst danach den aktuellen Stand mit einer einzigen Zuweisung.
+    Für Änderungsabfragen werden die Produkte der letzten Versionen vorgehalten.
+    """
+
+    def __init__(self, path, build_index, interval=2.0, history=10, on_reload=None):
+        """
+        Initialisiert den Katalog. Geladen wird erst mit `load`.
+
+        Args:
+            path (str): Der Pfad zu `products.json`.
+            build_index (callable): Baut aus der Produktliste den Index für den Produktabgleich.
+            interval (float): Der Abstand zwischen zwei Prüfungen der Datei in Sekunden.
+            history (int): Die Anzahl der Versionen, für die Änderungen abgefragt werden können.
+            on_reload (callable, optional): Wird nach jedem Austausch (nicht beim ersten Laden) mit dem neuen Stand aufgerufen.
+        """
+        self.path = path
+        self.build_index = build_index
+        self.interval = interval
+        self.history = history
+        self.on_reload = on_reload
+        self.current = None
+        self._versions = OrderedDict()  # Version -> Produkte nach Namen
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def build(self, data, modified):
+        """
+        Baut einen vollständigen Stand aus dem Inhalt von `products.json` auf.
+
+        Args:
+            data (bytes): Der Inhalt der Datei.
+            modified (float): Der Zeitpunkt der letzten Änderung als Unix-Zeitstempel.
+
+        Returns:
+            CatalogSnapshot: Der neue Stand.
+
+        Raises:
+            ValueError: Wenn die Datei kein gültiges JSON ist oder keine Liste von Produkten mit Namen enthält.
+        """
+        products = json.loads(data)
+        if not isinstance(products, list):
+            raise ValueError('products.json muss eine Liste von Produkten enthalten')
+        for position, product in enumerate(products):
+            if not isinstance(product, dict) or not isinstance(product.get('name'), str):
+                raise ValueError(f'Produkt an Position {position} hat keinen Namen')
+        return CatalogSnapshot(products, self.build_index(products), data, modified)
+
+    def swap(self, snapshot):
+        """
+        Macht einen Stand zum aktuellen Stand.
+
+        Args:
+            snapshot (CatalogSnapshot): Der neue Stand.
+        """
+        with self._lock:
+            previous = self.current
+            self._versions[snapshot.version] = {product['name']: product for product in snapshot.products}
+            self._versions.move_to_end(snapshot.version)
+            while len(self._versions) > self.history:
+                self._versions.popitem(last=False)
+            self.current = snapshot  # Einzelne Zuweisung, laufende Anfragen behalten ihren Stand
+        if self.on_reload is not None and previous is not None:
+            self.on_reload(snapshot)
+
+    def load(self):
+        """
+        Lädt die Datei, falls sie sich seit dem letzten Laden geändert hat.
+
+        Returns:
+            bool: Ob ein neuer Stand übernommen wurde.
+        """
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        self._stamp = stamp
+        if self.current is not None and hashlib.sha1(data).hexdigest() == self.current.version:
+            return False  # Nur der Zeitstempel hat sich geändert
+        self.swap(self.build(data, stat.st_mtime))
+        return True
+
+    def start(self):
+        """
+        Startet die Überwachung der Datei, auch erneut in einem per fork erzeugten Prozess.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='catalog-reloader', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self.load():
+                    print(f'Produktkatalog neu geladen: {len(self.current.products)} Produkte, Version {self.current.version[:12]}')
+            except Exception as e:  # Der Thread darf nicht enden, sonst bleibt der Katalog bis zum Neustart veraltet
+                # `load` hat sich Zeitstempel und Größe der ungültigen Datei gemerkt, erneut versucht wird erst nach einer Änderung
+                print(f'Fehler beim Neuladen des Produktkatalogs. Grund: {e}')
+
+    def delta(self, since, snapshot=None):
+        """
+        Liefert die Änderungen seit einer früheren Version.
+
+        Produkte werden über ihren Namen identifiziert. Neue und geänderte Produkte stehen in
+        `changed`, die Namen entfernter Produkte in `removed`.
+
+        Args:
+            since (str): Die Version, die der Client bereits kennt.
+            snapshot (CatalogSnapshot, optional): Der Stand, auf den sich die Änderungen beziehen.
+
+        Returns:
+            tuple: Die Änderungen als JSON-Bytes und gzip-komprimiert oder None, wenn die Version nicht mehr bekannt ist.
+        """
+        snapshot = snapshot or self.current
+        cached = snapshot.deltas.get(since)
+        if cached is not None:
+            return cached
+        with self._lock:
+            previous = self._versions.get(since)
+            current = self._versions.get(snapshot.version)
+        if previous is None or current is None:
+            return None
+
+        delta = {
+            'version': snapshot.version,
+            'since': since,
+            'changed': [product for name, product in current.items() if previous.get(name) != product],
+            'removed': [name for name in previous if name not in current]
+        }
+        data = json.dumps(delta, ensure_ascii=False).encode('utf-8')
+        snapshot.deltas[since] = (data, gzip.compress(data, compresslevel=6))
+        return snapshot.deltas[since]
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from fuzzywuzzy import fuzz
+import backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+MODES = {
+    'detect': {'OCR_MODE': 'detect'},
+    'recognize-profile': {'OCR_MODE': 'recognize', 'OCR_BAND_MODE': 'profile'},
+    'recognize-fixed': {'OCR_MODE': 'recognize', 'OCR_BAND_MODE': 'fixed'}
+}
+REFERENCE_MODE = 'detect'
+
+"""
+   Beispiele
+"""
+
+def load_crops(samples_dir, crops_only=False, limit=None):
+    """
+    Lädt die Ausschnitte, auf denen die Texterkennung verglichen wird.
+
+    Regalfotos werden wie in `/process` dekodiert und durch die Objekterkennung geschickt, bereits
+    ausgeschnittene Flaschen (`crops_only`) werden direkt verwendet.
+
+    Args:
+        samples_dir (str): Der Ordner mit den Beispielbildern.
+        crops_only (bool): Ob die Bilder bereits ausgeschnittene Flaschen sind.
+        limit (int, optional): Die maximale Anzahl an Ausschnitten.
+
+    Returns:
+        list: Tupel aus Name und Ausschnitt im BGR-Format.
+    """
+    if not crops_only:
+        backend.loaded_model = backend.load_detector(backend.DETECTION_WEIGHTS[backend.DETECTION_BACKEND], "cpu")
+
+    crops = []
+    for file_name in sorted(os.listdir(samples_dir)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(samples_dir, file_name), 'rb') as file:
+            im0 = backend.decode_image(file.read())
+        if im0 is None:
+            continue
+        if crops_only:
+            crops.append((file_name, im0))
+        else:
+            det = backend.detect_objects(backend.loaded_model, im0, (640, 640), 0.25, 0.45, "cpu")
+            stats = backend.init_ocr_stats({}, det)
+            crops.extend((f'{file_name}#{i}', crop) for i, crop in enumerate(backend.select_crops(im0, det, stats)))
+        if limit and len(crops) >= limit:
+            break
+    return crops[:limit] if limit else crops
+
+"""
+   Vergleich
+"""
+
+def run_mode(settings, crops, batch_size):
+    """
+    Liest alle Ausschnitte mit einer Einstellung der Texterkennung und sucht die passenden Produkte.
+
+    Args:
+        settings (dict): Die zu setzenden Konstanten von `backend`.
+        crops (list): Tupel aus Name und Ausschnitt.
+        batch_size (int): Die Anzahl der Ausschnitte pro Aufruf.
+
+    Returns:
+        tuple: Erkannte Texte, Namen der gefundenen Produkte (oder None) und Latenz pro Ausschnitt in Sekunden.
+    """
+    previous = {name: getattr(backend, name) for name in settings}
+    for name, value in settings.items():
+        setattr(backend, name, value)
+    try:
+        backend.recognize_texts([crops[0][1]])  # Aufwärmen
+        texts, latencies = [], []
+        for start in range(0, len(crops), batch_size):
+            batch = [crop for _, crop in crops[start:start + batch_size]]
+            started = time.perf_counter()
+            results = backend.recognize_texts(batch, batch_size)
+            latencies.extend([(time.perf_counter() - started) / len(batch)] * len(batch))
+            texts.extend(text for text, _ in results)
+    finally:
+        for name, value in previous.items():
+            setattr(backend, name, value)
+
+    products = []
+    for text in texts:
+        product = backend.find_products(text, include_image=False) if text and len(text) >= 4 else None
+        products.append(product['name'] if product else None)
+    return texts, products, latencies
+
+def compare_modes(samples_dir, crops_only=False, labels_path=None, limit=None, batch_size=backend.OCR_BATCH_SIZE):
+    """
+    Vergleicht Genauigkeit und Latenz der Texterkennung ohne eigene Textdetektion mit dem bisherigen Weg.
+
+    Die Texte und Produkte von `REFERENCE_MODE` gelten als Referenz. Mit einer Datei von erwarteten
+    Produktnamen pro Ausschnitt wird zusätzlich die Trefferquote jeder Einstellung berechnet.
+
+    Args:
+        samples_dir (str): Der Ordner mit den Beispielbildern.
+        crops_only (bool): Ob die Bilder bereits ausgeschnittene Flaschen sind.
+        labels_path (str, optional): JSON-Datei mit Name des Ausschnitts -> erwarteter Produktname.
+        limit (int, optional): Die maximale Anzahl an Ausschnitten.
+        batch_size (int): Die Anzahl der Ausschnitte pro Aufruf.
+
+    Returns:
+        dict: Der Bericht mit Textähnlichkeit, Übereinstimmung der Produkte, Trefferquote und Latenzen pro Einstellung.
+    """
+    backend.catalog.load()
+    backend.reader = backend.load_reader()
+    crops = load_crops(samples_dir, crops_only, limit)
+    if not crops:
+        raise ValueError(f'Keine Ausschnitte in {samples_dir} gefunden')
+    labels = None
+    if labels_path:
+        with open(labels_path, encoding='utf-8') as file:
+            labels = json.load(file)
+
+    outputs = {mode: run_mode(settings, crops, batch_size) for mode, settings in MODES.items()}
+    reference_texts, reference_products, _ = outputs[REFERENCE_MODE]
+    report = {'crops': len(crops), 'reference': REFERENCE_MODE, 'modes': {}}
+    for mode, (texts, products, latencies) in outputs.items():
+        similarity = [fuzz.ratio(backend.normalize_text(reference), backend.normalize_text(text))
+                      for reference, text in zip(reference_texts, texts)]
+        values = np.array(latencies) * 1000
+        entry = {
+            'text_similarity': float(np.mean(similarity)),
+            'product_agreement': float(np.mean([a == b for a, b in zip(reference_products, products)])),
+            'products_found': sum(product is not None for product in products),
+            'latency_ms_per_crop': {
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95))
+            }
+        }
+        if labels:
+            labelled = [(labels[name], product) for (name, _), product in zip(crops, products) if name in labels]
+            entry['accuracy'] = float(np.mean([expected == product for expected, product in labelled])) if labelled else None
+        report['modes'][mode] = entry
+
+    reference_latency = report['modes'][REFERENCE_MODE]['latency_ms_per_crop']['mean']
+    for entry in report['modes'].values():
+        entry['speedup'] = reference_latency / entry['latency_ms_per_crop']['mean']
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vergleicht die Texterkennung ohne eigene Textdetektion (OCR_MODE = "recognize") mit dem bisherigen Weg.')
+    parser.add_argument('samples', help='Ordner mit Regalfotos oder, mit --crops, ausgeschnittenen Flaschen')
+    parser.add_argument('--crops', action='store_true', help='Die Bilder sind bereits ausgeschnittene Flaschen')
+    parser.add_argument('--labels', help='JSON-Datei mit Name des Ausschnitts -> erwarteter Produktname')
+    parser.add_argument('--limit', type=int, help='Maximale Anzahl an Ausschnitten')
+    parser.add_argument('--batch-size', type=int, default=backend.OCR_BATCH_SIZE, help='Anzahl der Ausschnitte pro Aufruf')
+    parser.add_argument('--report', help='Datei, in die der Vergleich als JSON geschrieben wird')
+    args = parser.parse_args()
+
+    report = compare_modes(args.samples, args.crops, args.labels, args.limit, args.batch_size)
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
@@ -0,0 +1,98 @@
+import os
+import secrets
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def default_crop_dir():
+    """
+    Liefert das Standardverzeichnis für kurzlebige Ausschnitte, bevorzugt im Arbeitsspeicher (/dev/shm).
+
+    Returns:
+        str: Der Pfad des Verzeichnisses.
+    """
+    base_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base_dir, 'bottle-detector-crops')
+
+
+class CropStore:
+    """
+    Kurzlebige Ablage für ausgeschnittene Flaschen, die per URL statt inline ausgeliefert werden.
+
+    Jeder Ausschnitt erhält einen zufälligen Schlüssel, sodass sich parallele Anfragen nicht in die
+    Quere kommen. Die Dateien liegen in einem gemeinsamen Verzeichnis, damit alle Worker-Prozesse
+    eines Hosts sie ausliefern können, und werden nach Ablauf von `ttl` Sekunden gelöscht.
+    """
+
+    def __init__(self, directory=None, ttl=300, cleanup_interval=60):
+        """
+        Initialisiert die Ablage.
+
+        Args:
+            directory (str, optional): Das Verzeichnis der Ausschnitte.
+            ttl (int): Die Lebensdauer eines Ausschnitts in Sekunden.
+            cleanup_interval (int): Der minimale Abstand zwischen zwei Aufräumläufen in Sekunden.
+        """
+        self.directory = Path(directory or default_crop_dir())
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def put(self, data, suffix='.jpg'):
+        """
+        Legt einen Ausschnitt ab.
+
+        Args:
+            data (bytes): Das codierte Bild.
+            suffix (str): Die Dateiendung.
+
+        Returns:
+            str: Der Dateiname, unter dem der Ausschnitt abgerufen werden kann.
+        """
+        self.cleanup()
+        file_name = f"{secrets.token_urlsafe(16)}{suffix}"
+        temp_path = self.directory / f".{file_name}.tmp"
+        temp_path.write_bytes(data)
+        os.replace(temp_path, self.directory / file_name)  # Erst vollständig geschriebene Dateien sichtbar machen
+        return file_name
+
+    def path(self, file_name):
+        """
+        Liefert den Pfad eines noch gültigen Ausschnitts.
+
+        Args:
+            file_name (str): Der Dateiname aus `put`.
+
+        Returns:
+            Path: Der Pfad oder None, wenn der Ausschnitt nicht existiert oder abgelaufen ist.
+        """
+        if os.path.basename(file_name) != file_name or file_name.startswith('.'):
+            return None
+        file_path = self.directory / file_name
+        try:
+            if time.time() - file_path.stat().st_mtime > self.ttl:
+                return None
+        except FileNotFoundError:
+            return None
+        return file_path
+
+    def cleanup(self):
+        """
+        Löscht abgelaufene Ausschnitte, höchstens einmal pro `cleanup_interval`.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime > self.ttl:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass  # Bereits von einem anderen Worker gelöscht
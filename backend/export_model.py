@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+import numpy as np
+import torch
+import torchvision
+from models.experimental import attempt_load
+import backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+"""
+   Export
+"""
+
+def add_metadata(onnx_path, metadata):
+    """
+    Schreibt Metadaten in ein ONNX-Modell, die `DetectMultiBackend` beim Laden ausliest (Stride und Klassennamen).
+
+    Args:
+        onnx_path (str): Der Pfad zum ONNX-Modell.
+        metadata (dict): Die zu schreibenden Metadaten.
+    """
+    import onnx
+
+    model_onnx = onnx.load(onnx_path)
+    existing = [entry for entry in model_onnx.metadata_props if entry.key not in metadata]
+    del model_onnx.metadata_props[:]
+    model_onnx.metadata_props.extend(existing)
+    for key, value in metadata.items():
+        entry = model_onnx.metadata_props.add()
+        entry.key, entry.value = key, str(value)
+    onnx.save(model_onnx, onnx_path)
+
+def export_onnx(weights_path, output_path, img_size=640, opset=17):
+    """
+    Exportiert die PyTorch-Gewichte in ein ONNX-Modell mit variabler Bündelgröße.
+
+    Args:
+        weights_path (str): Der Pfad zu den PyTorch-Gewichten.
+        output_path (str): Der Pfad des ONNX-Modells.
+        img_size (int): Die Eingabegröße des Modells.
+        opset (int): Die ONNX-Opset-Version.
+
+    Returns:
+        dict: Die Metadaten des Modells.
+    """
+    model = attempt_load(weights_path, device=torch.device('cpu'), inplace=True, fuse=True)  # Laden und Fusionieren der Schichten
+    model.eval()
+    for module in model.modules():
+        if type(module).__name__ == 'Detect':
+            module.export = True  # Nur die zusammengefassten Vorhersagen ausgeben
+
+    im = torch.zeros(1, 3, img_size, img_size)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, im, output_path,
+            opset_version=opset,
+            do_constant_folding=True,
+            input_names=['images'],
+            output_names=['output0'],
+            dynamic_axes={'images': {0: 'batch'}, 'output0': {0: 'batch'}}  # Bündelgröße variabel für den Scheduler
+        )
+
+    metadata = {'stride': int(max(model.stride)), 'names': model.names}
+    add_metadata(output_path, metadata)
+    return metadata
+
+def load_samples(samples_dir, limit=None):
+    """
+    Lädt Beispielbilder so, wie sie auch die Route `/process` verarbeitet.
+
+    Args:
+        samples_dir (str): Der Ordner mit den Beispielbildern.
+        limit (int, optional): Die maximale Anzahl an Bildern.
+
+    Returns:
+        list: Tupel aus Dateiname und Bild im BGR-Format.
+    """
+    samples = []
+    for file_name in sorted(os.listdir(samples_dir)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(samples_dir, file_name), 'rb') as file:
+            im0 = backend.decode_image(file.read())
+        if im0 is not None:
+            samples.append((file_name, im0))
+        if limit and len(samples) >= limit:
+            break
+    return samples
+
+class CalibrationReader:
+    """
+    Liefert vorbereitete Beispielbilder für die statische INT8-Quantisierung.
+    """
+
+    def __init__(self, samples, input_name, stride, img_size=640):
+        self.input_name = input_name
+        self.images = iter([
+            (backend.prepare_image(im0, [img_size, img_size], stride, False)[None].astype(np.float32) / 255.0)
+            for _, im0 in samples
+        ])
+
+    def get_next(self):
+        img = next(self.images, None)
+        return None if img is None else {self.input_name: img}
+
+def quantize_int8(onnx_path, output_path, metadata, calibration_dir=None, calibration_size=100, img_size=640):
+    """
+    Quantisiert ein ONNX-Modell auf INT8.
+
+    Mit Kalibrierungsbildern werden Gewichte und Aktivierungen statisch quantisiert, was für
+    Faltungsnetze auf der CPU deutlich schneller ist. Ohne Kalibrierungsbilder werden nur die
+    Gewichte dynamisch quantisiert.
+
+    Args:
+        onnx_path (str): Der Pfad zum FP32-ONNX-Modell.
+        output_path (str): Der Pfad des quantisierten Modells.
+        metadata (dict): Die Metadaten, die in das quantisierte Modell übernommen werden.
+        calibration_dir (str, optional): Der Ordner mit Kalibrierungsbildern.
+        calibration_size (int): Die maximale Anzahl an Kalibrierungsbildern.
+        img_size (int): Die Eingabegröße des Modells.
+    """
+    import onnxruntime
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if calibration_dir:
+        input_name = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+        samples = load_samples(calibration_dir, calibration_size)
+        reader = CalibrationReader(samples, input_name, int(metadata['stride']), img_size)
+        quantize_static(onnx_path, output_path, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    else:
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    add_metadata(output_path, metadata)  # Metadaten gehen bei der Quantisierung nicht zuverlässig mit
+
+"""
+   Vergleich
+"""
+
+def match_detections(reference, candidate, iou_thres=0.5):
+    """
+    Ordnet die Detektionen zweier Modelle einander zu.
+
+    Args:
+        reference (torch.Tensor): Die Detektionen des Referenzmodells.
+        candidate (torch.Tensor): Die Detektionen des verglichenen Modells.
+        iou_thres (float): Die minimale Überlappung für eine Zuordnung.
+
+    Returns:
+        list: Die Überlappung (IoU) jeder zugeordneten Detektion.
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return []
+    iou = torchvision.ops.box_iou(reference[:, :4], candidate[:, :4])
+    matched_ious = []
+    while True:
+        best = iou.max()
+        if best < iou_thres:
+            break
+        i, j = divmod(int(iou.argmax()), iou.shape[1])
+        matched_ious.append(float(best))
+        iou[i, :] = -1  # Jede Detektion nur einmal zuordnen
+        iou[:, j] = -1
+    return matched_ious
+
+def compare_models(reference_path, candidate_path, samples_dir, limit=None, conf_thres=0.25, iou_thres=0.45):
+    """
+    Vergleicht Genauigkeit und Latenz eines exportierten Modells mit dem Referenzmodell.
+
+    Die Detektionen des Referenzmodells gelten dabei als Grundwahrheit.
+
+    Args:
+        reference_path (str): Der Pfad zum Referenzmodell (.pt).
+        candidate_path (str): Der Pfad zum verglichenen Modell.
+        samples_dir (str): Der Ordner mit den Beispielbildern.
+        limit (int, optional): Die maximale Anzahl an Bildern.
+        conf_thres (float): Der Schwellenwert für die Konfidenz.
+        iou_thres (float): Der Schwellenwert für die Non-Max Suppression.
+
+    Returns:
+        dict: Der Bericht mit Präzision, Recall, mittlerer Überlappung und Latenzen.
+    """
+    samples = load_samples(samples_dir, limit)
+    if not samples:
+        raise ValueError(f'Keine Beispielbilder in {samples_dir} gefunden')
+
+    models = {'reference': backend.load_model(reference_path, "cpu"), 'candidate': backend.load_model(candidate_path, "cpu")}
+    detections = {name: [] for name in models}
+    latencies = {name: [] for name in models}
+    for name, model in models.items():
+        backend.detect_objects(model, samples[0][1], (640, 640), conf_thres, iou_thres, "cpu")  # Aufwärmen
+        for _, im0 in samples:
+            start = time.perf_counter()
+            det = backend.detect_objects(model, im0, (640, 640), conf_thres, iou_thres, "cpu")
+            latencies[name].append(time.perf_counter() - start)
+            detections[name].append(det)
+
+    matched, reference_total, candidate_total = [], 0, 0
+    for reference, candidate in zip(detections['reference'], detections['candidate']):
+        matched.extend(match_detections(reference, candidate))
+        reference_total += len(reference)
+        candidate_total += len(candidate)
+
+    report = {
+        'samples': len(samples),
+        'reference': reference_path,
+        'candidate': candidate_path,
+        'detections': {'reference': reference_total, 'candidate': candidate_total},
+        'precision': len(matched) / candidate_total if candidate_total else 1.0,
+        'recall': len(matched) / reference_total if reference_total else 1.0,
+        'mean_iou': float(np.mean(matched)) if matched else 0.0,
+        'latency_ms': {}
+    }
+    for name, values in latencies.items():
+        values = np.array(values) * 1000
+        report['latency_ms'][name] = {
+            'mean': float(values.mean()),
+            'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95))
+        }
+    report['speedup'] = report['latency_ms']['reference']['mean'] / report['latency_ms']['candidate']['mean']
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exportiert das Modell nach ONNX, quantisiert es optional auf INT8 und vergleicht es mit dem PyTorch-Modell.')
+    parser.add_argument('--weights', default=backend.MODEL, help='PyTorch-Gewichte (.pt)')
+    parser.add_argument('--img-size', type=int, default=640, help='Eingabegröße des Modells')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX-Opset-Version')
+    parser.add_argument('--int8', action='store_true', help='Zusätzlich ein INT8-quantisiertes Modell erzeugen')
+    parser.add_argument('--calibration', help='Ordner mit Bildern für die statische INT8-Quantisierung')
+    parser.add_argument('--compare', help='Ordner mit Beispielbildern für den Vergleich von Genauigkeit und Latenz')
+    parser.add_argument('--limit', type=int, help='Maximale Anzahl an Beispielbildern für den Vergleich')
+    parser.add_argument('--report', help='Datei, in die der Vergleich als JSON geschrieben wird')
+    args = parser.parse_args()
+
+    onnx_path = str(Path(args.weights).with_suffix('.onnx'))
+    metadata = export_onnx(args.weights, onnx_path, args.img_size, args.opset)
+    print(f'ONNX-Modell gespeichert: {onnx_path}')
+    exported = [onnx_path]
+
+    if args.int8:
+        int8_path = str(Path(args.weights).with_suffix('.int8.onnx'))
+        quantize_int8(onnx_path, int8_path, metadata, args.calibration, img_size=args.img_size)
+        print(f'INT8-Modell gespeichert: {int8_path}')
+        exported.append(int8_path)
+
+    if args.compare:
+        reports = [compare_models(args.weights, path, args.compare, args.limit) for path in exported]
+        print(json.dumps(reports, indent=2))
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as file:
+                json.dump(reports, file, indent=2)
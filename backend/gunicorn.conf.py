@@ -0,0 +1,54 @@
+import gc
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Start: gunicorn -c gunicorn.conf.py
+wsgi_app = 'backend:create_app()'
+bind = '0.0.0.0:56789'
+available_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+cpu_count = len(available_cpus)
+workers = max(1, cpu_count // 8)  # Anzahl der Worker-Prozesse
+threads = 4  # Parallele Anfragen pro Worker, deren Bilder der Scheduler bündelt
+worker_class = 'gthread'
+preload_app = True  # Modelle einmalig im Hauptprozess laden und per fork teilen (copy-on-write)
+timeout = 120
+torch_threads = max(1, cpu_count // workers)  # Threads pro Worker für Torch-Operatoren
+pin_cpus = True  # Jeden Worker an eigene CPU-Kerne binden
+metrics_dir = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'bottle-detector-metrics')  # Gemeinsame Metriken aller Worker
+
+
+def on_starting(server):
+    """
+    Verhindert, dass der Hauptprozess beim Laden der Modelle Thread-Pools anlegt, die der fork nicht übersteht.
+    """
+    import torch
+
+    torch.set_num_threads(1)
+    shutil.rmtree(metrics_dir, ignore_errors=True)  # Metriken eines früheren Laufs verwerfen
+
+
+def pre_fork(server, worker):
+    """
+    Vergibt dem neuen Worker einen freien Platz für die CPU-Bindung und friert die geladenen Objekte ein.
+    """
+    used_slots = {getattr(other, 'cpu_slot', None) for other in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used_slots) + 1) if slot not in used_slots)
+    gc.collect()
+    gc.freeze()  # Der Garbage Collector soll die geteilten Speicherseiten nicht anfassen
+
+
+def post_fork(server, worker):
+    """
+    Legt die Thread-Anzahl und die CPU-Kerne des Workers fest und wärmt die Modelle auf.
+    """
+    import backend
+
+    cpus = None
+    if pin_cpus:
+        first_cpu = (worker.cpu_slot % workers) * torch_threads
+        cpus = [available_cpus[(first_cpu + i) % cpu_count] for i in range(torch_threads)]
+    backend.metrics.registry.snapshot_dir = Path(metrics_dir)  # /metrics fasst die Stände aller Worker zusammen
+    backend.configure_worker(torch_threads, cpus)
+    server.log.info(f'Worker {worker.pid}: {torch_threads} Threads, CPUs {cpus}')
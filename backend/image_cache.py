@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ImageCache:
+    """
+    LRU-Cache für Base64-codierte Produktbilder mit einem Byte-Budget.
+
+    Die Einträge werden im Speicher gehalten und optional zusätzlich in einem Verzeichnis
+    abgelegt, sodass sie einen Neustart überstehen. Wird das Budget überschritten, werden
+    die am längsten nicht verwendeten Einträge aus dem Speicher entfernt.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None):
+        """
+        Initialisiert den Cache.
+
+        Args:
+            max_bytes (int): Maximale Größe aller Einträge im Speicher in Bytes.
+            disk_dir (str, optional): Verzeichnis für die Ablage der Einträge auf der Festplatte.
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.b64"
+
+    def _store(self, key, payload):
+        """
+        Legt einen Eintrag im Speicher ab und verdrängt ältere Einträge. Muss mit gehaltenem Lock aufgerufen werden.
+        """
+        size = len(payload)
+        if size > self.max_bytes:
+            return  # Einträge größer als das gesamte Budget werden nicht im Speicher gehalten
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= len(previous)
+        self._entries[key] = payload
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)  # Am längsten nicht verwendeten Eintrag entfernen
+            self.current_bytes -= len(evicted)
+
+    def get(self, key):
+        """
+        Liefert einen Eintrag aus dem Speicher oder von der Festplatte.
+
+        Args:
+            key (str): Der Schlüssel des Eintrags, z.B. die Bild-URL.
+
+        Returns:
+            str: Das Base64-codierte Bild oder None, wenn es nicht im Cache liegt.
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)  # Als zuletzt verwendet markieren
+                self.hits += 1
+                return payload
+
+        if self.disk_dir:
+            disk_path = self._disk_path(key)
+            if disk_path.is_file():
+                payload = disk_path.read_text(encoding='ascii')
+                with self._lock:
+                    self._store(key, payload)
+                    self.hits += 1
+                return payload
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, payload):
+        """
+        Legt einen Eintrag im Cache ab.
+
+        Args:
+            key (str): Der Schlüssel des Eintrags, z.B. die Bild-URL.
+            payload (str): Das Base64-codierte Bild.
+        """
+        with self._lock:
+            self._store(key, payload)
+
+        if self.disk_dir:
+            disk_path = self._disk_path(key)
+            temp_path = disk_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            temp_path.write_text(payload, encoding='ascii')
+            os.replace(temp_path, disk_path)  # Atomar ersetzen, damit parallele Leser keine halben Dateien sehen
+
+    def has_room_for(self, size):
+        """
+        Prüft, ob ein Eintrag der angegebenen Größe ohne Verdrängung Platz hat.
+
+        Args:
+            size (int): Die Größe des Eintrags in Bytes.
+
+        Returns:
+            bool: True, wenn das Budget für den Eintrag ausreicht.
+        """
+        with self._lock:
+            return self.current_bytes + size <= self.max_bytes
+
+    def clear(self):
+        """
+        Leert den Speicher des Caches. Einträge auf der Festplatte bleiben erhalten.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+import torch
+from utils.general import non_max_suppression
+
+
+class BatchScheduler:
+    """
+    Sammelt Bilder aus parallelen Anfragen und führt sie gemeinsam in einem Vorwärtsdurchlauf durch das Modell.
+
+    Ein Bündel wird ausgeführt, sobald `max_batch_size` Bilder warten oder seit dem ersten Bild
+    `max_wait` Sekunden vergangen sind. Die Non-Max Suppression läuft danach pro Bild mit den
+    Schwellenwerten der jeweiligen Anfrage.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait=0.01):
+        """
+        Initialisiert den Scheduler. Der Hintergrund-Thread wird erst bei der ersten Anfrage gestartet.
+
+        Args:
+            model (Model): Das geladene Modell.
+            max_batch_size (int): Die maximale Anzahl an Bildern pro Vorwärtsdurchlauf.
+            max_wait (float): Die maximale Wartezeit in Sekunden, bis ein Bündel ausgeführt wird.
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        """
+        Startet den Hintergrund-Thread, auch erneut in einem per fork erzeugten Prozess.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()  # Eine vom Elternprozess geerbte Warteschlange wird nicht weiterverwendet
+                self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+            self._thread.start()
+
+    def submit(self, img, conf_thres, iou_thres):
+        """
+        Reiht ein vorbereitetes Bild für die Objekterkennung ein.
+
+        Args:
+            img (torch.Tensor): Das normalisierte Bild mit der Form (3, Höhe, Breite).
+            conf_thres (float): Der Schwellenwert für die Konfidenz.
+            iou_thres (float): Der Schwellenwert für die Überlappung von Bounding-Boxen.
+
+        Returns:
+            Future: Liefert die Detektionen des Bildes, sobald sein Bündel verarbeitet wurde.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((img, conf_thres, iou_thres, future))
+        return future
+
+    def _run(self):
+        """
+        Hauptschleife des Hintergrund-Threads: sammelt Bündel und verarbeitet sie.
+        """
+        while True:
+            batch = [self._queue.get()]  # Auf das erste Bild warten
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        """
+        Führt die gesammelten Bilder gruppiert nach Bildgröße durch das Modell.
+
+        Args:
+            batch (list): Die eingereihten Einträge aus Bild, Schwellenwerten und Future.
+        """
+        groups = defaultdict(list)
+        for item in batch:
+            groups[tuple(item[0].shape)].append(item)  # Nur gleich große Bilder lassen sich stapeln
+
+        for items in groups.values():
+            try:
+                imgs = torch.stack([img for img, _, _, _ in items])
+                start = time.perf_counter()
+                with torch.no_grad():
+                    pred = self.model(imgs)  # Ein Vorwärtsdurchlauf für das gesamte Bündel
+                model_seconds = time.perf_counter() - start
+                if isinstance(pred, (list, tuple)):
+                    pred = pred[0]
+                for i, (_, conf_thres, iou_thres, future) in enumerate(items):
+                    start = time.perf_counter()
+                    det = non_max_suppression(pred[i:i + 1], conf_thres, iou_thres)[0]  # Non-Max Suppression pro Bild
+                    future.timings = {'detect_model': model_seconds, 'detect_nms': time.perf_counter() - start}
+                    future.batch_size = len(items)
+                    future.set_result(det)
+            except Exception as e:
+                for _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
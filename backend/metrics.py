@@ -0,0 +1,287 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Grenzen in Sekunden
+METRIC_PREFIX = 'bottle_detector'
+
+_current_request = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Sammelt die Dauer der Stufen und die Zähler einer einzelnen Anfrage.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def as_dict(self):
+        """
+        Liefert die Aufschlüsselung für die Antwort.
+
+        Returns:
+            dict: Die bisherige Gesamtdauer, die Dauer der Stufen in Millisekunden und die Zähler.
+        """
+        return {
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            'counts': dict(self.counts)
+        }
+
+
+class MetricsRegistry:
+    """
+    Latenz-Histogramme pro Stufe und Zähler, ausgegeben im Textformat von Prometheus.
+
+    Mit `snapshot_dir` legt jeder Prozess seinen Stand regelmäßig als Datei ab, sodass `/metrics`
+    bei mehreren Worker-Prozessen die Werte aller Worker zusammenfasst.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, snapshot_dir=None, snapshot_interval=1.0):
+        """
+        Initialisiert die Metriken.
+
+        Args:
+            buckets (tuple): Die oberen Grenzen der Histogramm-Klassen in Sekunden.
+            snapshot_dir (str, optional): Das gemeinsame Verzeichnis für die Stände aller Prozesse.
+            snapshot_interval (float): Der minimale Abstand zwischen zwei abgelegten Ständen in Sekunden.
+        """
+        self.buckets = tuple(buckets)
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.snapshot_interval = snapshot_interval
+        self._histograms = {}
+        self._counters = defaultdict(float)
+        self._last_snapshot = 0
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """
+        Erfasst die Dauer einer Stufe.
+
+        Args:
+            stage (str): Der Name der Stufe.
+            seconds (float): Die Dauer in Sekunden.
+        """
+        index = bisect.bisect_left(self.buckets, seconds)  # Erste Klasse, deren Grenze nicht überschritten wird
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            histogram['buckets'][index] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+        self._maybe_write_snapshot()
+
+    def inc(self, name, value=1):
+        """
+        Erhöht einen Zähler.
+
+        Args:
+            name (str): Der Name des Zählers.
+            value (int): Der Betrag der Erhöhung.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self):
+        """
+        Liefert eine Kopie des aktuellen Stands dieses Prozesses.
+
+        Returns:
+            dict: Histogramme und Zähler.
+        """
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'histograms': {stage: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                               for stage, h in self._histograms.items()},
+                'counters': dict(self._counters)
+            }
+
+    def write_snapshot(self):
+        """
+        Legt den Stand dieses Prozesses im gemeinsamen Verzeichnis ab.
+        """
+        if self.snapshot_dir is None:
+            return
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        file_path = self.snapshot_dir / f'{os.getpid()}.json'
+        temp_path = file_path.with_suffix(f'.{threading.get_ident()}.tmp')
+        temp_path.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(temp_path, file_path)
+
+    def _maybe_write_snapshot(self):
+        if self.snapshot_dir is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_snapshot < self.snapshot_interval:
+                return
+            self._last_snapshot = now
+        self.write_snapshot()
+
+    def merged(self):
+        """
+        Fasst den eigenen Stand mit den abgelegten Ständen der übrigen Prozesse zusammen.
+
+        Returns:
+            dict: Histogramme und Zähler aller Prozesse.
+        """
+        snapshots = [self.snapshot()]
+        if self.snapshot_dir is not None and self.snapshot_dir.is_dir():
+            own_file = f'{os.getpid()}.json'
+            for file_path in self.snapshot_dir.glob('*.json'):
+                if file_path.name == own_file:
+                    continue
+                try:
+                    snapshot = json.loads(file_path.read_text(encoding='utf-8'))
+                except (OSError, ValueError):
+                    continue  # Datei wird gerade ersetzt oder ist unvollständig
+                if snapshot.get('buckets') == list(self.buckets):
+                    snapshots.append(snapshot)
+
+        merged = {'histograms': {}, 'counters': defaultdict(float)}
+        for snapshot in snapshots:
+            for stage, histogram in snapshot['histograms'].items():
+                target = merged['histograms'].setdefault(stage, {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0})
+                target['buckets'] = [a + b for a, b in zip(target['buckets'], histogram['buckets'])]
+                target['sum'] += histogram['sum']
+                target['count'] += histogram['count']
+            for name, value in snapshot['counters'].items():
+                merged['counters'][name] += value
+        return merged
+
+    def render(self):
+        """
+        Gibt alle Metriken im Textformat von Prometheus aus.
+
+        Returns:
+            str: Der Inhalt für den Endpunkt `/metrics`.
+        """
+        merged = self.merged()
+        lines = [
+            f'# HELP {METRIC_PREFIX}_stage_duration_seconds Dauer der Verarbeitungsstufen.',
+            f'# TYPE {METRIC_PREFIX}_stage_duration_seconds histogram'
+        ]
+        for stage, histogram in sorted(merged['histograms'].items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, histogram['buckets']):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+        lines.append(f'# HELP {METRIC_PREFIX}_events_total Anzahl verarbeiteter Elemente.')
+        lines.append(f'# TYPE {METRIC_PREFIX}_events_total counter')
+        for name, value in sorted(merged['counters'].items()):
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record(stage, seconds):
+    """
+    Erfasst die Dauer einer Stufe im Histogramm und in der laufenden Anfrage.
+
+    Args:
+        stage (str): Der Name der Stufe.
+        seconds (float): Die Dauer in Sekunden.
+    """
+    registry.observe(stage, seconds)
+    timings = _current_request.get()
+    if timings is not None:
+        timings.stages[stage] += seconds
+
+
+def count(name, value=1):
+    """
+    Erhöht einen Zähler global und in der laufenden Anfrage.
+
+    Args:
+        name (str): Der Name des Zählers.
+        value (int): Der Betrag der Erhöhung.
+    """
+    registry.inc(name, value)
+    timings = _current_request.get()
+    if timings is not None:
+        timings.counts[name] += value
+
+
+@contextmanager
+def stage(name):
+    """
+    Misst die Dauer des umschlossenen Blocks als Stufe.
+
+    Args:
+        name (str): Der Name der Stufe.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def stage_iter(name, iterable):
+    """
+    Misst die Zeit, die ein Iterator zum Erzeugen seiner Elemente braucht, als eine Stufe.
+
+    Gemessen werden nur die Aufrufe von `next`. Die Zeit, in der der Verbraucher ein Element
+    weiterverarbeitet (z. B. an den Client schreibt), zählt nicht mit. Erfasst wird die Summe,
+    sobald der Iterator erschöpft ist oder abgebrochen wird.
+
+    Args:
+        name (str): Der Name der Stufe.
+        iterable (iterable): Die zu messende Folge.
+
+    Yields:
+        object: Die Elemente der Folge.
+    """
+    iterator = iter(iterable)
+    seconds = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+            yield item
+    finally:
+        record(name, seconds)
+
+
+@contextmanager
+def track_request(name='request'):
+    """
+    Sammelt die Stufen und Zähler einer Anfrage und misst ihre Gesamtdauer.
+
+    Args:
+        name (str): Der Name der Stufe für die Gesamtdauer.
+
+    Yields:
+        RequestTimings: Die Aufschlüsselung der laufenden Anfrage.
+    """
+    timings = RequestTimings()
+    token = _current_request.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_request.reset(token)
+        seconds = time.perf_counter() - timings.start
+        registry.observe(name, seconds)
+        timings.stages[name] += seconds
@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+import numpy as np
+from fuzzywuzzy import fuzz, process
+
+NGRAM_SIZE = 3  # Länge der Zeichen-N-Gramme für die Vorauswahl
+TOKEN_WEIGHT = 2  # Gewicht eines übereinstimmenden Wortes gegenüber einem N-Gramm
+MAX_CANDIDATES = 200  # Maximale Anzahl an Produkten, die vollständig verglichen werden
+SCORE_BATCH_SIZE = 64  # Anzahl der Kandidaten, die pro Durchlauf bewertet werden
+
+
+def char_ngrams(text, n=NGRAM_SIZE):
+    """
+    Zerlegt einen Text in überlappende Zeichen-N-Gramme.
+
+    Args:
+        text (str): Der bereits normalisierte Text.
+        n (int): Die Länge der N-Gramme.
+
+    Returns:
+        set: Die Menge der N-Gramme des Textes.
+    """
+    padded = f" {text} "  # Wortgrenzen am Anfang und Ende mit einbeziehen
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class ProductIndex:
+    """
+    Index über die Produktnamen, der einmalig aus `load_products()` aufgebaut wird.
+
+    Die Namen werden vorab normalisiert und über Zeichen-N-Gramme sowie ganze Wörter
+    indexiert. Bei einer Suche werden zuerst die Produkte mit der größten, auf die
+    Länge der Namen normierten Überlappung (Dice-Koeffizient) mit `fuzz.ratio` bewertet.
+    Danach werden alle übrigen Produkte bewertet, deren Score nach den gemeinsamen
+    Zeichen noch zu den besten gehören könnte. Das Ergebnis entspricht damit immer dem
+    vollständigen linearen Vergleich, auch wenn ein Text kein N-Gramm mit einem Namen
+    teilt; dann werden im ungünstigsten Fall alle Produkte bewertet.
+    """
+
+    def __init__(self, products, normalize, ngram_size=NGRAM_SIZE, max_candidates=MAX_CANDIDATES,
+                 batch_size=SCORE_BATCH_SIZE):
+        """
+        Baut den Index auf.
+
+        Args:
+            products (list): Die Liste der Produkte aus der Datenbank.
+            normalize (callable): Funktion zur Normalisierung von Produktnamen und OCR-Texten.
+            ngram_size (int): Die Länge der Zeichen-N-Gramme.
+            max_candidates (int): Maximale Anzahl an Kandidaten pro Suche.
+            batch_size (int): Anzahl der Kandidaten, die pro Durchlauf bewertet werden.
+        """
+        self.products = products
+        self.normalize = normalize
+        self.ngram_size = ngram_size
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.names = [normalize(product['name']) for product in products]  # Normalisierte Namen vorhalten
+        self.ngram_postings = defaultdict(list)
+        self.token_postings = defaultdict(list)
+        self.ngram_counts = np.zeros(len(self.names), dtype=np.int32)
+        for product_id, name in enumerate(self.names):
+            grams = char_ngrams(name, ngram_size)
+            self.ngram_counts[product_id] = len(grams)
+            for gram in grams:
+                self.ngram_postings[gram].append(product_id)
+            for token in set(name.split()):
+                self.token_postings[token].append(product_id)
+
+        self.alphabet = {char: i for i, char in enumerate(sorted(set(''.join(self.names))))}
+        self.char_counts = np.zeros((len(self.names), len(self.alphabet)), dtype=np.int32)  # Häufigkeit jedes Zeichens pro Name
+        for product_id, name in enumerate(self.names):
+            for char, count in Counter(name).items():
+                self.char_counts[product_id, self.alphabet[char]] = count
+        self.lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.products)
+
+    def candidates(self, normalized_text):
+        """
+        Ermittelt die Produkte, die für einen Text vollständig verglichen werden sollen.
+
+        Args:
+            normalized_text (str): Der bereits normalisierte Suchtext.
+
+        Returns:
+            list: Die IDs der Kandidaten, absteigend nach Dice-Koeffizient der N-Gramme und Wörter.
+        """
+        if len(self.products) <= self.max_candidates:
+            return list(range(len(self.products)))  # Kleiner Katalog: alle Produkte bewerten
+
+        grams = char_ngrams(normalized_text, self.ngram_size)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.ngram_postings.get(gram, ()))
+        for token in set(normalized_text.split()):
+            for product_id in self.token_postings.get(token, ()):
+                overlap[product_id] += TOKEN_WEIGHT
+        # Auf die Länge der Namen normieren, damit lange Namen nicht allein durch viele N-Gramme vorne liegen
+        dice = {product_id: count / (len(grams) + self.ngram_counts[product_id]) for product_id, count in overlap.items()}
+        return sorted(dice, key=lambda product_id: (-dice[product_id], product_id))[:self.max_candidates]
+
+    def score_bounds(self, normalized_text):
+        """
+        Berechnet für jedes Produkt eine obere Schranke von `fuzz.ratio` aus den gemeinsamen Zeichen.
+
+        `fuzz.ratio` ist 200 * M / (Länge des Textes + Länge des Namens), wobei M höchstens der Anzahl
+        gemeinsamer Zeichen (mit Häufigkeit) entspricht.
+
+        Args:
+            normalized_text (str): Der bereits normalisierte Suchtext.
+
+        Returns:
+            numpy.ndarray: Die höchstmöglichen Scores pro Produkt.
+        """
+        query = np.zeros(len(self.alphabet), dtype=np.int32)
+        for char, count in Counter(normalized_text).items():
+            if char in self.alphabet:
+                query[self.alphabet[char]] = count
+        common = np.minimum(self.char_counts, query).sum(axis=1)
+        return np.ceil(200 * common / np.maximum(len(normalized_text) + self.lengths, 1))
+
+    def score(self, normalized_text, product_ids):
+        """
+        Bewertet Produkte bündelweise mit `fuzz.ratio`.
+
+        Args:
+            normalized_text (str): Der bereits normalisierte Suchtext.
+            product_ids (list): Die IDs der zu bewertenden Produkte.
+
+        Returns:
+            list: Tupel aus Score und ID, Produkte mit Score 0 werden ausgelassen.
+        """
+        scored = []
+        for start in range(0, len(product_ids), self.batch_size):
+            batch = {product_id: self.names[product_id] for product_id in product_ids[start:start + self.batch_size]}
+            scored.extend((score, product_id) for _, score, product_id in process.extractWithoutOrder(
+                normalized_text, batch, processor=None, scorer=fuzz.ratio, score_cutoff=1))
+        return scored
+
+    def search(self, text, limit=1, stats=None):
+        """
+        Sucht die Produkte, deren Namen dem Text am ähnlichsten sind.
+
+        Args:
+            text (str): Der erkannte Text aus dem OCR-Prozess.
+            limit (int): Die maximale Anzahl zurückgegebener Produkte.
+            stats (dict, optional): Erhält unter `comparisons` die Anzahl der bewerteten Kandidaten.
+
+        Returns:
+            list: Tupel aus Produkt und Score, absteigend nach Score. Produkte mit Score 0 werden ausgelassen.
+        """
+        normalized_text = self.normalize(text)
+        candidate_ids = self.candidates(normalized_text)
+        scored = self.score(normalized_text, candidate_ids)
+        comparisons = len(candidate_ids)
+
+        if len(candidate_ids) < len(self.products):
+            # Produkte außerhalb der Vorauswahl bewerten, die nach ihren Zeichen noch unter die besten kommen könnten
+            scores = sorted((score for score, _ in scored), reverse=True)
+            threshold = max(scores[limit - 1] if len(scores) >= limit else 0, 1)
+            reachable = self.score_bounds(normalized_text) >= threshold
+            reachable[candidate_ids] = False
+            remaining = np.flatnonzero(reachable).tolist()
+            scored.extend(self.score(normalized_text, remaining))
+            comparisons += len(remaining)
+        if stats is not None:
+            stats['comparisons'] = comparisons
+
+        scored.sort(key=lambda item: (-item[0], item[1]))  # Bei Gleichstand gewinnt das zuerst gelistete Produkt
+        return [(self.products[product_id], score) for score, product_id in scored[:limit]]
+
+    def search_many(self, texts, limit=1):
+        """
+        Sucht Produkte für mehrere Texte.
+
+        Args:
+            texts (list): Die erkannten Texte aus dem OCR-Prozess.
+            limit (int): Die maximale Anzahl zurückgegebener Produkte pro Text.
+
+        Returns:
+            list: Pro Text eine Liste aus Tupeln von Produkt und Score.
+        """
+        return [self.search(text, limit) for text in texts]
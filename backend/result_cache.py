@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+def perceptual_hash(image, hash_size=8):
+    """
+    Berechnet einen Differenz-Hash (dHash), der bei nahezu gleichen Bildern nahezu gleich bleibt.
+
+    Args:
+        image (numpy.ndarray): Das Bild im BGR-Format.
+        hash_size (int): Die Kantenlänge des Hashes in Bits.
+
+    Returns:
+        int: Der Hash als Ganzzahl mit `hash_size * hash_size` Bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()  # Helligkeitsverlauf zwischen benachbarten Pixeln
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+class ResultCache:
+    """
+    LRU-Cache für die Ergebnisse von /process, adressiert über den Hash der hochgeladenen Bilddaten.
+
+    Jeder Eintrag ist an die Version des Produktkatalogs gebunden, mit der er berechnet wurde,
+    und verfällt nach `ttl` Sekunden. Optional werden nahezu gleiche Bilder über einen
+    perzeptuellen Hash gefunden.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=128 * 1024 * 1024, ttl=600, max_distance=4):
+        """
+        Initialisiert den Cache.
+
+        Args:
+            max_entries (int): Die maximale Anzahl an Einträgen.
+            max_bytes (int): Die maximale geschätzte Größe aller Einträge in Bytes.
+            ttl (float): Die Lebensdauer eines Eintrags in Sekunden.
+            max_distance (int): Die maximale Anzahl abweichender Bits für einen Treffer über den perzeptuellen Hash.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # Schlüssel -> (Ergebnis, Größe, Version, Hash, Ablaufzeit)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _, _, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def _valid(self, key, version, now):
+        """
+        Prüft einen Eintrag und entfernt ihn, wenn er abgelaufen ist oder zu einem anderen Katalog gehört.
+        Muss mit gehaltenem Lock aufgerufen werden.
+        """
+        _, _, entry_version, _, expires_at = self._entries[key]
+        if entry_version != version or expires_at < now:
+            self._remove(key)
+            return False
+        return True
+
+    def get(self, key, version):
+        """
+        Liefert das Ergebnis zu einem Schlüssel.
+
+        Args:
+            key (str): Der Hash der hochgeladenen Bilddaten.
+            version (str): Die aktuelle Version des Produktkatalogs.
+
+        Returns:
+            dict: Das zwischengespeicherte Ergebnis oder None.
+        """
+        with self._lock:
+            if key not in self._entries or not self._valid(key, version, time.monotonic()):
+                return None
+            self._entries.move_to_end(key)  # Als zuletzt verwendet markieren
+            return self._entries[key][0]
+
+    def get_similar(self, image_hash, version):
+        """
+        Liefert das Ergebnis eines nahezu gleichen Bildes.
+
+        Args:
+            image_hash (int): Der perzeptuelle Hash des Bildes.
+            version (str): Die aktuelle Version des Produktkatalogs.
+
+        Returns:
+            dict: Das Ergebnis des ähnlichsten Bildes innerhalb von `max_distance` oder None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for key in list(self._entries):
+                entry_hash = self._entries[key][3]
+                if entry_hash is None or not self._valid(key, version, now):
+                    continue
+                distance = bin(entry_hash ^ image_hash).count('1')  # Anzahl abweichender Bits
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][0]
+
+    def put(self, key, result, size, version, image_hash=None):
+        """
+        Legt ein Ergebnis im Cache ab und verdrängt bei Bedarf die ältesten Einträge.
+
+        Args:
+            key (str): Der Hash der hochgeladenen Bilddaten.
+            result (dict): Das Ergebnis der Verarbeitung.
+            size (int): Die geschätzte Größe des Ergebnisses in Bytes.
+            version (str): Die Version des Produktkatalogs, mit der das Ergebnis berechnet wurde.
+            image_hash (int, optional): Der perzeptuelle Hash des Bildes.
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, version, image_hash, time.monotonic() + self.ttl)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))  # Am längsten nicht verwendeten Eintrag entfernen
+
+    def clear(self):
+        """
+        Entfernt alle Einträge.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
@@ -0,0 +1,63 @@
+import io
+import json
+import zipfile
+from flask import Flask, Response, request, stream_with_context
+from batch_upload import close_uploads, detach_uploads, iter_uploads
+
+
+def make_app(closed):
+    app = Flask(__name__)
+
+    @app.route('/batch', methods=['POST'])
+    def batch():
+        files = detach_uploads([storage for key in request.files for storage in request.files.getlist(key)])
+
+        def generate():
+            for name, data, error in iter_uploads(files, 2 * 1024 * 1024):
+                yield json.dumps({'name': name, 'size': len(data) if data else None, 'error': error}) + '\n'
+
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.call_on_close(lambda: closed.extend(storage.stream.closed for storage in files))
+        response.call_on_close(lambda: close_uploads(files))
+        return response
+
+    return app
+
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_multipart_files_are_readable_while_streaming():
+    closed = []
+    client = make_app(closed).test_client()
+    large = b'x' * (1024 * 1024)  # Landet bei Werkzeug in einer temporären Datei
+    data = {'images': [(io.BytesIO(b'abc'), 'a.jpg'), (io.BytesIO(large), 'b.png'),
+                       (make_zip({'c.jpg': b'cc', 'notes.txt': b'-'}), 'more.zip')]}
+
+    response = client.post('/batch', data=data, content_type='multipart/form-data')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+
+    assert response.status_code == 200
+    assert lines == [{'name': 'a.jpg', 'size': 3, 'error': None},
+                     {'name': 'b.png', 'size': len(large), 'error': None},
+                     {'name': 'c.jpg', 'size': 2, 'error': None}]
+    assert closed == [False, False, False]  # Erst nach dem Streamen geschlossen
+
+
+def test_detach_uploads_leaves_empty_streams_in_request():
+    client = make_app([]).test_client()
+    with client.application.test_request_context('/batch', method='POST', data={'images': (io.BytesIO(b'abc'), 'a.jpg')}):
+        original = request.files['images']
+        detached = detach_uploads([original])
+        request.close()
+        assert detached[0].read() == b'abc'
+        assert detached[0].filename == 'a.jpg'
+        close_uploads(detached)
+        assert detached[0].stream.closed
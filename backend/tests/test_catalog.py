@@ -0,0 +1,53 @@
+import json
+import time
+import pytest
+from catalog import CatalogReloader
+
+
+def write_products(path, products):
+    path.write_text(json.dumps(products), encoding='utf-8')
+
+
+@pytest.mark.parametrize('products', [{'name': 'Gin'}, [{'alcohol_content': '40%'}], ['Gin'], [{'name': 42}]])
+def test_build_rejects_wrong_shape(tmp_path, products):
+    path = tmp_path / 'products.json'
+    write_products(path, products)
+    catalog = CatalogReloader(str(path), lambda products: None)
+    with pytest.raises(ValueError):
+        catalog.load()
+
+
+def test_reloader_survives_wrong_shape(tmp_path):
+    path = tmp_path / 'products.json'
+    write_products(path, [{'name': 'Gin'}])
+    catalog = CatalogReloader(str(path), lambda products: None, interval=0.01)
+    catalog.load()
+    catalog.start()
+
+    write_products(path, {'name': 'Rum'})  # Gültiges JSON mit falscher Struktur
+    time.sleep(0.1)
+    assert catalog._thread.is_alive()
+    assert catalog.current.products == [{'name': 'Gin'}]
+
+    write_products(path, [{'name': 'Gin'}, {'name': 'Rum'}])
+    deadline = time.monotonic() + 2
+    while len(catalog.current.products) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [product['name'] for product in catalog.current.products] == ['Gin', 'Rum']
+
+
+def test_reloader_reports_wrong_file_once(tmp_path, capsys):
+    path = tmp_path / 'products.json'
+    write_products(path, [{'name': 'Gin'}])
+    catalog = CatalogReloader(str(path), lambda products: None, interval=0.01)
+    catalog.load()
+    catalog.start()
+
+    path.write_text('[{"name": ', encoding='utf-8')  # Ungültiges JSON, bleibt unverändert liegen
+    time.sleep(0.2)
+    assert capsys.readouterr().out.count('Fehler beim Neuladen') == 1
+
+    path.write_text('{"name": "Rum"}', encoding='utf-8')  # Neue, wieder ungültige Version
+    time.sleep(0.2)
+    assert capsys.readouterr().out.count('Fehler beim Neuladen') == 1
+    assert catalog.current.products == [{'name': 'Gin'}]
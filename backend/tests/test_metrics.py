@@ -0,0 +1,33 @@
+import time
+import metrics
+
+
+def histogram(stage):
+    return metrics.registry.snapshot()['histograms'].get(stage, {'sum': 0.0, 'count': 0})
+
+
+def slow_items(count, seconds):
+    for i in range(count):
+        time.sleep(seconds)
+        yield i
+
+
+def test_stage_iter_excludes_consumer_time():
+    before = histogram('test_producer')
+    items = []
+    for item in metrics.stage_iter('test_producer', slow_items(3, 0.01)):
+        time.sleep(0.05)  # Der Verbraucher ist langsamer als der Erzeuger
+        items.append(item)
+
+    after = histogram('test_producer')
+    assert items == [0, 1, 2]
+    assert after['count'] == before['count'] + 1
+    assert 0.03 <= after['sum'] - before['sum'] < 0.1
+
+
+def test_stage_iter_records_when_closed_early():
+    before = histogram('test_closed')
+    events = metrics.stage_iter('test_closed', slow_items(3, 0.01))
+    assert next(events) == 0
+    events.close()
+    assert histogram('test_closed')['count'] == before['count'] + 1
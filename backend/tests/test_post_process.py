@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('easyocr')
+backend = pytest.importorskip('backend')
+
+
+@pytest.fixture(autouse=True)
+def loaded_catalog():
+    backend.catalog.load()
+
+
+def test_find_products_reports_score():
+    stats = {}
+    product = backend.find_products("Jack Daniel's", include_image=False, stats=stats)
+    assert product['name'] == "Jack Daniel's"
+    assert stats['score'] >= 90
+
+
+def test_early_exit_skips_remaining_crops(monkeypatch):
+    crops = [np.zeros((64, 64, 3), dtype=np.uint8) for _ in range(5)]
+    calls = []
+
+    def recognize_texts(images, batch_size=backend.OCR_BATCH_SIZE):
+        calls.append(len(images))
+        return [("Jack Daniel's", [])] * len(images)
+
+    monkeypatch.setattr(backend, 'OCR_EARLY_EXIT_SCORE', 90)
+    monkeypatch.setattr(backend, 'select_crops', lambda im0, det, stats, windows=None: crops)
+    monkeypatch.setattr(backend, 'recognize_texts', recognize_texts)
+
+    stats = {}
+    results = list(backend.post_process_images(np.zeros((640, 640, 3), dtype=np.uint8), [], stats))
+
+    assert calls == [1]  # Nur der wichtigste Ausschnitt wurde gelesen
+    assert len(results) == 1
+    assert stats['early_exit'] is True
+    assert stats['processed'] == 1
+    assert stats['skipped_early_exit'] == 4
+
+
+def test_all_crops_read_by_default(monkeypatch):
+    crops = [np.zeros((64, 64, 3), dtype=np.uint8) for _ in range(5)]
+    monkeypatch.setattr(backend, 'select_crops', lambda im0, det, stats, windows=None: crops)
+    monkeypatch.setattr(backend, 'recognize_texts', lambda images, batch_size=backend.OCR_BATCH_SIZE: [("Jack Daniel's", [])] * len(images))
+
+    stats = {}
+    results = list(backend.post_process_images(np.zeros((640, 640, 3), dtype=np.uint8), [], stats))
+
+    assert backend.OCR_EARLY_EXIT_SCORE is None
+    assert len(results) == 5  # Ohne vorzeitigen Abbruch liefert /process alle Flaschen
+    assert stats['early_exit'] is False
+    assert stats['processed'] == 5
@@ -0,0 +1,54 @@
+import json
+import os
+import random
+import string
+import pytest
+from fuzzywuzzy import fuzz
+from product_index import ProductIndex
+
+PRODUCTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'products.json')
+REPLACEMENTS = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b'}  # Wie replace_similar_characters
+
+
+def normalize(text):
+    return ''.join(REPLACEMENTS.get(char, char) for char in text.lower())
+
+
+def linear_search(products, text, limit=1):
+    """Vollständiger Vergleich aller Produkte wie vor dem Index."""
+    scored = [(fuzz.ratio(normalize(text), normalize(product['name'])), product_id) for product_id, product in enumerate(products)]
+    scored = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))
+    return [(products[product_id], score) for score, product_id in scored[:limit]]
+
+
+@pytest.fixture(scope='module')
+def products():
+    with open(PRODUCTS_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def test_matches_linear_scan_beyond_max_candidates(products):
+    index = ProductIndex(products, normalize, max_candidates=5)
+    rng = random.Random(0)
+    texts = ['DELAF', 'Royal', 'MC Ma', 'Baere', 'xyz', 'qqqq', 'w']  # Auch Texte ohne gemeinsames N-Gramm
+    for product in products:
+        name = product['name']
+        texts += [name[:3], name[:8], name.upper(), ''.join(char for char in name if rng.random() > 0.2)]
+
+    for text in texts:
+        for limit in (1, 3):
+            assert index.search(text, limit) == linear_search(products, text, limit), text
+
+
+def test_matches_linear_scan_on_large_catalog():
+    rng = random.Random(1)
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(400)]
+    products = [{'name': ' '.join(rng.sample(words, rng.randint(1, 4)))} for _ in range(600)]
+    index = ProductIndex(products, normalize, max_candidates=20)
+
+    for _ in range(20):
+        name = rng.choice(products)['name']
+        text = ''.join(char if rng.random() > 0.15 else rng.choice(string.ascii_lowercase) for char in name)  # OCR-Fehler
+        stats = {}
+        assert index.search(text, stats=stats) == linear_search(products, text), text
+        assert stats['comparisons'] < len(products)
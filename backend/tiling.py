@@ -0,0 +1,98 @@
+import math
+import torch
+import torchvision
+
+
+def tile_count(length, side, overlap):
+    """
+    Berechnet die Anzahl der Kacheln entlang einer Kante.
+
+    Args:
+        length (int): Die Länge der Kante in Pixeln.
+        side (int): Die Kantenlänge einer Kachel in Pixeln.
+        overlap (float): Der Anteil, um den sich benachbarte Kacheln mindestens überlappen.
+
+    Returns:
+        int: Die Anzahl der Kacheln.
+    """
+    if length <= side:
+        return 1
+    return math.ceil((length - side) / (side * (1 - overlap))) + 1
+
+
+def tile_windows(width, height, tile_size=640, overlap=0.2, max_tiles=8):
+    """
+    Teilt ein Bild in sich überlappende, quadratische Kacheln auf.
+
+    Die Kacheln haben mindestens die Kantenlänge `tile_size`. Würden dafür mehr als `max_tiles` Kacheln
+    benötigt, wächst die Kantenlänge, bis das Raster in das Budget passt, sodass große Bilder mit
+    wenigen, etwas stärker verkleinerten Kacheln abgedeckt werden. Die Kacheln werden gleichmäßig
+    verteilt und schließen bündig mit den Bildrändern ab.
+
+    Args:
+        width (int): Die Breite des Bildes.
+        height (int): Die Höhe des Bildes.
+        tile_size (int): Die minimale Kantenlänge einer Kachel in Pixeln.
+        overlap (float): Der Anteil, um den sich benachbarte Kacheln mindestens überlappen.
+        max_tiles (int): Die maximale Anzahl an Kacheln.
+
+    Returns:
+        list: Die Kacheln als (x1, y1, x2, y2), leer, wenn das Bild nicht größer als eine Kachel ist.
+    """
+    if max(width, height) <= tile_size or max_tiles < 2:
+        return []
+    side = tile_size
+    while tile_count(width, side, overlap) * tile_count(height, side, overlap) > max_tiles:
+        side = math.ceil(side * 1.1)  # Kacheln vergrößern, bis das Raster in das Budget passt
+    if side >= max(width, height):
+        return []  # Eine einzige Kachel entspricht der Gesamtansicht
+
+    columns, rows = tile_count(width, side, overlap), tile_count(height, side, overlap)
+    xs = [round(i * (width - side) / (columns - 1)) if columns > 1 else 0 for i in range(columns)]
+    ys = [round(i * (height - side) / (rows - 1)) if rows > 1 else 0 for i in range(rows)]
+    return [(x, y, min(x + side, width), min(y + side, height)) for y in ys for x in xs]
+
+
+def fuse_detections(det, iou_thres=0.45, fuse_thres=0.6):
+    """
+    Führt die Detektionen aller Kacheln und der Gesamtansicht zu einer Liste zusammen.
+
+    Zuerst entfernt eine globale Non-Max Suppression pro Klasse doppelte Boxen aus den
+    Überlappungsbereichen. Danach werden Bruchstücke von Flaschen, die an einer Kachelgrenze
+    abgeschnitten wurden, mit der Box verschmolzen, in der sie zum größten Teil liegen: Liegt eine
+    Box zu mindestens `fuse_thres` ihrer Fläche in einer Box mit höherer Konfidenz und gleicher
+    Klasse, wird diese auf die umschließende Box beider erweitert und das Bruchstück verworfen.
+
+    Args:
+        det (torch.Tensor): Die Detektionen (x1, y1, x2, y2, Konfidenz, Klasse) in Bildkoordinaten.
+        iou_thres (float): Der Schwellenwert für die Überlappung bei der Non-Max Suppression.
+        fuse_thres (float): Der Anteil der Fläche einer Box, ab dem sie als Bruchstück gilt.
+
+    Returns:
+        torch.Tensor: Die zusammengeführten Detektionen, absteigend nach Konfidenz sortiert.
+    """
+    if len(det) < 2:
+        return det
+    keep = torchvision.ops.batched_nms(det[:, :4].float(), det[:, 4].float(), det[:, 5], iou_thres)  # Sortiert nach Konfidenz
+    det = det[keep].clone()
+    if len(det) < 2:
+        return det
+
+    boxes = det[:, :4]
+    areas = ((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])).clamp(min=1e-6)
+    top_left = torch.max(boxes[:, None, :2], boxes[None, :, :2])
+    bottom_right = torch.min(boxes[:, None, 2:], boxes[None, :, 2:])
+    inter = (bottom_right - top_left).clamp(min=0).prod(2)
+    contained = (inter / areas[None, :] >= fuse_thres) & (det[:, None, 5] == det[None, :, 5])  # [i, j]: Box j liegt in Box i
+    contained = contained.tolist()
+
+    absorbed = [False] * len(det)
+    for i in range(len(det)):
+        if absorbed[i]:
+            continue
+        for j in range(i + 1, len(det)):  # Nur Boxen mit geringerer Konfidenz können aufgehen
+            if not absorbed[j] and contained[i][j]:
+                boxes[i, :2] = torch.min(boxes[i, :2], boxes[j, :2])  # Auf die umschließende Box erweitern
+                boxes[i, 2:] = torch.max(boxes[i, 2:], boxes[j, 2:])
+                absorbed[j] = True
+    return det[torch.tensor([not value for value in absorbed])]
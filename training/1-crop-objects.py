@@ -1,52 +1,183 @@
 from PIL import Image, ExifTags
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import hashlib
+import json
 import os
+import time
 
-def trim_images(input_folder, output_folder):
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.bmp')
+ORIENTATION_TAG = next(tag for tag, name in ExifTags.TAGS.items() if name == 'Orientation')  # Einmalig statt pro Bild gesucht
+MANIFEST_FILE = '.crop-manifest.json'  # Merkt sich Inhalt und Parameter jeder verarbeiteten Datei im Ausgabeordner
+OUTPUT_PARAMS = {'version': 1, 'mode': 'RGBA', 'format': 'png'}  # Ändern sich die Parameter, wird alles neu zugeschnitten
+ROTATIONS = {3: 180, 6: 270, 8: 90}  # EXIF-Orientierung -> Drehwinkel
+
+
+def crop_image(data, output_path):
+    """
+    Richtet ein Bild gemäß EXIF aus, schneidet es auf den nicht transparenten Bereich zu und speichert es
+
+    Args:
+        data (bytes): Inhalt der Bilddatei
+        output_path (str): Pfad für das zugeschnittene Bild
+
+    Returns:
+        str: 'processed', 'empty' bei einem vollständig transparenten Bild oder 'no-transparency', falls das Bild keine Transparenz unterstützt
+    """
+    with Image.open(BytesIO(data)) as img:  # Öffnet das Bild aus dem bereits gelesenen Inhalt
+        try:
+            exif = img._getexif()
+            if exif and exif.get(ORIENTATION_TAG) in ROTATIONS:
+                img = img.rotate(ROTATIONS[exif[ORIENTATION_TAG]], expand=True)  # Dreht das Bild gemäß der Orientierung
+        except (AttributeError, KeyError, IndexError):
+            pass  # Handhabt Ausnahmen, falls EXIF-Daten fehlen
+
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert("RGBA")  # Konvertiert das Bild in RGBA
+            bbox = img.getbbox()  # Ermittelt den Bereich des Bildes, der geschnitten werden soll
+            if not bbox:
+                return 'empty'  # Das Bild ist vollständig transparent
+            img.crop(bbox).save(output_path)  # Schneidet das Bild zu und speichert es
+            return 'processed'
+        return 'no-transparency'
+
+
+def process_file(task):
+    """
+    Verarbeitet eine Datei, sofern sich ihr Inhalt seit dem letzten Lauf geändert hat
+
+    Args:
+        task (tuple): Eingabepfad, Ausgabepfad und bekannter Hash aus dem Manifest (oder None)
+
+    Returns:
+        tuple: Dateiname, Hash des Inhalts, Status (wie bei `crop_image`, 'unchanged' oder 'error') und Fehlermeldung
+    """
+    file_path, output_path, known_hash = task
+    file_name = os.path.basename(file_path)
+    try:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        content_hash = hashlib.sha256(data).hexdigest()  # Der Hash wird im Prozess berechnet, parallel zu den anderen Dateien
+        if content_hash == known_hash:
+            return file_name, content_hash, 'unchanged', None  # Nur der Zeitstempel hat sich geändert
+        return file_name, content_hash, crop_image(data, output_path), None
+    except Exception as e:
+        return file_name, None, 'error', str(e)
+
+
+def load_manifest(output_folder):
+    """
+    Lädt das Manifest des letzten Laufs
+
+    Args:
+        output_folder (str): Pfad zum Ausgabeordner
+
+    Returns:
+        dict: Dateiname -> Größe, Änderungszeit, Hash und Parameter, leer ohne Manifest
+    """
+    try:
+        with open(os.path.join(output_folder, MANIFEST_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_folder, manifest):
+    """
+    Schreibt das Manifest über eine temporäre Datei, sodass es nie halb geschrieben vorliegt
+
+    Args:
+        output_folder (str): Pfad zum Ausgabeordner
+        manifest (dict): Das Manifest
+    """
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def is_valid(entry, output_path):
+    """
+    Prüft, ob das Ergebnis eines Eintrags im Manifest noch verwendet werden kann
+
+    Args:
+        entry (dict): Eintrag des Manifests oder None
+        output_path (str): Pfad des zugeschnittenen Bildes
+
+    Returns:
+        bool: Ob die Parameter übereinstimmen und das zugeschnittene Bild noch vorhanden ist
+    """
+    return entry is not None and entry['params'] == OUTPUT_PARAMS and (entry['status'] != 'processed' or os.path.exists(output_path))
+
+
+def trim_images(input_folder, output_folder, workers=None, incremental=True):
     """
     Beschneidet Bilder basierend auf ihrer EXIF-Orientierung und speichert die zugeschnittenen Versionen in einem neuen Ordner
 
+    Im inkrementellen Modus werden nur neue oder geänderte Dateien verarbeitet. Unveränderte Dateien werden
+    über Größe und Änderungszeit erkannt, bei Abweichungen entscheidet der Hash des Inhalts.
+
     Args:
         input_folder (str): Pfad zum Ordner, der die Originalbilder enthält
         output_folder (str): Pfad zum Ordner, in dem die zugeschnittenen Bilder gespeichert werden sollen
+        workers (int, optional): Anzahl der Prozesse, standardmäßig die Anzahl der CPU-Kerne
+        incremental (bool): Ob unveränderte Dateien übersprungen werden
+
+    Returns:
+        tuple: Anzahl der verarbeiteten, übersprungenen und fehlerhaften Dateien
     """
+    start_time = time.perf_counter()  # Speichert die Startzeit
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)  # Erstellt den Ausgabeordner, falls nicht vorhanden
+    previous = load_manifest(output_folder) if incremental else {}
+    manifest, stats, tasks = {}, {}, []
+    skipped = 0
 
-    for file_name in os.listdir(input_folder):
-        if file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp')):  # Überprüft die Dateiendungen
+    for file_name in sorted(os.listdir(input_folder)):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):  # Überprüft die Dateiendungen
             file_path = os.path.join(input_folder, file_name)  # Erstellt den vollständigen Dateipfad
-            try:
-                with Image.open(file_path) as img:  # Öffnet die Bilddatei
-                    try:
-                        for orientation in ExifTags.TAGS.keys():  # Durchsucht EXIF-Tags
-                            if ExifTags.TAGS[orientation] == 'Orientation':  # Findet die Orientierung
-                                break
-                        exif = dict(img._getexif().items())
-                        if exif[orientation] == 3:
-                            img = img.rotate(180, expand=True)  # Dreht das Bild um 180 Grad
-                        elif exif[orientation] == 6:
-                            img = img.rotate(270, expand=True)  # Dreht das Bild um 270 Grad
-                        elif exif[orientation] == 8:
-                            img = img.rotate(90, expand=True)  # Dreht das Bild um 90 Grad
-                    except (AttributeError, KeyError, IndexError):
-                        pass  # Handhabt Ausnahmen, falls EXIF-Daten fehlen
-
-                    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                        img = img.convert("RGBA")  # Konvertiert das Bild in RGBA
-                        bbox = img.getbbox()  # Ermittelt den Bereich des Bildes, der geschnitten werden soll
-                        if bbox:
-                            cropped_image = img.crop(bbox)  # Schneidet das Bild zu
-                            output_path = os.path.join(output_folder, file_name)  # Setzt den Pfad für das zugeschnittene Bild
-                            cropped_image.save(output_path)  # Speichert das zugeschnittene Bild
-                    else:
-                        print(f"Image {file_name} does not support transparency")  # Gibt eine Meldung aus, falls Transparenz nicht unterstützt wird
-            except Exception as e:
-                print(f"Error processing {file_name}: {e}")  # Gibt Fehlermeldungen aus
+            output_path = os.path.join(output_folder, file_name)  # Setzt den Pfad für das zugeschnittene Bild
+            stats[file_name] = os.stat(file_path)
+            entry = previous.get(file_name) if is_valid(previous.get(file_name), output_path) else None
+            if entry and entry['size'] == stats[file_name].st_size and entry['mtime_ns'] == stats[file_name].st_mtime_ns:
+                manifest[file_name] = entry  # Übernimmt den Eintrag, ohne die Datei zu lesen
+                skipped += 1
+                continue
+            tasks.append((file_path, output_path, entry['sha256'] if entry else None))  # Bei geändertem Zeitstempel entscheidet der Hash
         else:
             print(f"Skipped non-image file: {file_name}")  # Gibt eine Meldung aus, wenn eine Datei übersprungen wird
 
+    processed, errors = 0, 0
+    executor = ProcessPoolExecutor(max_workers=workers) if len(tasks) > 1 and workers != 1 else None  # Prozess-Pool nur bei mehreren Dateien
+    results = executor.map(process_file, tasks, chunksize=4) if executor else map(process_file, tasks)
+    try:
+        for file_name, content_hash, status, error in results:
+            if status == 'error':
+                print(f"Error processing {file_name}: {error}")  # Gibt Fehlermeldungen aus, die Datei wird beim nächsten Lauf erneut versucht
+                errors += 1
+                continue
+            if status == 'unchanged':
+                status = previous[file_name]['status']
+                skipped += 1
+            else:
+                processed += 1
+                if status == 'no-transparency':
+                    print(f"Image {file_name} does not support transparency")  # Gibt eine Meldung aus, falls Transparenz nicht unterstützt wird
+            stat = stats[file_name]
+            manifest[file_name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': content_hash, 'params': OUTPUT_PARAMS, 'status': status}
+    finally:
+        if executor:
+            executor.shutdown()  # Beendet die Prozesse
+        save_manifest(output_folder, manifest)  # Speichert den Fortschritt auch bei einem Abbruch
+
+    elapsed = time.perf_counter() - start_time  # Berechnet die Dauer
+    print(f"Processed {processed} files, skipped {skipped} unchanged files, {errors} errors in {elapsed:.1f}s")  # Gibt die Zusammenfassung aus
+    return processed, skipped, errors
+
 if __name__ == '__main__':
     input_folder = 'pictures/2-removed-bg'  # Definiert den Eingabeordner
     output_folder = 'pictures/3-cropped'  # Definiert den Ausgabeordner
+    workers = os.cpu_count() or 1  # Anzahl der Prozesse (1 = ohne Prozess-Pool)
+    incremental = True  # Überspringt Dateien, deren Inhalt und Parameter sich seit dem letzten Lauf nicht geändert haben
 
-    trim_images(input_folder, output_folder)
+    trim_images(input_folder, output_folder, workers, incremental)
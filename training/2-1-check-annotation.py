@@ -1,60 +1,318 @@
+import json
 import os
 import random
-import matplotlib.pyplot as plt
-from PIL import Image, ImageDraw
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
 
 folder = 'pictures/4-extended'  # Ordner mit Bildern und Annotationen
+mode = 'batch'  # 'batch' prüft den ganzen Datensatz, 'random' zeigt ein zufälliges Bild mit Matplotlib an
+workers = os.cpu_count() or 1  # Anzahl der Prozesse für die Prüfung (1 = ohne Prozess-Pool)
+overlap_threshold = 0.5  # Ab diesem IoU gelten zwei Boxen eines Bildes als stark überlappend
+min_box_pixels = 2  # Boxen mit einer kleineren Breite oder Höhe in Pixeln gelten als entartet
+histogram_bins = 20  # Anzahl der Klassen der Histogramme
+report_file = 'pictures/annotation-report.json'  # Ausgabedatei des Berichts
+contact_sheet_file = 'pictures/annotation-contact-sheet.jpg'  # Kontaktbogen mit Overlays, None ohne Kontaktbogen
+contact_sheet_images = 64  # Anzahl der Bilder auf dem Kontaktbogen, auffällige Bilder zuerst
+contact_sheet_columns = 8  # Anzahl der Spalten des Kontaktbogens
+thumbnail_size = 256  # Kantenlänge eines Bildes auf dem Kontaktbogen
+image_extensions = ('.png', '.jpg', '.jpeg', '.webp')  # Bildformate, auch aus dem Export der Shards
 
-def add_texture_to_shadow(draw, left, top, right, bottom, line_width=10, line_color=(255, 255, 0, 32)):
+def load_annotations(label_path):
     """
-    Fügt horizontal verlaufende Linien zur Texturierung eines Schattenbereichs in einem Bild hinzu
+    Liest eine YOLO-Annotationsdatei
 
     Args:
-        draw (ImageDraw.Draw): Das Zeichenobjekt, das zur Bearbeitung des Bildes verwendet wird
-        left (int): Die linke Grenze des Rechtecks
-        top (int): Die obere Grenze des Rechtecks
-        right (int): Die rechte Grenze des Rechtecks
-        bottom (int): Die untere Grenze des Rechtecks
-        line_width (int, optional): Die Breite der Linien. Standardwert ist 10
-        line_color (tuple, optional): Die Farbe der Linien im RGBA-Format. Standardwert ist (255, 255, 0, 32)
+        label_path (str): Pfad zur Annotationsdatei
+
+    Returns:
+        numpy.ndarray: Boxen mit der Form (N, 5) aus Klasse, Mitte x, Mitte y, Breite und Höhe
+
+    Raises:
+        ValueError: Wenn eine Zeile nicht aus fünf Zahlen besteht
     """
-    y_start = top
-    while y_start < bottom:
-        draw.line([(left, y_start), (right, y_start)], fill=line_color, width=line_width)
-        y_start += line_width * 2
+    with open(label_path) as file:
+        lines = [line.split() for line in file if line.strip()]
+    if any(len(line) != 5 for line in lines):
+        raise ValueError("expected 5 values per line")
+    return np.array(lines, dtype=np.float64).reshape(-1, 5)
 
-if __name__ == '__main__':
-    image_files = [f for f in os.listdir(folder) if f.endswith('.png')]  # Liste alle PNG-Dateien im Ordner
-    random_image_file = random.choice(image_files)  # Wählt eine zufällige Bilddatei
-    image = Image.open(os.path.join(folder, random_image_file))  # Öffnet das ausgewählte Bild
-    img_width, img_height = image.size  # Ermittelt Breite und Höhe des Bildes
+def box_corners(boxes, width, height):
+    """
+    Rechnet normierte YOLO-Boxen in Pixelkoordinaten um
+
+    Args:
+        boxes (numpy.ndarray): Boxen mit der Form (N, 5)
+        width (int): Breite des Bildes
+        height (int): Höhe des Bildes
+
+    Returns:
+        numpy.ndarray: Linke, obere, rechte und untere Kante mit der Form (N, 4)
+    """
+    scale = np.array([width, height, width, height], dtype=np.float64)
+    x_center, y_center, box_width, box_height = boxes[:, 1], boxes[:, 2], boxes[:, 3], boxes[:, 4]
+    corners = np.stack([x_center - box_width / 2, y_center - box_height / 2, x_center + box_width / 2, y_center + box_height / 2], axis=1)
+    return corners * scale
+
+def pairwise_iou(corners):
+    """
+    Berechnet die Überlappung (IoU) aller Boxpaare eines Bildes auf einmal
+
+    Args:
+        corners (numpy.ndarray): Kanten der Boxen mit der Form (N, 4)
+
+    Returns:
+        numpy.ndarray: IoU-Matrix mit der Form (N, N)
+    """
+    left_top = np.maximum(corners[:, None, :2], corners[None, :, :2])
+    right_bottom = np.minimum(corners[:, None, 2:], corners[None, :, 2:])
+    intersection = np.prod(np.clip(right_bottom - left_top, 0, None), axis=2)
+    areas = np.prod(np.clip(corners[:, 2:] - corners[:, :2], 0, None), axis=1)
+    union = areas[:, None] + areas[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+def draw_overlay(image, boxes, line_width=10):
+    """
+    Legt einen halbtransparenten, gestreiften Schatten über alle Boxen eines Bildes
+
+    Rechtecke und Streifen werden als Array-Masken gesetzt statt mit einem Zeichenbefehl pro Streifen.
+
+    Args:
+        image (Image): Das Bild
+        boxes (numpy.ndarray): Boxen mit der Form (N, 5)
+        line_width (int, optional): Die Breite der Streifen. Standardwert ist 10
+
+    Returns:
+        Image: Das Bild mit Overlay im RGB-Modus
+    """
+    pixels = np.asarray(image.convert('RGB'), dtype=np.float32)
+    height, width = pixels.shape[:2]
+    color = np.zeros((height, width, 3), dtype=np.float32)
+    alpha = np.zeros((height, width), dtype=np.float32)
+    rows = np.arange(height)
+    for left, top, right, bottom in np.rint(box_corners(boxes, width, height)).astype(int):
+        top, bottom = max(top, 0), min(bottom + 1, height)
+        left, right = max(left, 0), min(right + 1, width)
+        if top >= bottom or left >= right:
+            continue
+        stripes = ((rows[top:bottom] - top + line_width // 2) % (2 * line_width)) < line_width  # Gelbe Streifen im Abstand der doppelten Breite
+        color[top:bottom, left:right] = np.where(stripes[:, None, None], np.float32([255, 255, 0]), np.float32(0))
+        alpha[top:bottom, left:right] = np.where(stripes[:, None], 32 / 255, 127 / 255)
+    alpha = alpha[..., None]
+    combined = pixels * (1 - alpha) + color * alpha  # Wie Image.alpha_composite auf deckendem Bild
+    return Image.fromarray(np.clip(combined + 0.5, 0, 255).astype(np.uint8), 'RGB')
+
+def check_pair(task):
+    """
+    Prüft ein Bild und seine Annotationsdatei
+
+    Args:
+        task (tuple): Name, Pfad des Bildes, Pfad der Annotationsdatei (oder None), Schwelle für die Überlappung und Mindestgröße in Pixeln
+
+    Returns:
+        dict: Name, Pfad, Bildgröße, Boxen als Liste und gefundene Probleme
+    """
+    name, image_path, label_path, threshold, min_pixels = task
+    result = {'name': name, 'path': image_path, 'size': None, 'boxes': [], 'issues': []}
+    try:
+        with Image.open(image_path) as image:  # Liest nur den Dateikopf
+            width, height = image.size
+        result['size'] = (width, height)
+    except Exception as e:
+        result['issues'].append({'type': 'unreadable-image', 'detail': str(e)})
+        return result
+    if label_path is None:
+        result['issues'].append({'type': 'missing-label'})
+        return result
+    try:
+        boxes = load_annotations(label_path)
+    except (OSError, ValueError) as e:
+        result['issues'].append({'type': 'malformed-label', 'detail': str(e)})
+        return result
+    result['boxes'] = boxes.tolist()
+
+    classes = boxes[:, 0]
+    for index in np.flatnonzero((classes < 0) | (classes != np.round(classes))):
+        result['issues'].append({'type': 'invalid-class', 'box': int(index), 'class': float(classes[index])})
+    corners = box_corners(boxes, width, height)
+    degenerate = (corners[:, 2] - corners[:, 0] < min_pixels) | (corners[:, 3] - corners[:, 1] < min_pixels)
+    for index in np.flatnonzero(degenerate):
+        result['issues'].append({'type': 'degenerate-box', 'box': int(index), 'width': float(boxes[index, 3]), 'height': float(boxes[index, 4])})
+    tolerance = 0.5  # Rundung auf halbe Pixel beim Schreiben der Annotationen
+    outside = (corners[:, 0] < -tolerance) | (corners[:, 1] < -tolerance) | (corners[:, 2] > width + tolerance) | (corners[:, 3] > height + tolerance)
+    for index in np.flatnonzero(outside):
+        result['issues'].append({'type': 'out-of-bounds', 'box': int(index), 'corners': np.round(corners[index], 1).tolist()})
+    iou = pairwise_iou(corners)
+    for first, second in zip(*np.nonzero(np.triu(iou, k=1) > threshold)):  # Jedes Paar nur einmal
+        result['issues'].append({'type': 'overlap', 'boxes': [int(first), int(second)], 'iou': round(float(iou[first, second]), 3)})
+    return result
+
+def render_thumbnail(task):
+    """
+    Rendert ein Bild mit Overlay als Vorschaubild für den Kontaktbogen
+
+    Args:
+        task (tuple): Pfad des Bildes, Boxen und Kantenlänge des Vorschaubildes
+
+    Returns:
+        numpy.ndarray: Das Vorschaubild als RGB-Array, auf ein Quadrat mit schwarzem Rand aufgefüllt
+    """
+    image_path, boxes, size = task
+    with Image.open(image_path) as image:
+        overlay = draw_overlay(image, np.array(boxes, dtype=np.float64).reshape(-1, 5))
+    overlay.thumbnail((size, size))
+    thumbnail = np.zeros((size, size, 3), dtype=np.uint8)
+    thumbnail[:overlay.height, :overlay.width] = np.asarray(overlay)
+    return thumbnail
+
+def build_histograms(results, bins):
+    """
+    Berechnet Histogramme über Größe und Lage aller Boxen
+
+    Args:
+        results (list): Ergebnisse von `check_pair`
+        bins (int): Anzahl der Klassen
+
+    Returns:
+        dict: Histogramme mit Klassengrenzen und Anzahlen
+    """
+    boxes = [box for result in results for box in result['boxes']]
+    boxes = np.array(boxes, dtype=np.float64).reshape(-1, 5)
+    unit = np.linspace(0, 1, bins + 1)
+    histograms = {}
+    for key, values in (('x_center', boxes[:, 1]), ('y_center', boxes[:, 2]), ('width', boxes[:, 3]), ('height', boxes[:, 4]),
+                        ('area', boxes[:, 3] * boxes[:, 4])):
+        counts, edges = np.histogram(np.clip(values, 0, 1), bins=unit)  # Werte außerhalb werden in die Randklassen gezählt
+        histograms[key] = {'edges': edges.round(4).tolist(), 'counts': counts.tolist()}
+    position, _, _ = np.histogram2d(np.clip(boxes[:, 2], 0, 1), np.clip(boxes[:, 1], 0, 1), bins=[unit, unit])  # Zeilen: y, Spalten: x
+    histograms['position'] = {'edges': unit.round(4).tolist(), 'counts': position.astype(int).tolist()}
+    boxes_per_image = np.bincount([len(result['boxes']) for result in results if result['size']]) if results else np.zeros(0, dtype=int)
+    histograms['boxes_per_image'] = {'counts': boxes_per_image.tolist()}  # Index = Anzahl der Boxen
+    return histograms
 
-    annotation_file = random_image_file[:-4] + '.txt'  # Bildet den Dateinamen der Annotationen
+def validate_dataset(folder, num_workers=1, threshold=0.5, min_pixels=2, bins=20):
+    """
+    Prüft alle Bild- und Annotationspaare eines Ordners parallel
 
-    with open(os.path.join(folder, annotation_file), 'r') as file:  # Öffnet die Annotationsdatei
-        annotations = [list(map(float, line.split()[1:])) for line in file.readlines()]  # Liest und verarbeitet die Annotationsdaten
+    Args:
+        folder (str): Ordner mit Bildern und Annotationen
+        num_workers (int): Anzahl der Prozesse
+        threshold (float): IoU, ab dem zwei Boxen als stark überlappend gelten
+        min_pixels (int): Mindestbreite und -höhe einer Box in Pixeln
+        bins (int): Anzahl der Klassen der Histogramme
 
-    shadow = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 0))  # Erstellt ein transparentes Overlay
-    draw = ImageDraw.Draw(shadow)  # Erstellt ein Zeichenobjekt für das Overlay
+    Returns:
+        tuple: Der Bericht und die Ergebnisse der einzelnen Bilder
+    """
+    start_time = time.perf_counter()
+    images, labels = {}, {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() in image_extensions:
+                images[stem] = entry.path
+            elif extension.lower() == '.txt':
+                labels[stem] = entry.path
 
-    for x_center, y_center, width, height in annotations:
-        x_center *= img_width  # Skaliert den x-Mittelpunkt
-        y_center *= img_height  # Skaliert den y-Mittelpunkt
-        width *= img_width  # Skaliert die Breite
-        height *= img_height  # Skaliert die Höhe
+    tasks = [(stem, images[stem], labels.get(stem), threshold, min_pixels) for stem in sorted(images)]
+    if num_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(check_pair, tasks, chunksize=64))  # Verteilt die Paare in Blöcken auf die Prozesse
+    else:
+        results = [check_pair(task) for task in tasks]
 
-        left = x_center - (width / 2)  # Berechnet die linke Grenze
-        top = y_center - (height / 2)  # Berechnet die obere Grenze
-        right = x_center + (width / 2)  # Berechnet die rechte Grenze
-        bottom = y_center + (height / 2)  # Berechnet die untere Grenze
+    issues = {}
+    for result in results:
+        for issue in result['issues']:
+            issues.setdefault(issue['type'], []).append({'name': result['name'], **issue})
+    for stem in sorted(set(labels) - set(images)):  # Annotationen ohne Bild
+        issues.setdefault('orphaned-label', []).append({'name': stem, 'type': 'orphaned-label'})
 
-        draw.rectangle([left, top, right, bottom], fill=(0, 0, 0, 127))  # Zeichnet ein Rechteck auf das Overlay
-        add_texture_to_shadow(draw, left, top, right, bottom)  # Fügt Texturen zu den Rechtecken hinzu
+    report = {
+        'folder': folder,
+        'images': len(images),
+        'labels': len(labels),
+        'boxes': sum(len(result['boxes']) for result in results),
+        'flagged_images': sum(1 for result in results if result['issues']),
+        'issue_counts': {issue_type: len(entries) for issue_type, entries in sorted(issues.items())},
+        'issues': issues,
+        'histograms': build_histograms(results, bins),
+        'elapsed_seconds': round(time.perf_counter() - start_time, 2)
+    }
+    return report, results
 
-    combined = Image.alpha_composite(image.convert('RGBA'), shadow)  # Kombiniert das Bild mit dem Overlay
+def render_contact_sheet(results, output_path, count, columns, size, num_workers=1):
+    """
+    Rendert Bilder mit Overlay ohne Anzeige in einen Kontaktbogen, auffällige Bilder zuerst
+
+    Args:
+        results (list): Ergebnisse von `check_pair`
+        output_path (str): Pfad des Kontaktbogens
+        count (int): Maximale Anzahl der Bilder
+        columns (int): Anzahl der Spalten
+        size (int): Kantenlänge eines Bildes
+        num_workers (int): Anzahl der Prozesse
+
+    Returns:
+        int: Anzahl der Bilder auf dem Kontaktbogen
+    """
+    readable = [result for result in results if result['size']]
+    flagged = [result for result in readable if result['issues']]
+    others = [result for result in readable if not result['issues']]
+    selected = (flagged + random.sample(others, max(0, min(count - len(flagged), len(others)))))[:count]
+    if not selected:
+        return 0
+
+    tasks = [(result['path'], result['boxes'], size) for result in selected]
+    if num_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            thumbnails = list(executor.map(render_thumbnail, tasks))
+    else:
+        thumbnails = [render_thumbnail(task) for task in tasks]
+
+    rows = -(-len(thumbnails) // columns)  # Aufrunden
+    sheet = np.zeros((rows * size, columns * size, 3), dtype=np.uint8)
+    for index, thumbnail in enumerate(thumbnails):
+        row, column = divmod(index, columns)
+        sheet[row * size:(row + 1) * size, column * size:(column + 1) * size] = thumbnail
+    Image.fromarray(sheet).save(output_path, quality=90)
+    return len(thumbnails)
+
+def show_random_image(folder):
+    """
+    Zeigt ein zufälliges Bild mit seinen Annotationen mit Matplotlib an
+
+    Args:
+        folder (str): Ordner mit Bildern und Annotationen
+    """
+    import matplotlib.pyplot as plt  # Nur für die Anzeige benötigt, die Prüfung läuft ohne Matplotlib
+
+    image_files = [f for f in os.listdir(folder) if f.lower().endswith(image_extensions)]  # Liste alle Bilddateien im Ordner
+    random_image_file = random.choice(image_files)  # Wählt eine zufällige Bilddatei
+    image = Image.open(os.path.join(folder, random_image_file))  # Öffnet das ausgewählte Bild
+    annotation_file = os.path.splitext(random_image_file)[0] + '.txt'  # Bildet den Dateinamen der Annotationen
+    annotations = load_annotations(os.path.join(folder, annotation_file))  # Liest die Annotationsdaten
+    combined = draw_overlay(image, annotations)  # Legt den gestreiften Schatten über die Boxen
 
     plt.figure(figsize=(10, 10))  # Erstellt eine Figur für die Darstellung
     plt.imshow(combined)  # Zeigt das kombinierte Bild
     plt.axis('off')  # Entfernt die Achsen
     plt.subplots_adjust(left=0, right=1, top=1, bottom=0)  # Passt den Plot an das Bild an
     plt.show()
+
+if __name__ == '__main__':
+    if mode == 'random':
+        show_random_image(folder)
+    else:
+        report, results = validate_dataset(folder, workers, overlap_threshold, min_box_pixels, histogram_bins)
+        with open(report_file, 'w') as file:
+            json.dump(report, file, indent=1)  # Schreibt den Bericht
+        print(f"Checked {report['images']} images and {report['labels']} label files with {report['boxes']} boxes in {report['elapsed_seconds']}s")
+        print(f"{report['flagged_images']} images flagged")
+        for issue_type, count in report['issue_counts'].items():
+            print(f"  {issue_type}: {count}")
+        if contact_sheet_file:
+            rendered = render_contact_sheet(results, contact_sheet_file, contact_sheet_images, contact_sheet_columns, thumbnail_size, workers)
+            print(f"Contact sheet with {rendered} images written to {contact_sheet_file}")
+        print(f"Report written to {report_file}")
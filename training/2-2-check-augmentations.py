@@ -0,0 +1,140 @@
+import importlib.util
+import os
+import random
+import time
+from collections import Counter
+import numpy as np
+from PIL import Image, ImageFilter
+import augmentations
+
+samples = 256  # Anzahl der künstlichen Beispiele
+batch_size = 16  # Beispiele pro Bündel, wie samples_per_task in 2-prepare-dataset.py
+size = 640  # Kantenlänge der Beispiele in Pixeln
+seed = 0  # Startwert für Bilder und Effekte
+effect_chance = 85  # Wahrscheinlichkeit für Effekte, wie in 2-prepare-dataset.py
+max_deviation = 4  # Zulässige Abweichung der Häufigkeit eines Effekts vom Erwartungswert in Standardabweichungen
+
+
+def load_prepare_dataset():
+    """
+    Lädt 2-prepare-dataset.py als Modul, um die PIL-Variante der Effekte aufzurufen
+
+    Returns:
+        module: Das Modul
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '2-prepare-dataset.py')
+    spec = importlib.util.spec_from_file_location('prepare_dataset', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_images(count, rng):
+    """
+    Erzeugt weichgezeichnete Zufallsbilder als Ersatz für zusammengesetzte Beispiele
+
+    Args:
+        count (int): Anzahl der Bilder
+        rng (numpy.random.Generator): Der Zufallsgenerator
+
+    Returns:
+        numpy.ndarray: Die Bilder mit der Form (N, H, W, 3) als uint8
+    """
+    images = rng.integers(0, 256, (count, size, size, 3), dtype=np.uint8)
+    return np.stack([np.asarray(Image.fromarray(image).filter(ImageFilter.GaussianBlur(3))) for image in images])
+
+
+def run_pil(prepare_dataset, images):
+    """
+    Wendet die Effekte wie mit augmentation_engine = 'pil' einzeln an
+
+    Returns:
+        tuple: Laufzeit in Sekunden, Effektstatistik und die Namen der Effekte pro Bild
+    """
+    effect_statistics, effect_names = {}, []
+    prepare_dataset.effect_chance = effect_chance
+    pil_images = [Image.fromarray(image).convert('RGBA') for image in images]
+    started = time.perf_counter()
+    for i, image in enumerate(pil_images):
+        random.seed(seed + i)
+        effect_names.append(prepare_dataset.apply_random_transformation(image, effect_statistics)[1])
+    return time.perf_counter() - started, effect_statistics, effect_names
+
+
+def run_numpy(images):
+    """
+    Wendet die Effekte wie mit augmentation_engine = 'numpy' bündelweise an
+
+    Returns:
+        tuple: Laufzeit in Sekunden, Effektstatistik und die Namen der Effekte pro Bild
+    """
+    effect_statistics, effect_names = {}, []
+    started = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        rngs = [np.random.default_rng(seed + i) for i in range(start, min(start + batch_size, len(images)))]
+        _, names = augmentations.apply_random_transformation(images[start:start + batch_size], rngs, effect_statistics, effect_chance)
+        effect_names.extend(names)
+    return time.perf_counter() - started, effect_statistics, effect_names
+
+
+def check_accounting(name, effect_statistics, effect_names):
+    """
+    Prüft, ob die Effektstatistik genau die angewendeten Effekte zählt
+
+    Raises:
+        AssertionError: Wenn Statistik und Effekte der Bilder voneinander abweichen
+    """
+    counted = Counter(effect for names in effect_names for effect in names.split(", "))
+    assert dict(counted) == effect_statistics, f"{name}: Statistik {effect_statistics} passt nicht zu den Effekten {dict(counted)}"
+    assert sum(1 for names in effect_names if names != augmentations.SKIP_EFFECT) + effect_statistics.get(augmentations.SKIP_EFFECT, 0) == len(effect_names)
+
+
+def expected_rates():
+    """
+    Berechnet, mit welcher Wahrscheinlichkeit ein Bild einen bestimmten Effekt erhält
+
+    Ein Bild erhält mit effect_chance 1 bis 4 verschiedene Effekte, jeder Effekt kommt höchstens einmal vor.
+
+    Returns:
+        dict: Wahrscheinlichkeit pro Effekt, einschließlich des Skip-Effekts
+    """
+    chance = effect_chance / 100
+    rates = {effect: chance * 2.5 / len(augmentations.TRANSFORMATIONS) for effect in augmentations.TRANSFORMATIONS}
+    rates[augmentations.SKIP_EFFECT] = 1 - chance
+    return rates
+
+
+def check_rates(name, effect_statistics, rates):
+    """
+    Prüft, ob jeder Effekt so oft vorkommt wie erwartet
+
+    Raises:
+        AssertionError: Wenn ein Effekt um mehr als max_deviation Standardabweichungen abweicht
+    """
+    unknown = set(effect_statistics) - set(rates)
+    assert not unknown, f"{name}: unbekannte Effekte {unknown}"
+    for effect, rate in rates.items():
+        observed = effect_statistics.get(effect, 0) / samples
+        deviation = abs(observed - rate) / np.sqrt(rate * (1 - rate) / samples)
+        assert deviation <= max_deviation, f"{name}: {effect} bei {observed:.3f} pro Bild statt {rate:.3f}"
+
+
+if __name__ == '__main__':
+    images = synthetic_images(samples, np.random.default_rng(seed))
+    prepare_dataset = load_prepare_dataset()
+
+    pil_seconds, pil_statistics, pil_names = run_pil(prepare_dataset, images)
+    numpy_seconds, numpy_statistics, numpy_names = run_numpy(images)
+    check_accounting('pil', pil_statistics, pil_names)
+    check_accounting('numpy', numpy_statistics, numpy_names)
+    rates = expected_rates()
+    check_rates('pil', pil_statistics, rates)
+    check_rates('numpy', numpy_statistics, rates)
+
+    print(f"{'Effekt pro Bild':20s} {'erwartet':>8s} {'pil':>6s} {'numpy':>6s}")
+    for effect, rate in rates.items():
+        print(f"{effect:20s} {rate:8.3f} {pil_statistics.get(effect, 0) / samples:6.3f} {numpy_statistics.get(effect, 0) / samples:6.3f}")
+
+    print(f"pil:   {pil_seconds:.2f} s ({pil_seconds / samples * 1000:.1f} ms pro Bild)")
+    print(f"numpy: {numpy_seconds:.2f} s ({numpy_seconds / samples * 1000:.1f} ms pro Bild)")
+    print(f"Faktor: {pil_seconds / numpy_seconds:.2f}")
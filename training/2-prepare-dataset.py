@@ -1,18 +1,34 @@
-import itertools  # Importiert das itertools-Modul
+import hashlib  # Importiert das hashlib-Modul
 import os  # Importiert das os-Modul
 import random  # Importiert das random-Modul
+import time  # Importiert das time-Modul
+from concurrent.futures import ProcessPoolExecutor  # Importiert ProcessPoolExecutor für die parallele Generierung
+from functools import lru_cache  # Importiert lru_cache aus dem functools-Modul
 from io import BytesIO  # Importiert BytesIO aus dem io-Modul
-from time import sleep  # Importiert sleep aus dem time-Modul
+import numpy as np  # Importiert das numpy-Modul
 from PIL import Image, ImageFilter, ImageEnhance, ImageOps, ImageDraw  # Importiert verschiedene Funktionen aus PIL
 from datetime import datetime  # Importiert datetime aus dem datetime-Modul
 import requests  # Importiert das requests-Modul
+from background_pool import BackgroundPool, build_pool  # Importiert den lokalen Hintergrund-Pool
+import augmentations  # Importiert die Effekt-Engine für ganze Bündel von Bildern
+from dataset_shards import ShardWriter, encode_image  # Importiert den Writer für das Ausgabeformat in Shards
 
 size = 640  # Setzt die Bildgröße auf 640 Pixel
 probe_size = 3  # Setzt die Anzahl der zu verarbeitenden Bilder auf N
 input_folder = 'pictures/3-cropped'  # Definiert den Ordner für die Eingabedaten
 output_folder = 'pictures/4-extended'  # Definiert den Ordner für die Ausgabedaten
-done = 0  # Initialisiert den Zähler für erledigte Bilder
-expected = 0  # Initialisiert den erwarteten Zähler für Bilder
+workers = os.cpu_count() or 1  # Anzahl der Prozesse für die Generierung (1 = ohne Prozess-Pool)
+samples_per_task = 16  # Anzahl der Beispiele, die ein Prozess am Stück für eine Flasche erzeugt
+seed = 42  # Startwert, aus dem der Zufall jedes Beispiels abgeleitet wird
+download_attempts = 10  # Maximale Anzahl an Versuchen, einen Hintergrund herunterzuladen
+background_source = 'pool'  # Herkunft der Hintergründe: 'pool' (lokal, ohne Netzwerk) oder 'download'
+background_folder = 'pictures/0-backgrounds'  # Definiert den Ordner mit den Hintergrundbildern für den Pool
+background_pool_folder = 'pictures/backgrounds-pool'  # Definiert den Ordner des vorab skalierten Hintergrund-Pools
+output_format = 'shards'  # Ausgabe in Shards mit Index ('shards') oder als PNG- und TXT-Datei pro Beispiel ('files')
+shard_folder = 'pictures/4-extended-shards'  # Definiert den Ordner für die Shards
+shard_encoding = 'jpeg'  # Kodierung der Bilder in den Shards: 'jpeg', 'png' oder 'webp'
+shard_quality = 95  # Qualität für JPEG und WebP
+augmentation_engine = 'numpy'  # Effekte gebündelt pro Effekt mit NumPy und OpenCV ('numpy') oder einzeln mit PIL ('pil')
 effect_chance = 85  # Setzt die Wahrscheinlichkeit für Effekte auf 85%
 multi_effect_chance = 35  # Setzt die Wahrscheinlichkeit für mehrere Effekte auf 35%
 bg_urls = [  # Definiert eine Liste von URLs für Hintergrundbilder
@@ -20,8 +36,6 @@ bg_urls = [  # Definiert eine Liste von URLs für Hintergrundbilder
     f'https://picsum.photos/{size}/{size}',
     f'https://source.unsplash.com/random/{size}x{size}'
 ]
-global_url_counter = itertools.cycle(range(len(bg_urls)))  # Zyklischer Zähler für die Hintergrund-URLs
-effect_statistics = {}  # Initialisiert ein Wörterbuch für Effektstatistiken
 
 
 def count_image_files(input_folder):  # Definiert eine Funktion zum Zählen der Bilddateien
@@ -35,7 +49,7 @@ def count_image_files(input_folder):  # Definiert eine Funktion zum Zählen der
     return image_count  # Gibt die Anzahl der Bilder zurück
 
 
-def apply_random_transformation(img):  # Definiert eine Funktion zur zufälligen Bildtransformation
+def apply_random_transformation(img, effect_statistics):  # Definiert eine Funktion zur zufälligen Bildtransformation
     transformations = [  # Liste von möglichen Bildtransformationen
         ("contrast", lambda x: ImageEnhance.Contrast(x).enhance(random.uniform(1.5, 2.5))),
         ("brightness", lambda x: ImageEnhance.Brightness(x).enhance(random.uniform(1.5, 2.0))),
@@ -122,7 +136,7 @@ def apply_damage(img):  # Definiert eine Funktion zur Anwendung von Beschädigun
     enhancer = ImageEnhance.Color(img)  # Erstellt ein Farbenhancement-Objekt
     img = enhancer.enhance(0.8)  # Verringert die Farbsättigung
 
-    noise = Image.effect_noise((width, height), 10)  # Erstellt ein Rauschbild
+    noise = random_noise((width, height), 10)  # Erstellt ein Rauschbild
     noise = Image.blend(img, noise.convert('RGB'), alpha=0.05)  # Mischt das Rauschbild mit dem Originalbild
 
     for _ in range(random.randint(0, 3)):  # Fügt zufällige Flecken hinzu
@@ -137,7 +151,7 @@ def apply_damage(img):  # Definiert eine Funktion zur Anwendung von Beschädigun
 
 def apply_vhs_effect(img):  # Definiert eine Funktion zur Anwendung des VHS-Effekts
     img = img.convert('RGB')  # Konvertiert das Bild in RGB
-    noise = Image.effect_noise(img.size, random.uniform(0.1, 0.5))  # Erstellt ein Rauschbild
+    noise = random_noise(img.size, random.uniform(0.1, 0.5))  # Erstellt ein Rauschbild
     img = Image.blend(img, noise.convert('RGB'), alpha=random.uniform(0.2, 0.5))  # Mischt das Rauschbild mit dem Originalbild
     draw = ImageDraw.Draw(img)  # Erstellt ein Zeichnungsobjekt
     for y in range(0, img.height, 4):  # Zeichnet horizontale Linien
@@ -148,6 +162,12 @@ def apply_vhs_effect(img):  # Definiert eine Funktion zur Anwendung des VHS-Effe
     return img  # Gibt das veränderte Bild zurück
 
 
+def random_noise(size, sigma):  # Definiert eine Funktion zur Erzeugung eines reproduzierbaren Rauschbildes
+    rng = np.random.default_rng(random.getrandbits(64))  # Leitet den Zufall vom Startwert des Beispiels ab, anders als Image.effect_noise
+    noise = rng.normal(128, sigma, (size[1], size[0]))  # Erzeugt Gaußsches Rauschen um den Mittelwert 128
+    return Image.fromarray(np.clip(noise, 0, 255).astype(np.uint8), 'L')  # Gibt das Rauschbild als Graustufenbild zurück
+
+
 def random_rgb_shift(img):  # Definiert eine Funktion zur zufälligen RGB-Verschiebung
     r, g, b, a = img.split()  # Teilt das Bild in seine Kanäle auf
     r = r.point(lambda i: i + random.randint(-10, 10))  # Verschiebt den roten Kanal
@@ -186,6 +206,13 @@ def create_annotation_file(final_path, annotations, image_size):  # Definiert ei
             file.write(f"{class_index} {x_center} {y_center} {norm_width} {norm_height}\n")  # Schreibt die Annotationsdaten in die Datei
 
 
+def create_boxes(annotations, image_size):  # Definiert eine Funktion, die die Annotationen als kompaktes Array liefert
+    class_index = 0  # Setzt den Klassenindex
+    boxes = [(class_index, (x + width / 2) / image_size[0], (y + height / 2) / image_size[1], width / image_size[0], height / image_size[1])
+             for x, y, width, height in annotations]  # Dieselben normierten Werte wie in der Annotationsdatei
+    return np.array(boxes, dtype=np.float32).reshape(-1, 5)  # Gibt die Boxen als Array (Anzahl, 5) zurück
+
+
 def place_multiple_images_on_background(images, bg):  # Definiert eine Funktion zum Platzieren mehrerer Bilder auf einem Hintergrund
     annotations = []  # Initialisiert eine Liste für Annotationsdaten
     for img in images:  # Durchläuft die Bilder
@@ -215,53 +242,151 @@ def download_background(url, timeout=10):  # Definiert eine Funktion zum Herunte
     return None  # Gibt None zurück, wenn das Herunterladen fehlschlägt
 
 
-def process_images(input_folder, output_folder, num_images=1):  # Definiert eine Funktion zur Verarbeitung von Bildern
-    global done, expected  # Verwendet globale Variablen
-    for img_name in os.listdir(input_folder):  # Durchläuft die Dateien im Eingabeordner
-        if img_name.endswith('.png'):  # Prüft, ob die Datei eine PNG-Datei ist
-            img_path = os.path.join(input_folder, img_name)  # Erstellt den vollständigen Dateipfad
-            with Image.open(img_path) as img:  # Öffnet das Bild
-                img = img.convert('RGBA')  # Konvertiert das Bild in RGBA
-
-                for i in range(num_images):  # Durchläuft die Anzahl der zu erstellenden Bilder
-                    final_path = os.path.join(output_folder, f'{img_name.split(".")[0]}_{i}.png')  # Erstellt den Pfad für das Ausgabebild
-                    url_index = next(global_url_counter)  # Holt die nächste URL für den Hintergrund
-                    url = bg_urls[url_index]  # Holt die URL aus der Liste
-
-                    bg = None  # Initialisiert den Hintergrund
-                    while not bg:  # Versucht, den Hintergrund herunterzuladen
-                        bg = download_background(url)
-                        if not bg:
-                            url_index = next(global_url_counter)
-                            url = bg_urls[url_index]
-
-                    img_transformed = random_rotate_and_scale_image(img)  # Dreht und skaliert das Bild
-
-                    if random.random() < 0.25:  # Prüft, ob das Bild dupliziert werden soll
-                        duplication_count = random.choice([2, 3])  # Wählt die Anzahl der Duplikate
-                        images = [img_transformed for _ in range(duplication_count)]  # Erstellt die Duplikate
-                    elif random.random() < 0.25:  # Prüft, ob das Bild verdoppelt werden soll
-                        images = [img_transformed, img_transformed]  # Verdoppelt das Bild
-                    else:
-                        images = [img_transformed]  # Verwendet das Bild einmal
-
-                    final_image, annotations = place_multiple_images_on_background(images, bg)  # Platziert die Bilder auf dem Hintergrund
-                    img_transformed_f, effect_name = apply_random_transformation(final_image)  # Wendet zufällige Effekte an
+@lru_cache(maxsize=1)
+def get_background_pool():  # Definiert eine Funktion, die den Hintergrund-Pool einmal pro Prozess öffnet
+    return BackgroundPool(background_pool_folder)  # Bildet den Pool in den Speicher ab
+
+
+def fetch_background():  # Definiert eine Funktion, die einen Hintergrund lädt
+    if background_source == 'pool':  # Prüft, ob der lokale Pool verwendet wird
+        return get_background_pool().sample()  # Zieht einen Hintergrund abhängig vom Startwert des Beispiels
+    url_index = random.randrange(len(bg_urls))  # Wählt die erste URL abhängig vom Startwert des Beispiels
+    for attempt in range(download_attempts):  # Versucht die URLs der Reihe nach
+        bg = download_background(bg_urls[(url_index + attempt) % len(bg_urls)])  # Lädt den Hintergrund herunter
+        if bg:
+            return bg  # Gibt den Hintergrund zurück
+        time.sleep(min(2 ** attempt, 30) * 0.1)  # Wartet mit wachsendem Abstand, bevor es erneut versucht wird
+    return None  # Gibt None zurück, wenn kein Hintergrund geladen werden konnte
+
+
+def sample_seed(base_seed, img_name, index):  # Definiert eine Funktion zur Berechnung des Startwerts eines Beispiels
+    digest = hashlib.sha256(f'{base_seed}:{img_name}:{index}'.encode('utf-8')).digest()  # Unabhängig von Prozess und Reihenfolge
+    return int.from_bytes(digest[:8], 'big')  # Gibt den Startwert als Ganzzahl zurück
+
+
+@lru_cache(maxsize=8)
+def load_bottle(img_path):  # Definiert eine Funktion, die eine Flasche einmal pro Prozess lädt
+    with Image.open(img_path) as img:  # Öffnet das Bild
+        return img.convert('RGBA')  # Konvertiert das Bild in RGBA
+
+
+def compose_sample(img, img_name, index, output_folder, base_seed):  # Definiert eine Funktion, die ein Beispiel ohne Effekte zusammensetzt
+    random.seed(sample_seed(base_seed, img_name, index))  # Setzt den Zufall des Beispiels, damit Läufe reproduzierbar sind
+    final_path = os.path.join(output_folder, f'{img_name.split(".")[0]}_{index}.png')  # Erstellt den Pfad für das Ausgabebild
+
+    bg = fetch_background()  # Lädt den Hintergrund
+    if not bg:
+        print(f"No background for {final_path}, sample skipped")  # Gibt eine Meldung aus, falls kein Hintergrund geladen werden konnte
+        return None
+
+    img_transformed = random_rotate_and_scale_image(img)  # Dreht und skaliert das Bild
+
+    if random.random() < 0.25:  # Prüft, ob das Bild dupliziert werden soll
+        duplication_count = random.choice([2, 3])  # Wählt die Anzahl der Duplikate
+        images = [img_transformed for _ in range(duplication_count)]  # Erstellt die Duplikate
+    elif random.random() < 0.25:  # Prüft, ob das Bild verdoppelt werden soll
+        images = [img_transformed, img_transformed]  # Verdoppelt das Bild
+    else:
+        images = [img_transformed]  # Verwendet das Bild einmal
+
+    final_image, annotations = place_multiple_images_on_background(images, bg)  # Platziert die Bilder auf dem Hintergrund
+    effect_seed = random.getrandbits(64)  # Eigener Zufall für die Effekte, unabhängig von der Bündelung
+    return final_path, final_image, annotations, effect_seed  # Gibt das zusammengesetzte Beispiel zurück
+
+
+def apply_effects(samples, effect_statistics):  # Definiert eine Funktion, die die Effekte auf alle Beispiele eines Abschnitts anwendet
+    if augmentation_engine == 'pil':  # Prüft, ob die Effekte einzeln mit PIL angewendet werden
+        results = []
+        for _, final_image, _, effect_seed in samples:
+            random.seed(effect_seed)  # Setzt den Zufall der Effekte des Beispiels
+            results.append(apply_random_transformation(final_image, effect_statistics)[0])  # Wendet zufällige Effekte an
+        return results
+
+    results = [None] * len(samples)  # Initialisiert die Liste der Ergebnisse
+    batches = {}  # Beispiele gleicher Größe werden gemeinsam bearbeitet
+    for i, (_, final_image, _, _) in enumerate(samples):
+        batches.setdefault(final_image.size, []).append(i)
+    for indices in batches.values():
+        rgba = np.stack([np.asarray(samples[i][1].convert('RGBA')) for i in indices])  # Stapelt die Bilder zu einem Bündel
+        images = np.ascontiguousarray(rgba[..., :3])  # Die Effekte verändern nur die Farbkanäle
+        rngs = [np.random.default_rng(samples[i][3]) for i in indices]  # Ein Zufallsgenerator pro Beispiel
+        images, _ = augmentations.apply_random_transformation(images, rngs, effect_statistics, effect_chance)  # Wendet zufällige Effekte an
+        rgba[..., :3] = images  # Übernimmt den Alphakanal des zusammengesetzten Bildes
+        for i, image in zip(indices, rgba):
+            results[i] = Image.fromarray(image, 'RGBA')
+    return results
+
+
+def save_sample(final_path, img_transformed_f, annotations):  # Definiert eine Funktion, die ein Beispiel als Dateien speichert
+    img_transformed_f.save(final_path, icc_profile=None)  # Speichert das Bild ohne Farbprofil
+
+    create_annotation_file(final_path, annotations, img_transformed_f.size)  # Erstellt die Annotationsdatei
+
+
+def process_task(task):  # Definiert eine Funktion, die einen Abschnitt an Beispielen einer Flasche erzeugt
+    img_path, output_folder, start, end, base_seed = task  # Entpackt die Aufgabe
+    img = load_bottle(img_path)  # Lädt die Flasche
+    img_name = os.path.basename(img_path)  # Ermittelt den Dateinamen
+    effect_statistics = {}  # Effektstatistik nur für diesen Abschnitt
+    samples = [compose_sample(img, img_name, i, output_folder, base_seed) for i in range(start, end)]  # Setzt die Beispiele zusammen
+    samples = [sample for sample in samples if sample]  # Entfernt übersprungene Beispiele
+    records = []  # Kodierte Beispiele, die der Hauptprozess in die Shards schreibt
+    for (final_path, _, annotations, _), img_transformed_f in zip(samples, apply_effects(samples, effect_statistics)):
+        if output_format == 'shards':  # Kodiert das Bild im Prozess, geschrieben wird zentral
+            name = os.path.splitext(os.path.basename(final_path))[0]
+            records.append((name, encode_image(img_transformed_f, shard_encoding, shard_quality), create_boxes(annotations, img_transformed_f.size)))
+        else:
+            save_sample(final_path, img_transformed_f, annotations)  # Speichert das Bild und die Annotationsdatei
+    return len(samples), (end - start) - len(samples), effect_statistics, records  # Gibt erzeugte und übersprungene Beispiele, die Statistik und die kodierten Beispiele zurück
 
-                    data = img_transformed_f.getdata()  # Holt die Bilddaten
-                    img_no_profile = Image.new(img_transformed_f.mode, img_transformed_f.size)  # Erstellt ein neues Bild ohne Farbprofil
-                    img_no_profile.putdata(data)  # Fügt die Bilddaten hinzu
-                    img_no_profile.save(final_path)  # Speichert das Bild
 
-                    create_annotation_file(final_path, annotations, final_image.size)  # Erstellt die Annotationsdatei
-                    sleep(0.5)  # Wartet 0,5 Sekunden
+def create_tasks(input_folder, output_folder, num_images, base_seed):  # Definiert eine Funktion zur Aufteilung der Arbeit
+    tasks = []  # Initialisiert die Liste der Aufgaben
+    for img_name in sorted(os.listdir(input_folder)):  # Durchläuft die Dateien im Eingabeordner in fester Reihenfolge
+        if img_name.endswith('.png'):  # Prüft, ob die Datei eine PNG-Datei ist
+            img_path = os.path.join(input_folder, img_name)  # Erstellt den vollständigen Dateipfad
+            for start in range(0, num_images, samples_per_task):  # Teilt die Beispiele einer Flasche in Abschnitte auf
+                tasks.append((img_path, output_folder, start, min(start + samples_per_task, num_images), base_seed))
+    return tasks  # Gibt die Aufgaben zurück
+
+
+def process_images(input_folder, output_folder, num_images=1, num_workers=1, base_seed=seed):  # Definiert eine Funktion zur Verarbeitung von Bildern
+    tasks = create_tasks(input_folder, output_folder, num_images, base_seed)  # Teilt die Flaschen in Aufgaben auf
+    effect_statistics = {}  # Initialisiert die zusammengeführte Effektstatistik
+    generated, skipped = 0, 0  # Initialisiert die Zähler
+    start_time = time.perf_counter()  # Speichert die Startzeit
+
+    total = sum(end - start for _, _, start, end, _ in tasks)  # Anzahl der geplanten Beispiele
+    writer = ShardWriter(output_folder, shard_encoding, shard_quality) if output_format == 'shards' else None  # Schreibt die Shards in fester Reihenfolge
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None  # Prozess-Pool nur bei mehreren Prozessen
+    results = executor.map(process_task, tasks) if executor else map(process_task, tasks)  # Verteilt die Aufgaben auf die Prozesse
+    for task_generated, task_skipped, task_statistics, records in results:
+        generated, skipped = generated + task_generated, skipped + task_skipped  # Aktualisiert die Zähler
+        for name, data, boxes in records:  # Hängt die kodierten Beispiele an den aktuellen Shard an
+            writer.write_encoded(name, data, boxes)
+        for effect_name, count in task_statistics.items():  # Führt die Effektstatistiken zusammen
+            effect_statistics[effect_name] = effect_statistics.get(effect_name, 0) + count
+        print(f"{generated + skipped}/{total} samples, {generated / (time.perf_counter() - start_time):.2f} samples/s", end='\r')  # Gibt den Fortschritt aus
+    if executor:
+        executor.shutdown()  # Beendet die Prozesse
+    if writer:
+        writer.close()  # Schreibt den Index der Shards
+
+    elapsed = time.perf_counter() - start_time  # Berechnet die Dauer
+    print(f"\nGenerated {generated} samples ({skipped} skipped) in {elapsed:.1f}s, {generated / elapsed if elapsed else 0:.2f} samples/s")  # Gibt den Durchsatz aus
+    for effect_name, count in sorted(effect_statistics.items(), key=lambda item: -item[1]):  # Gibt die Effektstatistik aus
+        print(f"  {effect_name}: {count}")
+    return generated, skipped, effect_statistics  # Gibt die Zähler und die Effektstatistik zurück
 
 
 if __name__ == '__main__':  # Überprüft, ob das Skript direkt ausgeführt wird
     start_time = datetime.now()  # Speichert die Startzeit
     print(f"Script started at: {start_time}")  # Gibt die Startzeit aus
-    os.makedirs(output_folder, exist_ok=True)  # Erstellt den Ausgabordner, falls er nicht existiert
-    process_images(input_folder, output_folder, probe_size)  # Startet die Bildverarbeitung
+    target_folder = shard_folder if output_format == 'shards' else output_folder  # Wählt den Ordner passend zum Ausgabeformat
+    os.makedirs(target_folder, exist_ok=True)  # Erstellt den Ausgabordner, falls er nicht existiert
+    if background_source == 'pool' and not BackgroundPool.exists(background_pool_folder, size):  # Prüft, ob der Pool fehlt
+        build_pool(background_folder, background_pool_folder, size, workers)  # Liest die Hintergründe einmalig ein
+    process_images(input_folder, target_folder, probe_size, workers, seed)  # Startet die Bildverarbeitung
     end_time = datetime.now()  # Speichert die Endzeit
     print(f"Script finished at: {end_time}")  # Gibt die Endzeit aus
     elapsed_time = end_time - start_time  # Berechnet die verstrichene Zeit
@@ -0,0 +1,290 @@
+from collections import defaultdict
+import cv2
+import numpy as np
+
+TRANSFORMATIONS = [  # Dieselben Effekte in derselben Reihenfolge wie in 2-prepare-dataset.py
+    "contrast", "brightness", "darkness", "grayscale", "black and white", "sharpness",
+    "gaussian blur", "colorize", "vhs effect", "damage", "transparent spots"
+]
+SKIP_EFFECT = "🧽"  # Name für Bilder ohne Effekt in der Effektstatistik
+LUMINANCE_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)  # Gewichte von Image.convert('L')
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13  # Kern von ImageFilter.SMOOTH
+
+
+def uniform(rngs, low, high):
+    """
+    Zieht pro Bild einen gleichverteilten Parameter
+
+    Args:
+        rngs (list): Ein Zufallsgenerator pro Bild
+        low (float): Untere Grenze
+        high (float): Obere Grenze
+
+    Returns:
+        numpy.ndarray: Die Parameter mit der Form (N, 1)
+    """
+    return np.array([rng.uniform(low, high) for rng in rngs], dtype=np.float32).reshape(-1, 1)
+
+
+def random_colors(rng, count, low=0, high=255):
+    return rng.integers(low, high + 1, size=(count, 3))  # Zufällige RGB-Farben einschließlich der oberen Grenze
+
+
+def to_uint8(values):
+    return np.clip(values, 0, 255).astype(np.uint8)  # Abschneiden wie PIL beim Mischen
+
+
+def luminance(images):
+    """
+    Berechnet die Helligkeit wie `Image.convert('L')` (ITU-R 601-2) über OpenCV
+
+    Args:
+        images (numpy.ndarray): Ein Bild (H, W, 3) oder Bilder mit der Form (N, H, W, 3)
+
+    Returns:
+        numpy.ndarray: Die Helligkeit mit der Form (H, W) oder (N, H, W)
+    """
+    if images.ndim == 3:
+        return cv2.cvtColor(images, cv2.COLOR_RGB2GRAY)
+    return np.stack([cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) for image in images])
+
+
+def blend_luts(degenerate, factors):
+    """
+    Berechnet die Farbtabellen für `ImageEnhance` mit einem einfarbigen degenerierten Bild
+
+    Weil das degenerierte Bild konstant ist, hängt das Ergebnis nur vom Pixelwert ab und
+    das Mischen wird zu einem Nachschlagen in einer Tabelle mit 256 Einträgen.
+
+    Args:
+        degenerate (numpy.ndarray): Der Wert des degenerierten Bildes pro Bild, Form (N, 1)
+        factors (numpy.ndarray): Der Faktor pro Bild, Form (N, 1)
+
+    Returns:
+        numpy.ndarray: Eine Tabelle pro Bild mit der Form (N, 256)
+    """
+    values = np.arange(256, dtype=np.float32)[None, :]
+    return to_uint8(degenerate + factors * (values - degenerate))
+
+
+def apply_luts(images, luts):
+    """
+    Schlägt jedes Bild in seiner eigenen Farbtabelle nach
+
+    Args:
+        images (numpy.ndarray): Bilder mit der Form (N, H, W, 3)
+        luts (numpy.ndarray): Tabellen mit der Form (N, 256) für alle Kanäle oder (N, 3, 256) pro Kanal
+
+    Returns:
+        numpy.ndarray: Die Bilder nach dem Nachschlagen
+    """
+    result = np.empty_like(images)
+    for i, lut in enumerate(luts):
+        if lut.ndim == 2:
+            lut = np.ascontiguousarray(lut.T).reshape(256, 1, 3)  # Eigene Tabelle pro Kanal
+        cv2.LUT(images[i], lut, dst=result[i])
+    return result
+
+
+def gaussian_blur(images, radii):
+    """
+    Zeichnet Bilder weich wie `ImageFilter.GaussianBlur`, der Radius wird als Standardabweichung verwendet
+
+    Faltungen laufen über OpenCV, das auf den uint8-Bildern deutlich schneller ist als PIL oder NumPy.
+
+    Args:
+        images (numpy.ndarray): Bilder mit der Form (N, H, W, 3)
+        radii (numpy.ndarray): Der Radius pro Bild
+
+    Returns:
+        numpy.ndarray: Die weichgezeichneten Bilder
+    """
+    result = np.empty_like(images)
+    for i, radius in enumerate(np.ravel(radii)):
+        cv2.GaussianBlur(images[i], (0, 0), float(radius), dst=result[i], borderType=cv2.BORDER_REPLICATE)
+    return result
+
+
+def draw_lines(canvas, lines):
+    """
+    Zeichnet Linien in ein Bild, indem alle Punkte einer Linie auf einmal gesetzt werden
+
+    Args:
+        canvas (numpy.ndarray): Das Bild mit der Form (H, W, 3), wird verändert
+        lines (list): Tupel aus Start, Ende, Farbe und Breite
+    """
+    height, width = canvas.shape[:2]
+    for (x0, y0), (x1, y1), color, line_width in lines:
+        steps = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        xs = np.rint(np.linspace(x0, x1, steps)).astype(np.intp)
+        ys = np.rint(np.linspace(y0, y1, steps)).astype(np.intp)
+        offsets = np.arange(line_width) - (line_width - 1) // 2  # Breite quer zur Hauptrichtung der Linie
+        if abs(x1 - x0) >= abs(y1 - y0):
+            ys = (ys[:, None] + offsets[None, :]).ravel()
+            xs = np.repeat(xs, line_width)
+        else:
+            xs = (xs[:, None] + offsets[None, :]).ravel()
+            ys = np.repeat(ys, line_width)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        canvas[ys[inside], xs[inside]] = color
+
+
+"""
+   Effekte, jeweils für ein Bündel (N, H, W, 3) mit einem Zufallsgenerator pro Bild
+"""
+
+def contrast(images, rngs):
+    mean = np.rint(luminance(images).mean(axis=(1, 2), dtype=np.float32)).reshape(-1, 1)  # Mittlere Helligkeit pro Bild
+    return apply_luts(images, blend_luts(mean, uniform(rngs, 1.5, 2.5)))
+
+
+def brightness(images, rngs):
+    return apply_luts(images, blend_luts(np.zeros((1, 1), dtype=np.float32), uniform(rngs, 1.5, 2.0)))
+
+
+def darkness(images, rngs):
+    return apply_luts(images, blend_luts(np.zeros((1, 1), dtype=np.float32), uniform(rngs, 0.2, 0.7)))
+
+
+def grayscale(images, rngs):
+    return np.broadcast_to(luminance(images)[..., None], images.shape)  # Drei gleiche Kanäle, kopiert erst beim Zuweisen
+
+
+def sharpness(images, rngs):
+    result = np.empty_like(images)
+    for i, factor in enumerate(uniform(rngs, 1.5, 2.5).ravel()):
+        smoothed = cv2.filter2D(images[i], -1, SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+        cv2.addWeighted(images[i], float(factor), smoothed, 1 - float(factor), 0, dst=result[i])  # Mischen wie ImageEnhance mit Sättigung
+    return result
+
+
+def blur(images, rngs):
+    return gaussian_blur(images, uniform(rngs, 1.5, 3.0))
+
+
+def colorize(images, rngs):
+    result = images.copy()
+    gray = np.arange(256, dtype=np.float32)[:, None] / 255
+    for i, rng in enumerate(rngs):
+        if rng.random() > 0.5:  # Wie im Original wird nur jedes zweite Bild eingefärbt
+            black, white = random_colors(rng, 2)
+            table = to_uint8(black + (white - black) * gray)  # Farbe für jeden Helligkeitswert, Form (256, 3)
+            gray_image = luminance(images[i])
+            cv2.merge([cv2.LUT(gray_image, np.ascontiguousarray(table[:, channel])) for channel in range(3)], dst=result[i])
+    return result
+
+
+def vhs_effect(images, rngs):
+    height = images.shape[1]
+    result = np.empty_like(images)
+    for i, rng in enumerate(rngs):
+        noise = rng.standard_normal(images.shape[1:3], dtype=np.float32)
+        noise *= np.float32(rng.uniform(0.1, 0.5))
+        noise += 128
+        noise = cv2.cvtColor(to_uint8(noise), cv2.COLOR_GRAY2RGB)  # Rauschen wie random_noise um den Mittelwert 128
+        alpha = rng.uniform(0.2, 0.5)
+        cv2.addWeighted(images[i], 1 - alpha, noise, alpha, 0, dst=result[i])
+        result[i, ::4] = random_colors(rng, len(range(0, height, 4)))[:, None, :]  # Jede vierte Zeile als farbige Linie
+    return gaussian_blur(result, uniform(rngs, 0.5, 1.5))
+
+
+def damage(images, rngs):
+    # Rauschen und Kleckse aus apply_damage fehlen, weil sie dort das Ergebnis nicht verändern
+    count, height, width = images.shape[:3]
+    scratches = np.zeros_like(images)
+    for scratch, rng in zip(scratches, rngs):
+        lines = []
+        for _ in range(rng.integers(5, 16)):
+            start = (int(rng.integers(0, width + 1)), int(rng.integers(0, height + 1)))
+            end = (int(rng.integers(0, width + 1)), int(rng.integers(0, height + 1)))
+            lines.append((start, end, random_colors(rng, 1, 100, 150)[0], int(rng.integers(1, 4))))
+        draw_lines(scratch, lines)
+    scratches = gaussian_blur(scratches, np.ones(count))
+    result = np.empty_like(images)
+    for i in range(count):
+        scratched = cv2.addWeighted(images[i], 0.9, scratches[i], 0.1, 0)  # Kratzer zu 10 % einmischen
+        gray = cv2.cvtColor(luminance(scratched), cv2.COLOR_GRAY2RGB)
+        cv2.addWeighted(scratched, 0.8, gray, 0.2, 0, dst=result[i])  # Sättigung verringern wie ImageEnhance.Color(0.8)
+    return result
+
+
+def transparent_spots(images, rngs):
+    height, width = images.shape[1:3]
+    values = np.arange(256, dtype=np.float32)[:, None]
+    result = images.copy()
+    for i, rng in enumerate(rngs):
+        count = int(rng.integers(10, 31))
+        centers = np.stack([rng.integers(0, width + 1, count), rng.integers(0, height + 1, count)], axis=1)
+        radii = rng.integers(10, 101, count)
+        colors = random_colors(rng, count, 50, 150)
+        opacities = rng.integers(30, 121, count)
+
+        ids = np.zeros((height, width), dtype=np.uint8)  # Pro Pixel die Nummer des obersten Flecks, spätere überdecken frühere
+        for number, ((x, y), radius) in enumerate(zip(centers, radii), start=1):
+            cv2.circle(ids, (int(x), int(y)), int(radius), number, -1)
+        for number, ((x, y), radius) in enumerate(zip(centers, radii), start=1):
+            top, bottom = max(0, y - radius), min(height, y + radius + 1)
+            left, right = max(0, x - radius), min(width, x + radius + 1)
+            if top >= bottom or left >= right:
+                continue
+            alpha = opacities[number - 1] / 255
+            table = to_uint8(values * (1 - alpha) + colors[number - 1] * alpha + 0.5).reshape(256, 1, 3)  # Wie Image.alpha_composite
+            spot = cv2.LUT(images[i, top:bottom, left:right], table)
+            mask = (ids[top:bottom, left:right] == number).view(np.uint8)
+            cv2.copyTo(spot, mask, result[i, top:bottom, left:right])  # Nur die sichtbaren Pixel des Flecks übernehmen
+    return result
+
+
+EFFECTS = {
+    "contrast": contrast,
+    "brightness": brightness,
+    "darkness": darkness,
+    "grayscale": grayscale,
+    "black and white": grayscale,  # convert('L') entspricht ImageOps.grayscale
+    "sharpness": sharpness,
+    "gaussian blur": blur,
+    "colorize": colorize,
+    "vhs effect": vhs_effect,
+    "damage": damage,
+    "transparent spots": transparent_spots
+}
+
+
+def apply_random_transformation(images, rngs, effect_statistics, effect_chance=85):
+    """
+    Wendet zufällige Effekte auf ein Bündel an, mit derselben Auswahl wie die PIL-Variante in 2-prepare-dataset.py
+
+    Jedes Bild erhält seine eigene Effektfolge. Pro Schritt werden alle Bilder mit demselben Effekt gemeinsam bearbeitet.
+
+    Args:
+        images (numpy.ndarray): Bilder mit der Form (N, H, W, 3) als uint8
+        rngs (list): Ein numpy-Zufallsgenerator pro Bild, damit das Ergebnis nicht von der Bündelung abhängt
+        effect_statistics (dict): Wird um die Anzahl jedes angewendeten Effekts erhöht
+        effect_chance (int): Wahrscheinlichkeit in Prozent, dass ein Bild Effekte erhält
+
+    Returns:
+        tuple: Die bearbeiteten Bilder und pro Bild die Namen der Effekte
+    """
+    plans = []
+    for rng in rngs:
+        if rng.random() > (1 - (effect_chance / 100)):
+            num_effects = int(rng.integers(1, 5))
+            plans.append([str(name) for name in rng.choice(TRANSFORMATIONS, size=num_effects, replace=False)])
+        else:
+            plans.append([])
+
+    images = images.copy()
+    for step in range(max((len(plan) for plan in plans), default=0)):
+        groups = defaultdict(list)
+        for i, plan in enumerate(plans):
+            if step < len(plan):
+                groups[plan[step]].append(i)
+        for effect_name, indices in groups.items():
+            images[indices] = EFFECTS[effect_name](images[indices], [rngs[i] for i in indices])
+
+    effect_names = []
+    for plan in plans:
+        for effect_name in plan or [SKIP_EFFECT]:
+            effect_statistics[effect_name] = effect_statistics.get(effect_name, 0) + 1
+        effect_names.append(", ".join(plan) or SKIP_EFFECT)
+    return images, effect_names
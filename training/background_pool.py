@@ -0,0 +1,167 @@
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+ARRAY_FILE = 'backgrounds.npy'  # Alle Hintergründe als ein Array (Anzahl, Größe, Größe, 3)
+INDEX_FILE = 'index.json'  # Größe, Anzahl und Herkunft der Hintergründe
+
+
+def load_background(file_path, size):
+    """
+    Lädt einen Hintergrund, richtet ihn gemäß EXIF aus und schneidet ihn quadratisch auf die Zielgröße zu
+
+    Args:
+        file_path (str): Pfad zur Bilddatei
+        size (int): Kantenlänge des Ergebnisses
+
+    Returns:
+        numpy.ndarray: Der Hintergrund als RGB-Array oder None, wenn die Datei kein gültiges Bild ist
+    """
+    try:
+        with Image.open(file_path) as img:
+            img.draft('RGB', (size, size))  # JPEG-Bilder direkt in reduzierter Auflösung dekodieren
+            img = ImageOps.exif_transpose(img).convert('RGB')  # Richtet das Bild aus und entfernt Transparenz
+            img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)  # Skaliert und schneidet mittig zu
+            return np.asarray(img)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Skipped background {file_path}: {e}")  # Gibt eine Meldung aus, falls das Bild nicht gelesen werden kann
+        return None
+
+
+def ingest_chunk(task):
+    """
+    Schreibt einen Abschnitt an Hintergründen in das gemeinsame Array
+
+    Args:
+        task (tuple): Pfad des Arrays, Startindex, Dateipfade und Kantenlänge
+
+    Returns:
+        list: Die Indizes der erfolgreich geschriebenen Hintergründe
+    """
+    array_path, start, file_paths, size = task
+    array = np.load(array_path, mmap_mode='r+')  # Jeder Prozess öffnet das Array selbst
+    written = []
+    for offset, file_path in enumerate(file_paths):
+        background = load_background(file_path, size)
+        if background is not None:
+            array[start + offset] = background
+            written.append(start + offset)
+    array.flush()  # Schreibt die Änderungen auf die Festplatte
+    return written
+
+
+def build_pool(source_folder, pool_folder, size, workers=None, chunk_size=64):
+    """
+    Liest alle Hintergründe eines Ordners einmalig ein und legt sie als speicherabgebildetes Array mit Index ab
+
+    Args:
+        source_folder (str): Pfad zum Ordner mit den Hintergrundbildern
+        pool_folder (str): Pfad zum Ordner des Pools
+        size (int): Kantenlänge der Hintergründe
+        workers (int, optional): Anzahl der Prozesse, standardmäßig die Anzahl der CPU-Kerne
+        chunk_size (int): Anzahl der Bilder pro Aufgabe
+
+    Returns:
+        BackgroundPool: Der erstellte Pool
+    """
+    file_names = sorted(name for name in os.listdir(source_folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not file_names:
+        raise ValueError(f"No background images found in {source_folder}")
+    os.makedirs(pool_folder, exist_ok=True)  # Erstellt den Ordner des Pools, falls nicht vorhanden
+
+    array_path = os.path.join(pool_folder, ARRAY_FILE)
+    np.lib.format.open_memmap(array_path, mode='w+', dtype=np.uint8, shape=(len(file_names), size, size, 3)).flush()  # Legt das Array an
+    file_paths = [os.path.join(source_folder, name) for name in file_names]
+    tasks = [(array_path, start, file_paths[start:start + chunk_size], size) for start in range(0, len(file_paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        valid = sorted(index for written in executor.map(ingest_chunk, tasks) for index in written)  # Liest die Bilder parallel ein
+
+    index = {
+        'size': size,
+        'count': len(valid),
+        'slots': valid,  # Positionen der gültigen Hintergründe im Array
+        'files': [file_names[i] for i in valid]
+    }
+    with open(os.path.join(pool_folder, INDEX_FILE), 'w') as file:
+        json.dump(index, file)  # Der Index wird zuletzt geschrieben und markiert den Pool als vollständig
+    return BackgroundPool(pool_folder)
+
+
+class BackgroundPool:
+    """
+    Lokaler Pool vorab skalierter Hintergründe, aus dem ohne Netzwerkzugriff gezogen wird
+
+    Das Array wird nur in den Speicher abgebildet, sodass sich alle Prozesse die Seiten im Cache des Betriebssystems teilen
+    """
+
+    def __init__(self, pool_folder):
+        """
+        Öffnet einen mit `build_pool` erstellten Pool
+
+        Args:
+            pool_folder (str): Pfad zum Ordner des Pools
+        """
+        with open(os.path.join(pool_folder, INDEX_FILE)) as file:
+            index = json.load(file)
+        self.size = index['size']
+        self.slots = index['slots']
+        self.files = index['files']
+        self.array = np.load(os.path.join(pool_folder, ARRAY_FILE), mmap_mode='r')  # Nur lesend abbilden
+
+    @staticmethod
+    def exists(pool_folder, size=None):
+        """
+        Prüft, ob ein vollständiger Pool vorliegt
+
+        Args:
+            pool_folder (str): Pfad zum Ordner des Pools
+            size (int, optional): Geforderte Kantenlänge der Hintergründe
+
+        Returns:
+            bool: Ob der Pool vorhanden ist und zur Kantenlänge passt
+        """
+        index_path = os.path.join(pool_folder, INDEX_FILE)
+        if not os.path.isfile(index_path):
+            return False
+        with open(index_path) as file:
+            return size is None or json.load(file)['size'] == size
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, index):
+        """
+        Liefert einen Hintergrund als Bild
+
+        Args:
+            index (int): Position im Pool
+
+        Returns:
+            Image: Der Hintergrund im RGBA-Modus
+        """
+        return Image.fromarray(np.array(self.array[self.slots[index]]), 'RGB').convert('RGBA')  # Kopiert den Hintergrund aus dem Array
+
+    def sample(self, rng=random):
+        """
+        Zieht einen zufälligen Hintergrund
+
+        Args:
+            rng (random.Random, optional): Zufallsgenerator, standardmäßig das Modul random
+
+        Returns:
+            Image: Der Hintergrund im RGBA-Modus
+        """
+        return self.get(rng.randrange(len(self.slots)))
+
+
+if __name__ == '__main__':
+    source_folder = 'pictures/0-backgrounds'  # Definiert den Ordner mit den Hintergrundbildern
+    pool_folder = 'pictures/backgrounds-pool'  # Definiert den Ordner des Pools
+    size = 640  # Kantenlänge der Hintergründe, wie in 2-prepare-dataset.py
+
+    pool = build_pool(source_folder, pool_folder, size)
+    print(f"Background pool with {len(pool)} images of {size}x{size} written to {pool_folder}")
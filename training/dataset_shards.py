@@ -0,0 +1,309 @@
+import json
+import os
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+INDEX_FILE = 'index.json'  # Kodierung, Anzahl und Liste der Shards, wird zuletzt geschrieben
+SHARD_NAME = 'shard-{:05d}'  # Name eines Shards ohne Endung
+DATA_SUFFIX = '.bin'  # Aneinandergehängte kodierte Bilder
+SHARD_INDEX_SUFFIX = '.npz'  # Position, Länge und Boxen jedes Bildes im Shard
+ENCODINGS = {  # Kodierung -> PIL-Format und Dateiendung beim Export
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp')
+}
+
+
+def encode_image(image, encoding='jpeg', quality=95, compress_level=1):
+    """
+    Kodiert ein Bild ohne Farbprofil
+
+    Args:
+        image (numpy.ndarray | Image): Das Bild als uint8-Array (H, W, 3) oder PIL-Bild
+        encoding (str): 'jpeg', 'png' oder 'webp'
+        quality (int): Qualität für JPEG und WebP
+        compress_level (int): Kompressionsstufe für PNG, 1 ist deutlich schneller als die Standardstufe 6
+
+    Returns:
+        bytes: Das kodierte Bild
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    image_format = ENCODINGS[encoding][0]
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')  # JPEG kennt keine Transparenz
+    options = {'compress_level': compress_level} if image_format == 'PNG' else {'quality': quality}
+    buffer = BytesIO()
+    image.save(buffer, image_format, icc_profile=None, **options)  # Ohne Farbprofil, ersetzt das Umkopieren mit getdata/putdata
+    return buffer.getvalue()
+
+
+def format_boxes(boxes):
+    """
+    Formatiert Boxen als Inhalt einer YOLO-Annotationsdatei
+
+    Args:
+        boxes (numpy.ndarray): Boxen mit der Form (N, 5) aus Klasse, Mitte x, Mitte y, Breite und Höhe, normiert
+
+    Returns:
+        str: Eine Zeile pro Box
+    """
+    return ''.join(f"{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for c, x, y, w, h in boxes.tolist())
+
+
+class ShardWriter:
+    """
+    Schreibt Beispiele fortlaufend in Shards statt in je eine Bild- und Annotationsdatei
+
+    Ein Shard besteht aus einer Datei mit den aneinandergehängten kodierten Bildern und einem Index mit
+    Position, Länge, Name und Boxen jedes Bildes. Erreicht ein Shard `max_shard_bytes`, wird ein neuer begonnen.
+    """
+
+    def __init__(self, folder, encoding='jpeg', quality=95, max_shard_bytes=512 * 1024 * 1024):
+        """
+        Legt den Ordner an und entfernt vorhandene Shards darin
+
+        Args:
+            folder (str): Pfad zum Ordner der Shards
+            encoding (str): Kodierung der Bilder, siehe `ENCODINGS`
+            quality (int): Qualität für JPEG und WebP
+            max_shard_bytes (int): Größe, ab der ein neuer Shard begonnen wird
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding}, expected one of {', '.join(ENCODINGS)}")
+        self.folder = folder
+        self.encoding = encoding
+        self.quality = quality
+        self.max_shard_bytes = max_shard_bytes
+        self.shards = []  # Name, Anzahl und Größe der abgeschlossenen Shards
+        self._file = None
+
+        os.makedirs(folder, exist_ok=True)
+        for file_name in os.listdir(folder):  # Ein neuer Lauf ersetzt die Shards eines früheren
+            if file_name == INDEX_FILE or (file_name.startswith('shard-') and file_name.endswith((DATA_SUFFIX, SHARD_INDEX_SUFFIX))):
+                os.remove(os.path.join(folder, file_name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, name, image, boxes):
+        """
+        Kodiert ein Bild und schreibt es mit seinen Boxen
+
+        Args:
+            name (str): Name des Beispiels ohne Endung
+            image (numpy.ndarray | Image): Das Bild
+            boxes (numpy.ndarray): Boxen mit der Form (N, 5) im YOLO-Format
+        """
+        self.write_encoded(name, encode_image(image, self.encoding, self.quality), boxes)
+
+    def write_encoded(self, name, data, boxes):
+        """
+        Schreibt ein bereits kodiertes Bild, etwa aus einem anderen Prozess, mit seinen Boxen
+
+        Args:
+            name (str): Name des Beispiels ohne Endung
+            data (bytes): Das mit `encode_image` und der Kodierung des Writers kodierte Bild
+            boxes (numpy.ndarray): Boxen mit der Form (N, 5) im YOLO-Format
+        """
+        if self._file is not None and self._position + len(data) > self.max_shard_bytes:
+            self._close_shard()
+        if self._file is None:
+            self._open_shard()
+        self._file.write(data)
+        self._names.append(name)
+        self._offsets.append(self._position)
+        self._lengths.append(len(data))
+        self._boxes.append(np.asarray(boxes, dtype=np.float32).reshape(-1, 5))
+        self._position += len(data)
+
+    def _open_shard(self):
+        self._shard_name = SHARD_NAME.format(len(self.shards))
+        self._file = open(os.path.join(self.folder, self._shard_name + DATA_SUFFIX), 'wb')
+        self._position = 0
+        self._names, self._offsets, self._lengths, self._boxes = [], [], [], []
+
+    def _close_shard(self):
+        self._file.close()
+        self._file = None
+        box_counts = [len(boxes) for boxes in self._boxes]
+        np.savez(
+            os.path.join(self.folder, self._shard_name + SHARD_INDEX_SUFFIX),
+            names=np.array(self._names),
+            offsets=np.array(self._offsets, dtype=np.int64),
+            lengths=np.array(self._lengths, dtype=np.int64),
+            box_offsets=np.concatenate([[0], np.cumsum(box_counts)]).astype(np.int64),  # Boxen von Bild i: box_offsets[i]:box_offsets[i + 1]
+            boxes=np.concatenate(self._boxes) if self._boxes else np.zeros((0, 5), dtype=np.float32)
+        )
+        self.shards.append({'name': self._shard_name, 'count': len(self._names), 'bytes': self._position})
+
+    def close(self):
+        """
+        Schließt den letzten Shard und schreibt den Index, der den Datensatz als vollständig markiert
+        """
+        if self._file is not None:
+            self._close_shard()
+        index = {
+            'encoding': self.encoding,
+            'count': sum(shard['count'] for shard in self.shards),
+            'shards': self.shards
+        }
+        with open(os.path.join(self.folder, INDEX_FILE), 'w') as file:
+            json.dump(index, file)
+
+
+class ShardReader:
+    """
+    Liest einen mit `ShardWriter` geschriebenen Datensatz der Reihe nach oder über den Index einzelner Beispiele
+
+    Die Indizes aller Shards werden beim Öffnen zu wenigen kompakten Arrays zusammengeführt.
+    Dateien werden pro Prozess geöffnet, sodass ein Reader auch in Worker-Prozessen eines DataLoaders funktioniert.
+    """
+
+    def __init__(self, folder):
+        """
+        Öffnet einen Datensatz
+
+        Args:
+            folder (str): Pfad zum Ordner der Shards
+        """
+        with open(os.path.join(folder, INDEX_FILE)) as file:
+            index = json.load(file)
+        self.folder = folder
+        self.encoding = index['encoding']
+        self.shard_names = [shard['name'] for shard in index['shards']]
+
+        names, shard_ids, offsets, lengths, box_counts, boxes = [], [], [], [], [], []
+        for shard_id, shard_name in enumerate(self.shard_names):
+            with np.load(os.path.join(folder, shard_name + SHARD_INDEX_SUFFIX)) as shard:
+                names.extend(shard['names'].tolist())
+                shard_ids.append(np.full(len(shard['offsets']), shard_id, dtype=np.int32))
+                offsets.append(shard['offsets'])
+                lengths.append(shard['lengths'])
+                box_counts.append(np.diff(shard['box_offsets']))
+                boxes.append(shard['boxes'])
+        self.names = names
+        self.shard_ids = np.concatenate(shard_ids) if shard_ids else np.zeros(0, dtype=np.int32)
+        self.offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+        self.lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+        self.box_offsets = np.concatenate([[0], np.cumsum(np.concatenate(box_counts) if box_counts else [])]).astype(np.int64)
+        self.all_boxes = np.concatenate(boxes) if boxes else np.zeros((0, 5), dtype=np.float32)
+        self._files = {}
+        self._pid = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _shard_file(self, shard_id):
+        if self._pid != os.getpid():  # Nach einem fork eigene Dateien öffnen
+            self._files = {}
+            self._pid = os.getpid()
+        if shard_id not in self._files:
+            self._files[shard_id] = open(os.path.join(self.folder, self.shard_names[shard_id] + DATA_SUFFIX), 'rb')
+        return self._files[shard_id]
+
+    def read(self, index):
+        """
+        Liest ein kodiertes Bild
+
+        Args:
+            index (int): Position im Datensatz
+
+        Returns:
+            bytes: Das kodierte Bild
+        """
+        file = self._shard_file(int(self.shard_ids[index]))
+        file.seek(int(self.offsets[index]))
+        return file.read(int(self.lengths[index]))
+
+    def boxes(self, index):
+        """
+        Liefert die Boxen eines Beispiels
+
+        Args:
+            index (int): Position im Datensatz
+
+        Returns:
+            numpy.ndarray: Boxen mit der Form (N, 5) im YOLO-Format
+        """
+        return self.all_boxes[self.box_offsets[index]:self.box_offsets[index + 1]]
+
+    @staticmethod
+    def decode(data):
+        with Image.open(BytesIO(data)) as image:
+            return np.asarray(image.convert('RGB'))  # Dekodiert zu einem RGB-Array
+
+    def __getitem__(self, index):
+        """
+        Liest ein Beispiel mit wahlfreiem Zugriff
+
+        Args:
+            index (int): Position im Datensatz
+
+        Returns:
+            tuple: Das Bild als RGB-Array und seine Boxen
+        """
+        return self.decode(self.read(index)), self.boxes(index)
+
+    def stream(self, decode=True):
+        """
+        Liest alle Beispiele der Reihe nach, jeden Shard mit einem einzigen fortlaufenden Lesevorgang
+
+        Args:
+            decode (bool): Ob die Bilder dekodiert oder als Bytes geliefert werden
+
+        Yields:
+            tuple: Name, Bild (Array oder Bytes) und Boxen jedes Beispiels
+        """
+        for shard_id, shard_name in enumerate(self.shard_names):
+            indices = np.flatnonzero(self.shard_ids == shard_id)
+            with open(os.path.join(self.folder, shard_name + DATA_SUFFIX), 'rb') as file:
+                for index in indices:  # Die Bilder liegen in Schreibreihenfolge hintereinander
+                    data = file.read(int(self.lengths[index]))
+                    yield self.names[index], self.decode(data) if decode else data, self.boxes(index)
+
+    def __iter__(self):
+        return self.stream()
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+
+
+def export_yolo(shard_folder, output_folder):
+    """
+    Exportiert einen Datensatz in die bisherige Ordnerstruktur mit je einer Bild- und Annotationsdatei
+
+    Die Bilder werden ohne erneute Kodierung geschrieben, die Endung folgt der Kodierung der Shards.
+
+    Args:
+        shard_folder (str): Pfad zum Ordner der Shards
+        output_folder (str): Pfad zum Ausgabeordner
+
+    Returns:
+        int: Anzahl der exportierten Beispiele
+    """
+    reader = ShardReader(shard_folder)
+    extension = ENCODINGS[reader.encoding][1]
+    os.makedirs(output_folder, exist_ok=True)
+    count = 0
+    for name, data, boxes in reader.stream(decode=False):
+        with open(os.path.join(output_folder, name + extension), 'wb') as file:
+            file.write(data)
+        with open(os.path.join(output_folder, name + '.txt'), 'w') as file:
+            file.write(format_boxes(boxes))
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    shard_folder = 'pictures/4-extended-shards'  # Definiert den Ordner der Shards, wie in 2-prepare-dataset.py
+    output_folder = 'pictures/4-extended'  # Definiert den Ausgabeordner im YOLO-Format
+
+    exported = export_yolo(shard_folder, output_folder)
+    print(f"Exported {exported} samples from {shard_folder} to {output_folder}")